@@ -0,0 +1,128 @@
+"""
+Índice de anomalías por departamento × tipo de delito × año.
+
+Se calcula una vez por versión del dataset (consultas.preparar_version lo
+escribe junto a la copia, como los rollups) y la vista "Anomalías" solo
+filtra el índice ya cargado en memoria: no hay scans al pedir la vista.
+
+Para cada celda se calcula la tasa cada 100.000 habitantes y tres puntajes,
+con expresiones de ventana sobre el agregado anual, sin recorrer celda por
+celda:
+
+- z_historica: z robusto de la tasa contra la historia del mismo
+  departamento y tipo, (x - mediana) / (1,4826 · MAD). Detecta años
+  fuera de lo habitual para ese lugar.
+- z_pares: z robusto de log(1 + tasa) contra los demás departamentos con el
+  mismo tipo y año. Detecta lugares fuera de lo habitual para ese año
+  (p. ej. la tasa de Tordillo en 2024).
+- salto: log2 del cociente de hechos contra el año anterior, con +1 para no
+  dividir por cero. 3 significa ~8 veces más hechos.
+
+El puntaje de la celda es el mayor |z| de los dos y el índice guarda solo
+las celdas con puntaje >= UMBRAL y al menos MIN_HECHOS hechos (el umbral
+de 3,5 es el sugerido por Iglewicz y Hoaglin para z robustos), ordenadas
+de mayor a menor.
+
+Uso por línea de comandos (calcula el índice de la versión actual):
+    python anomalias.py --top 20
+"""
+
+import argparse
+
+import polars as pl
+
+UMBRAL = 3.5
+MIN_HECHOS = 5
+# MAD de una normal = 0,6745 σ
+ESCALA_MAD = 1.4826
+# Si la MAD es 0 (la mayoría de los años iguales) se usa la desviación media
+# absoluta, que para una normal es 0,7979 σ
+ESCALA_MEDIA_ABSOLUTA = 1.2533
+
+CLAVES = [
+    "anio", "categoria_delito", "codigo_delito_snic_nombre",
+    "provincia_nombre", "depto_nombre_completo",
+]
+
+
+def _z_robusto(lf, col, grupo, nombre):
+    """Agrega la columna `nombre` con el z robusto de `col` dentro de `grupo`."""
+    x = pl.col(col)
+    lf = lf.with_columns(x.median().over(grupo).alias("_mediana"))
+    lf = lf.with_columns((x - pl.col("_mediana")).abs().alias("_desvio"))
+    lf = lf.with_columns([
+        (pl.col("_desvio").median().over(grupo) * ESCALA_MAD).alias("_mad"),
+        (pl.col("_desvio").mean().over(grupo) * ESCALA_MEDIA_ABSOLUTA).alias("_media_absoluta"),
+    ])
+    escala = (
+        pl.when(pl.col("_mad") > 0).then(pl.col("_mad"))
+        .when(pl.col("_media_absoluta") > 0).then(pl.col("_media_absoluta"))
+    )
+    return lf.with_columns(((x - pl.col("_mediana")) / escala).round(2).alias(nombre)).drop(
+        ["_mediana", "_desvio", "_mad", "_media_absoluta"]
+    )
+
+
+def construir(df):
+    """
+    LazyFrame del índice a partir de las filas del dataset (anual o mensual:
+    primero se agrega a año).
+    """
+    serie = ["depto_nombre_completo", "codigo_delito_snic_nombre"]
+    return (
+        df
+        .group_by(CLAVES)
+        .agg([
+            pl.col("cantidad_hechos").sum(),
+            pl.col("poblacion_departamento").max(),
+        ])
+        .filter(pl.col("poblacion_departamento") > 0)
+        .with_columns(
+            (pl.col("cantidad_hechos") / pl.col("poblacion_departamento") * 100_000).alias("tasa_delitos")
+        )
+        .with_columns(pl.col("tasa_delitos").log1p().alias("_log_tasa"))
+        .sort(serie + ["anio"])
+        .pipe(_z_robusto, "tasa_delitos", serie, "z_historica")
+        .pipe(_z_robusto, "_log_tasa", ["codigo_delito_snic_nombre", "anio"], "z_pares")
+        .with_columns(
+            ((pl.col("cantidad_hechos") + 1)
+             / (pl.col("cantidad_hechos").shift(1).over(serie) + 1))
+            .log(2).round(2).alias("salto")
+        )
+        .with_columns(
+            pl.max_horizontal(pl.col("z_historica").abs(), pl.col("z_pares").abs()).alias("puntaje")
+        )
+        .filter((pl.col("puntaje") >= UMBRAL) & (pl.col("cantidad_hechos") >= MIN_HECHOS))
+        .with_columns([
+            pl.col("tasa_delitos").round(2),
+            # Dirección según la comparación que dio el puntaje
+            pl.when(pl.col("z_historica").abs() >= pl.col("z_pares").abs())
+            .then(pl.col("z_historica")).otherwise(pl.col("z_pares"))
+            .sign().cast(pl.Int8).alias("direccion"),
+        ])
+        .drop("_log_tasa")
+        .sort(["puntaje", "cantidad_hechos"], descending=True)
+        .with_row_index("puesto", offset=1)
+    )
+
+
+def main():
+    import consultas
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ruta", help=f"parquet a indexar (por defecto {consultas.ARCHIVO_DATOS})")
+    parser.add_argument("--top", type=int, default=20, help="celdas a mostrar")
+    args = parser.parse_args()
+
+    version = consultas.preparar_version(args.ruta)
+    indice = pl.read_parquet(consultas.ruta_anomalias(version))
+    print(f"{indice.height:,} celdas anómalas en la versión {version['huella']}")
+    with pl.Config(tbl_rows=args.top, tbl_cols=-1, tbl_width_chars=200):
+        print(indice.head(args.top).select([
+            "puesto", "anio", "depto_nombre_completo", "codigo_delito_snic_nombre",
+            "cantidad_hechos", "tasa_delitos", "z_historica", "z_pares", "salto", "puntaje",
+        ]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+API HTTP sin interfaz sobre las mismas consultas del tablero.
+
+Otras herramientas internas necesitan los números que muestra el tablero
+(tasas, variación anual, tipos más frecuentes por provincia o departamento)
+sin renderizar la app. Este servicio expone las funciones de consultas.py,
+con su caché en memoria y, si DELITOS_DIR_CACHE está configurado, la caché en
+disco que comparten los procesos de Streamlit del host.
+
+Todas las rutas son GET y devuelven JSON; con `formato=arrow` las tablas se
+devuelven como stream Arrow IPC. Los filtros de lista se repiten
+(`categoria=A&categoria=B`):
+
+    /salud
+    /opciones?categoria=
+    /resumen?anio=&categoria=&tipo=&provincia=&departamento=
+    /serie?categoria=&tipo=&provincia=&departamento=
+    /top_tipos?anio=&n=5&categoria=&tipo=&provincia=&departamento=
+    /provincias?anio=&categoria=&tipo=&provincia=
+    /departamentos?anio=&categoria=&tipo=&provincia=&departamento=
+
+Uso:
+    python api.py --puerto 8600
+    curl 'localhost:8600/resumen?anio=2023&provincia=Salta'
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import polars as pl
+
+import consultas
+import precalentamiento
+import vigilancia
+
+logger = logging.getLogger(__name__)
+
+PUERTO = int(os.environ.get("DELITOS_API_PUERTO", "8600"))
+# Tope de filas de /top_tipos
+MAX_TOP = 50
+
+
+class ErrorConsulta(Exception):
+    """Parámetros inválidos: se responde 400 con el mensaje."""
+
+
+# ---------------- PARÁMETROS ---------------- #
+def _uno(parametros, nombre, tipo=str, defecto=None):
+    valores = parametros.get(nombre)
+    if not valores or valores[-1] == "":
+        return defecto
+    try:
+        return tipo(valores[-1])
+    except ValueError:
+        raise ErrorConsulta(f"'{nombre}' inválido: {valores[-1]!r}")
+
+
+def _varios(parametros, nombre):
+    return tuple(v for v in parametros.get(nombre, []) if v)
+
+
+def _filtros(parametros):
+    return dict(
+        categorias=_varios(parametros, "categoria"),
+        tipos=_varios(parametros, "tipo"),
+        provincia=_uno(parametros, "provincia"),
+        departamento=_uno(parametros, "departamento"),
+    )
+
+
+def _anio(parametros):
+    anio = _uno(parametros, "anio", int)
+    return anio if anio is not None else consultas.opciones_filtros()["anios"][0]
+
+
+# ---------------- RUTAS ---------------- #
+def salud(parametros):
+    return {
+        "estado": "ok",
+        "huella": consultas.huella_vigente(),
+        "validacion": consultas.validacion_datos()["estado"],
+    }
+
+
+def opciones(parametros):
+    return consultas.opciones_filtros(_varios(parametros, "categoria"))
+
+
+def resumen(parametros):
+    anio = _anio(parametros)
+    filtros = _filtros(parametros)
+    datos = consultas.resumen_anual(anio, **filtros)
+    return {"anio": anio, **filtros, **datos, **consultas.indicadores(datos)}
+
+
+def serie(parametros):
+    return consultas.serie_anual(**_filtros(parametros))
+
+
+def top_tipos(parametros):
+    n = min(_uno(parametros, "n", int, 5), MAX_TOP)
+    distribucion = consultas.distribucion_delitos(_anio(parametros), **_filtros(parametros))
+    return consultas.por_nivel(distribucion, "tipo").head(n)
+
+
+def provincias(parametros):
+    filtros = _filtros(parametros)
+    df = consultas.evolucion_provincias(filtros["categorias"], filtros["tipos"])
+    if filtros["provincia"]:
+        df = df.filter(pl.col("provincia_nombre") == filtros["provincia"])
+    anio = _uno(parametros, "anio", int)
+    if anio is not None:
+        df = df.filter(pl.col("anio") == anio)
+    return df
+
+
+def departamentos(parametros):
+    filtros = _filtros(parametros)
+    df = consultas.evolucion_departamentos(
+        filtros["categorias"], filtros["tipos"],
+        (filtros["provincia"],) if filtros["provincia"] else (),
+    )
+    if filtros["departamento"]:
+        df = df.filter(pl.col("depto_nombre_completo") == filtros["departamento"])
+    anio = _uno(parametros, "anio", int)
+    if anio is not None:
+        df = df.filter(pl.col("anio") == anio)
+    return df
+
+
+RUTAS = {
+    "/salud": salud,
+    "/opciones": opciones,
+    "/resumen": resumen,
+    "/serie": serie,
+    "/top_tipos": top_tipos,
+    "/provincias": provincias,
+    "/departamentos": departamentos,
+}
+
+
+# ---------------- SERVIDOR ---------------- #
+def serializar(resultado, formato):
+    """(cuerpo, content-type) en JSON o, para tablas, Arrow IPC."""
+    if isinstance(resultado, pl.DataFrame):
+        if formato == "arrow":
+            buffer = io.BytesIO()
+            resultado.write_ipc_stream(buffer)
+            return buffer.getvalue(), "application/vnd.apache.arrow.stream"
+        resultado = resultado.to_dicts()
+    return json.dumps(resultado, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+
+
+class Manejador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Encabezados y cuerpo salen en dos escrituras: con Nagle y el ACK
+    # diferido del cliente cada respuesta esperaba ~40 ms
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parametros = parse_qs(url.query)
+        # Toda la respuesta sale de una misma versión del dataset
+        consultas.fijar_version()
+        ruta = RUTAS.get(url.path)
+        inicio = time.perf_counter()
+        try:
+            if ruta is None:
+                raise LookupError(url.path)
+            cuerpo, tipo = serializar(ruta(parametros), _uno(parametros, "formato"))
+            estado = 200
+        except LookupError:
+            cuerpo, tipo = serializar({"error": f"ruta desconocida: {url.path}"}, None)
+            estado = 404
+        except ErrorConsulta as e:
+            cuerpo, tipo = serializar({"error": str(e)}, None)
+            estado = 400
+        except Exception as e:
+            logger.exception("error en %s", self.path)
+            cuerpo, tipo = serializar({"error": repr(e)}, None)
+            estado = 500
+
+        self.send_response(estado)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+        logger.debug("%s %d %.1f ms", self.path, estado, (time.perf_counter() - inicio) * 1000)
+
+    def log_message(self, formato, *args):
+        # El log de acceso por línea de BaseHTTPRequestHandler satura la salida
+        # en las pruebas de carga; se reemplaza por el logger.debug de do_GET
+        pass
+
+
+def servidor(host="127.0.0.1", puerto=PUERTO):
+    return ThreadingHTTPServer((host, puerto), Manejador)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP de las consultas del tablero")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--sin-precalentar", action="store_true",
+                        help="no calcular las vistas por defecto antes de aceptar pedidos")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    # Fuera de `streamlit run` st.cache_data avisa en cada llamada que no hay
+    # runtime ni contexto de script; acá es lo esperado
+    for nombre in ("streamlit.runtime.caching.cache_data_api",
+                   "streamlit.runtime.scriptrunner_utils.script_run_context"):
+        logging.getLogger(nombre).setLevel(logging.ERROR)
+
+    version = consultas.fijar_version()
+    if not args.sin_precalentar:
+        precalentamiento.calentar_version(version)
+    vigilancia.iniciar()
+
+    http = servidor(args.host, args.puerto)
+    logger.info("API escuchando en http://%s:%d", args.host, args.puerto)
+    try:
+        http.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http.server_close()
+
+
+if __name__ == "__main__":
+    main()
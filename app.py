@@ -1,8 +1,17 @@
 import streamlit as st
 import polars as pl
-import plotly.express as px
+import anomalias
+import graficos
+import busqueda
+import hallazgos
+import consultas
+import exportacion
+import metricas
+import perfilado
+import precalentamiento
+import vigilancia
 import gc
-import json
+import os
 
 # ---------------- CONFIGURACIÓN DE PÁGINA ---------------- #
 st.set_page_config(
@@ -76,137 +85,103 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# ---------------- CARGA OPTIMIZADA DE DATOS ---------------- #
-@st.cache_data(show_spinner=True, ttl=3600)  # <-- Agregar TTL para limpiar cache
-def load_data():
-    try:
-        columns = [
-            "anio", "categoria_delito", "codigo_delito_snic_nombre",
-            "provincia_nombre", "depto_nombre_completo",
-            "cantidad_hechos", "cantidad_victimas",
-            "poblacion_departamento", "poblacion_provincia", "poblacion_pais"
-        ]
-
-        df_lazy = (
-            pl.scan_parquet("DATOS_SNIC_POB.parquet")
-            .select(columns)
-            .with_columns([
-                pl.col("categoria_delito").cast(pl.Categorical),
-                pl.col("codigo_delito_snic_nombre").cast(pl.Categorical),
-                pl.col("provincia_nombre").cast(pl.Categorical),
-                pl.col("depto_nombre_completo").cast(pl.Categorical),
-                pl.col("anio").cast(pl.Int16),
-                pl.col("cantidad_hechos").cast(pl.Int32),
-                pl.col("cantidad_victimas").cast(pl.Int32),
-                pl.col("poblacion_departamento").cast(pl.Int32),
-                pl.col("poblacion_provincia").cast(pl.Int32),
-                pl.col("poblacion_pais").cast(pl.Int32),
-            ])
-        )
-
-        return df_lazy
-
-    except Exception as e:
-        st.error(f"Error al cargar los datos: {e}")
-        return None
-
-@st.cache_data
-def load_geojson():
-    try:
-        with open("ar.json", "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        st.error("No se encontró el archivo ar.json")
-        return None
-
-df_lazy = load_data()
-argentina_geo = load_geojson()
-
-# ---------------- TÍTULO ---------------- #
-st.title("Delitos en Argentina")
-
-# ---------------- TABS ---------------- #
-tab1, tab2, tab3, tab4, tab5 = st.tabs([
-    "Vista general", 
-    "Categorías y tipos de delitos", 
-    "Comparar provincias", 
-    "Comparar departamentos", 
-    "Fuentes y metodología"
-])
+def selector_departamentos(label, key, provincias=None, multiple=False, default=None):
+    """
+    Selector de departamentos con búsqueda del lado del servidor: en lugar de
+    enviar los 500+ departamentos en cada rerun, se envían solo las mejores
+    coincidencias del texto buscado sobre el índice precomputado, más lo que
+    ya estaba seleccionado.
+    """
+    indice = consultas.load_indice_departamentos()
+    if provincias:
+        indice = indice.filter(pl.col("provincia_nombre").is_in(provincias))
+    validos = set(indice["depto_nombre_completo"])
+
+    texto = st.text_input(
+        "Buscar departamento", key=f"{key} búsqueda",
+        placeholder="Escribí parte del nombre"
+    )
+    coincidencias = busqueda.buscar_departamentos(indice, texto)
+
+    # Conservar la selección previa que siga siendo válida para las provincias
+    previa = st.session_state.get(key)
+    if multiple:
+        seleccion = [d for d in (previa or []) if d == 'Todos' or d in validos]
+        if not seleccion and (previa is None or previa) and default:
+            seleccion = [d for d in default if d in validos]
+    else:
+        seleccion = [previa] if previa in validos else []
+
+    opciones = ['Todos'] + list(dict.fromkeys(
+        d for d in seleccion + coincidencias if d != 'Todos'
+    ))
+
+    if multiple:
+        st.session_state[key] = seleccion
+        return st.multiselect(label, opciones, key=key)
+    st.session_state[key] = seleccion[0] if seleccion else 'Todos'
+    return st.selectbox(label, opciones, key=key)
+
+def mostrar_hallazgos(vista, columnas=2, titulo=None, **filtros):
+    """
+    Recuadros con los hallazgos precalculados de la versión (ver hallazgos.py)
+    que corresponden a los filtros de la pestaña, de a `columnas` por fila,
+    bajo `titulo` si se indica. Con selecciones múltiples no hay hallazgos y
+    no se muestra nada.
+    """
+    textos = hallazgos.buscar(consultas.load_hallazgos(), vista, **filtros)
+    if textos and titulo:
+        st.markdown(titulo)
+    if columnas == 1:
+        for texto in textos:
+            st.info(texto)
+        return
+    for inicio in range(0, len(textos), columnas):
+        for columna, texto in zip(st.columns(columnas, gap='medium'), textos[inicio:inicio + columnas]):
+            with columna:
+                st.info(texto)
+
+# Con DELITOS_NAVEGACION_DIFERIDA=1 las pestañas se reemplazan por un selector
+# horizontal y solo se ejecuta la vista elegida: Plotly y pandas se importan
+# recién cuando una vista con gráficos los necesita.
+NAVEGACION_DIFERIDA = os.environ.get("DELITOS_NAVEGACION_DIFERIDA", "0") == "1"
 
 # ---------------- TAB 1: VISTA GENERAL ---------------- #
-with tab1:
-    # NO clonar, usar directamente el LazyFrame
-    df = df_lazy  # <-- Eliminar .clone()
-    
+def vista_general():
     col1, col2 = st.columns([1, 4], gap="medium")
 
     with col1:
         st.markdown("**Filtros**")
 
-        # Optimizar consultas: collect solo lo necesario
-        años_disponibles = (
-            df.select(pl.col("anio").unique().sort(descending=True))
-            .collect()["anio"]
-            .to_list()
-        )
-        año_seleccionado = st.selectbox("Año", años_disponibles)
+        # Opciones de todos los filtros en una sola consulta cacheada
+        opciones = consultas.opciones_filtros()
+        años_disponibles = opciones["anios"]
+        año_seleccionado = st.selectbox("Año", años_disponibles, key='Año tab1')
 
-        # Usar fetch() en lugar de collect() para listas pequeñas
-        categorias_delito = ['Todas'] + (
-            df.select(pl.col("categoria_delito").unique().sort())
-            .collect()["categoria_delito"]
-            .to_list()
-        )
-        categoria_delito_seleccionadas = st.multiselect("Categorías", categorias_delito)
+        categorias_delito = ['Todas'] + opciones["categorias"]
+        categoria_delito_seleccionadas = st.multiselect("Categorías", categorias_delito, key='Categorías tab1')
         if 'Todas' in categoria_delito_seleccionadas or not categoria_delito_seleccionadas:
             categoria_delito_seleccionadas = ['Todas']
 
         # Tipos de delito
-        if 'Todas' in categoria_delito_seleccionadas:
-            tipos_disponibles = (
-                df.select(pl.col("codigo_delito_snic_nombre").unique().sort())
-                .collect()["codigo_delito_snic_nombre"]
-                .to_list()
-            )
-        else:
-            tipos_disponibles = (
-                df.filter(pl.col("categoria_delito").is_in(categoria_delito_seleccionadas))
-                .select(pl.col("codigo_delito_snic_nombre").unique().sort())
-                .collect()["codigo_delito_snic_nombre"]
-                .to_list()
-            )
+        tipos_disponibles = consultas.opciones_filtros(
+            consultas.seleccion(categoria_delito_seleccionadas, 'Todas')
+        )["tipos"]
 
         tipos_delito = ['Todos'] + tipos_disponibles
-        tipo_delito_seleccionados = st.multiselect("Tipo de delito", tipos_delito)
+        tipo_delito_seleccionados = st.multiselect("Tipo de delito", tipos_delito, key='Tipo de delito tab1')
         if 'Todos' in tipo_delito_seleccionados or not tipo_delito_seleccionados:
             tipo_delito_seleccionados = ['Todos']
 
         # Provincias
-        provincias_disponibles = ['Todas'] + (
-            df.select(pl.col("provincia_nombre").unique().sort())
-            .collect()["provincia_nombre"]
-            .to_list()
-        )
-        provincia_seleccionada = st.selectbox("Provincia", provincias_disponibles)
-
-        # Departamentos
-        if provincia_seleccionada != 'Todas':
-            departamentos_disponibles = (
-                df.filter(pl.col("provincia_nombre") == provincia_seleccionada)
-                .select(pl.col("depto_nombre_completo").unique().sort())
-                .collect()["depto_nombre_completo"]
-                .to_list()
-            )
-        else:
-            departamentos_disponibles = (
-                df.select(pl.col("depto_nombre_completo").unique().sort())
-                .collect()["depto_nombre_completo"]
-                .to_list()
-            )
+        provincias_disponibles = ['Todas'] + opciones["provincias"]
+        provincia_seleccionada = st.selectbox("Provincia", provincias_disponibles, key='Provincia tab1')
 
-        departamento = ['Todos'] + departamentos_disponibles
-        departamento_seleccionado = st.selectbox("Departamento", departamento)
+        # Departamentos: búsqueda sobre el índice precomputado
+        departamento_seleccionado = selector_departamentos(
+            "Departamento", "Departamento tab1",
+            provincias=None if provincia_seleccionada == 'Todas' else [provincia_seleccionada]
+        )
 
         st.divider()
         st.markdown("**Filtros aplicados**")
@@ -222,63 +197,37 @@ with tab1:
         • **Departamento:** {departamento_seleccionado}
         """)
 
+        # Filtros normalizados: las consultas cacheadas comparten entradas
+        filtros = dict(
+            categorias=consultas.seleccion(categoria_delito_seleccionadas, 'Todas'),
+            tipos=consultas.seleccion(tipo_delito_seleccionados, 'Todos'),
+            provincia=None if provincia_seleccionada == 'Todas' else provincia_seleccionada,
+            departamento=None if departamento_seleccionado == 'Todos' else departamento_seleccionado,
+        )
+
+        st.divider()
+        exportacion.selector_descarga(
+            "general",
+            filas=lambda: consultas.filas(
+                filtros["categorias"], filtros["tipos"],
+                provincias=(filtros["provincia"],) if filtros["provincia"] else (),
+                departamentos=(filtros["departamento"],) if filtros["departamento"] else (),
+            ),
+            agregado=lambda: consultas.serie_anual(**filtros).lazy(),
+        )
+
     with col2:
-        # Construir queries lazy sin materializar
-        df_filtered = df.filter(pl.col("anio") == año_seleccionado)
         año_anterior = año_seleccionado - 1
-        df_anterior = df.filter(pl.col("anio") == año_anterior)
-
-        # Aplicar filtros
-        if "Todas" not in categoria_delito_seleccionadas:
-            df_filtered = df_filtered.filter(pl.col("categoria_delito").is_in(categoria_delito_seleccionadas))
-            df_anterior = df_anterior.filter(pl.col("categoria_delito").is_in(categoria_delito_seleccionadas))
-
-        if "Todos" not in tipo_delito_seleccionados:
-            df_filtered = df_filtered.filter(pl.col("codigo_delito_snic_nombre").is_in(tipo_delito_seleccionados))
-            df_anterior = df_anterior.filter(pl.col("codigo_delito_snic_nombre").is_in(tipo_delito_seleccionados))
-
-        if departamento_seleccionado != "Todos":
-            df_filtered = df_filtered.filter(pl.col("depto_nombre_completo") == departamento_seleccionado)
-            df_anterior = df_anterior.filter(pl.col("depto_nombre_completo") == departamento_seleccionado)
-            col_poblacion = "poblacion_departamento"
-        elif provincia_seleccionada != "Todas":
-            df_filtered = df_filtered.filter(pl.col("provincia_nombre") == provincia_seleccionada)
-            df_anterior = df_anterior.filter(pl.col("provincia_nombre") == provincia_seleccionada)
-            col_poblacion = "poblacion_provincia"
-        else:
-            col_poblacion = "poblacion_pais"
-
-        # OPTIMIZACIÓN: Calcular métricas en una sola query agregada
-        metricas_año = df_filtered.select([
-            pl.col("cantidad_hechos").sum().alias("total_hechos"),
-            pl.col("cantidad_victimas").sum().alias("total_victimas"),
-            pl.col(col_poblacion).max().alias("poblacion")
-        ]).collect()
-
-        metricas_prev = df_anterior.select([
-            pl.col("cantidad_hechos").sum().alias("total_hechos"),
-            pl.col(col_poblacion).max().alias("poblacion")
-        ]).collect()
-
-        metricas_año = metricas_año.fill_null(0)
-        metricas_prev = metricas_prev.fill_null(0)
-
-        # Extraer valores
-        total_hechos = metricas_año["total_hechos"][0]
-        total_victimas = metricas_año["total_victimas"][0]
-        poblacion = metricas_año["poblacion"][0]
-        
-        total_hechos_prev = metricas_prev["total_hechos"][0]
-        poblacion_prev = metricas_prev["poblacion"][0]
 
-        # Liberar DataFrames inmediatamente
-        del metricas_año, metricas_prev
-        gc.collect()
+        resumen = consultas.resumen_anual(año_seleccionado, **filtros)
+        total_hechos = resumen["total_hechos"]
+        total_victimas = resumen["total_victimas"]
+        poblacion = resumen["poblacion"]
 
         # Cálculos
-        tasa = (total_hechos / poblacion) * 100000
-        tasa_prev = (total_hechos_prev / poblacion_prev) * 100000 if poblacion_prev != 0 else 0
-        variacion = ((tasa - tasa_prev) / tasa_prev) * 100 if tasa_prev != 0 else 0
+        indicadores = consultas.indicadores(resumen)
+        tasa = indicadores["tasa"]
+        variacion = indicadores["variacion"]
 
         st.markdown(f"#### Métricas {año_seleccionado}")
 
@@ -360,172 +309,114 @@ with tab1:
         # Gráficos de evolución 
         st.markdown("#### Evolución a lo largo de los años")
 
-        # NO clonar, construir query desde df original
-        df_graficos = df  # <-- Eliminar .clone()
-
-        # Aplicar filtros
-        if "Todas" not in categoria_delito_seleccionadas and categoria_delito_seleccionadas:
-            df_graficos = df_graficos.filter(pl.col("categoria_delito").is_in(categoria_delito_seleccionadas))
-
-        if "Todos" not in tipo_delito_seleccionados and tipo_delito_seleccionados:
-            df_graficos = df_graficos.filter(pl.col("codigo_delito_snic_nombre").is_in(tipo_delito_seleccionados))
-
-        if departamento_seleccionado != "Todos" and departamento_seleccionado:
-            df_graficos = df_graficos.filter(pl.col("depto_nombre_completo") == departamento_seleccionado)
-            poblacion_col = "poblacion_departamento"
-        elif provincia_seleccionada != "Todas" and provincia_seleccionada:
-            df_graficos = df_graficos.filter(pl.col("provincia_nombre") == provincia_seleccionada)
-            poblacion_col = "poblacion_provincia"
-        else:
-            poblacion_col = "poblacion_pais"
-
-        # Agrupar y calcular (lazy)
-        df_graficos = (
-            df_graficos
-            .group_by("anio")
-            .agg([
-                pl.col("cantidad_hechos").sum().alias("cantidad_hechos"),
-                pl.col(poblacion_col).first().alias("poblacion"),
-                pl.col("cantidad_victimas").sum().alias("cantidad_victimas"),
-            ])
-            .sort("anio")
-            .with_columns([
-                (pl.col("cantidad_hechos") / (pl.col("poblacion") / 100000)).alias("tasa_delitos"),
-            ])
-            .with_columns([
-                pl.col("tasa_delitos").shift(1).alias("tasa_delitos_anterior"),
-            ])
-            .with_columns([
-                ((pl.col("tasa_delitos") - pl.col("tasa_delitos_anterior")) / 
-                 pl.col("tasa_delitos_anterior")).alias("variacion"),
-            ])
-            .select([  # <-- Seleccionar solo columnas necesarias
-                "anio", "tasa_delitos", "variacion", "cantidad_hechos", "cantidad_victimas"
-            ])
-        )
-
-        # Materializar solo una vez
-        df_graficos_collected = df_graficos.collect()
-
-        min_anio = df_graficos_collected["anio"].min()
-        max_anio = df_graficos_collected["anio"].max()
+        # Serie anual cacheada para la misma combinación de filtros
+        df_graficos_collected = consultas.serie_anual(**filtros)
+
+        # Con grano mensual se suman la serie mensual y el perfil estacional,
+        # leídos de los rollups mensuales
+        mensual = consultas.tiene_mes()
+        constructores_mensuales = {}
+        if mensual:
+            df_mensual = consultas.serie_mensual(**filtros)
+            df_perfil = consultas.perfil_estacional(**filtros)
+            constructores_mensuales = {
+                "tab1_mensual": lambda: graficos.figura_linea_mensual(
+                    df_mensual, 'tasa_delitos', '#3fbbe2',
+                    "%{x|%b %Y}<br>Tasa de delitos  %{y:,.2f}<extra></extra>", ","
+                ),
+                "tab1_estacional": lambda: graficos.figura_perfil_estacional(df_perfil, '#7b59b3'),
+            }
+
+        figuras = graficos.construir_figuras({
+            **constructores_mensuales,
+            "tab1_tasa": lambda: graficos.figura_linea_anual(
+                df_graficos_collected, 'tasa_delitos', '#3fbbe2',
+                "Año  %{x}<br>Tasa de delitos  %{y:,.2f}<extra></extra>", ","
+            ),
+            "tab1_variacion": lambda: graficos.figura_linea_anual(
+                df_graficos_collected, 'variacion', '#7b59b3',
+                "Año  %{x}<br>Variación  %{y:.2%}<extra></extra>", ".0%",
+                linea_cero=True
+            ),
+            "tab1_delitos": lambda: graficos.figura_linea_anual(
+                df_graficos_collected, 'cantidad_hechos', '#df437e',
+                "Año  %{x}<br>Delitos  %{y:,.0f}<extra></extra>", ","
+            ),
+            "tab1_victimas": lambda: graficos.figura_linea_anual(
+                df_graficos_collected, 'cantidad_victimas', '#ef8154',
+                "Año  %{x}<br>Víctimas  %{y:,.0f}<extra></extra>", ","
+            ),
+        })
 
         col_graficos1, col_graficos2 = st.columns([1, 1], gap="medium")
 
         with col_graficos1:
             st.markdown("###### Tasa de delitos")
-            fig_evolucion = px.line(
-                df_graficos_collected, x='anio', y='tasa_delitos',
-                line_shape='spline', markers=True, color_discrete_sequence=['#3fbbe2']
-            )
-            fig_evolucion.update_layout(
-                xaxis_title="", yaxis_title="", showlegend=False,
-                plot_bgcolor='white', paper_bgcolor='white', font=dict(size=12),
-                height=200, margin=dict(l=0, r=30, t=0, b=0)
-            )
-            fig_evolucion.update_traces(
-                line=dict(width=3), marker=dict(size=8),
-                hovertemplate="Año  %{x}<br>Tasa de delitos  %{y:,.2f}<extra></extra>"
+            graficos.mostrar_grafico(
+                figuras["tab1_tasa"], "tab1_tasa",
+                use_container_width=False, config={"displayModeBar": False}
             )
-            fig_evolucion.update_xaxes(
-                range=[min_anio-0.5, max_anio+0.5], tick0=min_anio, dtick=3,
-                showgrid=True, gridcolor='lightgray'
-            )
-            fig_evolucion.update_yaxes(showgrid=True, gridcolor='lightgray', tickformat=",")
-            st.plotly_chart(fig_evolucion, use_container_width=False, config={"displayModeBar": False})
-            
-            # IMPORTANTE: Liberar figura
-            del fig_evolucion
-            
+
             st.markdown("###### Variación en la tasa de delitos")
-            fig_variacion = px.line(
-                df_graficos_collected, x='anio', y='variacion',
-                line_shape='spline', markers=True, color_discrete_sequence=['#7b59b3']
-            )
-            fig_variacion.update_layout(
-                xaxis_title="", yaxis_title="", showlegend=False,
-                plot_bgcolor='white', paper_bgcolor='white', font=dict(size=12),
-                height=200, margin=dict(l=0, r=30, t=0, b=0)
+            graficos.mostrar_grafico(
+                figuras["tab1_variacion"], "tab1_variacion",
+                use_container_width=True, config={"displayModeBar": False}
             )
-            fig_variacion.add_hline(y=0, line_dash="dash", line_color="darkgrey", line_width=2)
-            fig_variacion.update_traces(
-                line=dict(width=3), marker=dict(size=8),
-                hovertemplate="Año  %{x}<br>Variación  %{y:.2%}<extra></extra>"
-            )
-            fig_variacion.update_xaxes(
-                range=[min_anio-0.5, max_anio+0.5], tick0=min_anio, dtick=3,
-                showgrid=True, gridcolor='lightgray'
-            )
-            fig_variacion.update_yaxes(showgrid=True, gridcolor='lightgray', tickformat=".0%")
-            st.plotly_chart(fig_variacion, use_container_width=True, config={"displayModeBar": False})
-            
-            # Liberar figura
-            del fig_variacion
 
         with col_graficos2:
             st.markdown("###### Cantidad de delitos")
-            fig_delitos = px.line(
-                df_graficos_collected, x='anio', y='cantidad_hechos',
-                line_shape='spline', markers=True, color_discrete_sequence=['#df437e']
-            )
-            fig_delitos.update_layout(
-                xaxis_title="", yaxis_title="", showlegend=False,
-                plot_bgcolor='white', paper_bgcolor='white', font=dict(size=12),
-                height=200, margin=dict(l=0, r=30, t=0, b=0)
-            )
-            fig_delitos.update_traces(
-                line=dict(width=3), marker=dict(size=8),
-                hovertemplate="Año  %{x}<br>Delitos  %{y:,.0f}<extra></extra>"
+            graficos.mostrar_grafico(
+                figuras["tab1_delitos"], "tab1_delitos",
+                use_container_width=True, config={"displayModeBar": False}
             )
-            fig_delitos.update_xaxes(
-                range=[min_anio-0.5, max_anio+0.5], tick0=min_anio, dtick=3,
-                showgrid=True, gridcolor='lightgray'
-            )
-            fig_delitos.update_yaxes(showgrid=True, gridcolor='lightgray', tickformat=",")
-            st.plotly_chart(fig_delitos, use_container_width=True, config={"displayModeBar": False})
-            
-            del fig_delitos
 
             st.markdown("###### Cantidad de víctimas")
-            fig_victimas = px.line(
-                df_graficos_collected, x='anio', y='cantidad_victimas',
-                line_shape='spline', markers=True, color_discrete_sequence=['#ef8154']
-            )
-            fig_victimas.update_layout(
-                xaxis_title="", yaxis_title="", showlegend=False,
-                plot_bgcolor='white', paper_bgcolor='white', font=dict(size=12),
-                height=200, margin=dict(l=0, r=30, t=0, b=0)
-            )
-            fig_victimas.update_traces(
-                line=dict(width=3), marker=dict(size=8),
-                hovertemplate="Año  %{x}<br>Víctimas  %{y:,.0f}<extra></extra>"
-            )
-            fig_victimas.update_xaxes(
-                range=[min_anio-0.5, max_anio+0.5], tick0=min_anio, dtick=3,
-                showgrid=True, gridcolor='lightgray'
+            graficos.mostrar_grafico(
+                figuras["tab1_victimas"], "tab1_victimas",
+                use_container_width=True, config={"displayModeBar": False}
             )
-            fig_victimas.update_yaxes(showgrid=True, gridcolor='lightgray', tickformat=",")
-            st.plotly_chart(fig_victimas, use_container_width=True, config={"displayModeBar": False})
-            
-            del fig_victimas
+
+        if mensual:
+            st.markdown("#### Estacionalidad")
+            col_mensual1, col_mensual2 = st.columns([1, 1], gap="medium")
+
+            with col_mensual1:
+                st.markdown("###### Tasa de delitos mensual")
+                graficos.mostrar_grafico(
+                    figuras["tab1_mensual"], "tab1_mensual",
+                    use_container_width=True, config={"displayModeBar": False}
+                )
+
+            with col_mensual2:
+                st.markdown(f"###### Perfil estacional ({df_perfil['anios'].max() or 0} años completos)")
+                graficos.mostrar_grafico(
+                    figuras["tab1_estacional"], "tab1_estacional",
+                    use_container_width=True, config={"displayModeBar": False}
+                )
+                st.caption("Hechos de cada mes sobre el promedio mensual del año (1 = mes promedio); las barras de error marcan el mínimo y el máximo entre años.")
+
+            del df_mensual, df_perfil
+
+        # IMPORTANTE: Liberar figuras
+        del figuras
 
     # Liberar todo al final del tab
-    del df_graficos_collected, df_filtered, df_anterior
+    del df_graficos_collected
     gc.collect()
 
-    col_info1, col_info2 = st.columns([1, 1], gap = 'medium')
-
-    with col_info1:
-        st.info("Durante los últimos cuatro años, **la tasa de delitos creció a nivel nacional** y, en 2024, superó el pico que se había alcanzado en 2019, antes de la pandemia.")
-    with col_info2:
-        st.info("Si filtramos por **homicidios dolosos** como tipo de delito, se observa una tendencia a la baja: pasó de 7,50 cada 100.000 habitantes en 2014 a 3,68 en 2024.")
+    # Los hallazgos generales se calculan solo para el último año del dataset:
+    # se rotulan así para que no se lean como del año elegido en los filtros
+    ultimo_año = años_disponibles[0]
+    titulo = f"###### Hallazgos del último año disponible ({ultimo_año})"
+    if año_seleccionado != ultimo_año:
+        titulo += f" · los indicadores de arriba son de {año_seleccionado}"
+    mostrar_hallazgos("general", titulo=titulo, **filtros)
 
 # ---- Categorías y tipos de delito ----
 # ---- Categorías y tipos de delito ----
-with tab2:
-    # <CHANGE> Eliminar .clone() innecesario
-    df = df_lazy  # NO clonar, usar directamente
-    
+def vista_categorias():
+    px = graficos.plotly_express()  # diferido: solo al renderizar esta vista
+
     col1, col2 = st.columns([1, 4], gap="medium")
 
     # =======================
@@ -534,20 +425,12 @@ with tab2:
     with col1:
         st.markdown("**Filtros**")
 
-        # Año - Optimizar query
-        años_disponibles = (
-            df.select(pl.col("anio").unique().sort(descending=True))
-            .collect()["anio"]
-            .to_list()
-        )
+        # Opciones de todos los filtros en una sola consulta cacheada
+        opciones = consultas.opciones_filtros()
+        años_disponibles = opciones["anios"]
         año_seleccionado = st.selectbox("Año", años_disponibles, key='Año tab2')
 
-        # Categorías - Optimizar query
-        categorias_delito = ['Todas'] + (
-            df.select(pl.col("categoria_delito").unique().sort())
-            .collect()["categoria_delito"]
-            .to_list()
-        )
+        categorias_delito = ['Todas'] + opciones["categorias"]
         categoria_delito_seleccionadas = st.multiselect(
             "Categorías", categorias_delito, key='Categorías tab2'
         )
@@ -555,19 +438,9 @@ with tab2:
             categoria_delito_seleccionadas = ['Todas']
 
         # Tipos de delito
-        if 'Todas' in categoria_delito_seleccionadas:
-            tipos_disponibles = (
-                df.select(pl.col("codigo_delito_snic_nombre").unique().sort())
-                .collect()["codigo_delito_snic_nombre"]
-                .to_list()
-            )
-        else:
-            tipos_disponibles = (
-                df.filter(pl.col("categoria_delito").is_in(categoria_delito_seleccionadas))
-                .select(pl.col("codigo_delito_snic_nombre").unique().sort())
-                .collect()["codigo_delito_snic_nombre"]
-                .to_list()
-            )
+        tipos_disponibles = consultas.opciones_filtros(
+            consultas.seleccion(categoria_delito_seleccionadas, 'Todas')
+        )["tipos"]
         
         tipos_delito = ['Todos'] + tipos_disponibles
         tipo_delito_seleccionados = st.multiselect(
@@ -577,29 +450,13 @@ with tab2:
             tipo_delito_seleccionados = ['Todos']
 
         # Provincia y departamento
-        provincias_disponibles = ['Todas'] + (
-            df.select(pl.col("provincia_nombre").unique().sort())
-            .collect()["provincia_nombre"]
-            .to_list()
-        )
+        provincias_disponibles = ['Todas'] + opciones["provincias"]
         provincia_seleccionada = st.selectbox("Provincia", provincias_disponibles, key='Provincia tab2')
 
-        if provincia_seleccionada != 'Todas':
-            departamentos_disponibles = (
-                df.filter(pl.col("provincia_nombre") == provincia_seleccionada)
-                .select(pl.col("depto_nombre_completo").unique().sort())
-                .collect()["depto_nombre_completo"]
-                .to_list()
-            )
-        else:
-            departamentos_disponibles = (
-                df.select(pl.col("depto_nombre_completo").unique().sort())
-                .collect()["depto_nombre_completo"]
-                .to_list()
-            )
-        
-        departamento = ['Todos'] + departamentos_disponibles
-        departamento_seleccionado = st.selectbox("Departamento", departamento, key='Departamento tab2')
+        departamento_seleccionado = selector_departamentos(
+            "Departamento", "Departamento tab2",
+            provincias=None if provincia_seleccionada == 'Todas' else [provincia_seleccionada]
+        )
 
         st.divider()
         st.markdown("**Filtros aplicados**")
@@ -614,35 +471,52 @@ with tab2:
         
         • **Departamento:** {departamento_seleccionado}
         """)
+
+        st.divider()
+        filas_vista = lambda: consultas.filas(
+            consultas.seleccion(categoria_delito_seleccionadas, 'Todas'),
+            consultas.seleccion(tipo_delito_seleccionados, 'Todos'),
+            provincias=() if provincia_seleccionada == 'Todas' else (provincia_seleccionada,),
+            departamentos=() if departamento_seleccionado == 'Todos' else (departamento_seleccionado,),
+            anio=año_seleccionado,
+        )
+        exportacion.selector_descarga(
+            "categorias",
+            filas=filas_vista,
+            agregado=lambda: (
+                filas_vista()
+                .group_by(["categoria_delito", "codigo_delito_snic_nombre"])
+                .agg([
+                    pl.col("cantidad_hechos").sum(),
+                    pl.col("cantidad_victimas").sum(),
+                ])
+                .sort("cantidad_hechos", descending=True)
+            ),
+        )
     
     # =======================
     # FILTRO DE DATOS
     # =======================
     with col2:
-        st.info("En 2024, más de la mitad de los delitos correspondieron a **delitos contra la propiedad,** principalmente robos y hurtos.")
-
-        # <CHANGE> NO clonar df_lazy, construir query directamente
-        df_filtrado = df_lazy.filter(pl.col("anio") == año_seleccionado)
-
-        # Aplicar filtros de manera lazy
-        if 'Todas' not in categoria_delito_seleccionadas:
-            df_filtrado = df_filtrado.filter(
-                pl.col("categoria_delito").is_in(categoria_delito_seleccionadas)
-            )
-
-        if 'Todos' not in tipo_delito_seleccionados:
-            df_filtrado = df_filtrado.filter(
-                pl.col("codigo_delito_snic_nombre").is_in(tipo_delito_seleccionados)
-            )
+        mostrar_hallazgos(
+            "categorias", anio=año_seleccionado,
+            categorias=consultas.seleccion(categoria_delito_seleccionadas, 'Todas'),
+            tipos=consultas.seleccion(tipo_delito_seleccionados, 'Todos'),
+            provincia=None if provincia_seleccionada == 'Todas' else provincia_seleccionada,
+            departamento=None if departamento_seleccionado == 'Todos' else departamento_seleccionado,
+        )
 
-        if departamento_seleccionado != 'Todos':
-            df_filtrado = df_filtrado.filter(
-                pl.col("depto_nombre_completo") == departamento_seleccionado
-            )
-        elif provincia_seleccionada != 'Todas':
-            df_filtrado = df_filtrado.filter(
-                pl.col("provincia_nombre") == provincia_seleccionada
-            )
+        # Jerarquía categoría → tipo con subtotales en una sola agregación,
+        # cacheada por combinación de filtros; los top 5 salen de la misma tabla
+        df_distribucion = consultas.distribucion_delitos(
+            año_seleccionado,
+            categorias=consultas.seleccion(categoria_delito_seleccionadas, 'Todas'),
+            tipos=consultas.seleccion(tipo_delito_seleccionados, 'Todos'),
+            provincia=None if provincia_seleccionada == 'Todas' else provincia_seleccionada,
+            departamento=None if departamento_seleccionado == 'Todos' else departamento_seleccionado,
+        )
+        df_categoria = consultas.por_nivel(df_distribucion, "categoria")
+        df_tipo = consultas.por_nivel(df_distribucion, "tipo")
 
         # =======================
         # FUNCIÓN PARA GRAFICOS (OPTIMIZADA)
@@ -656,7 +530,7 @@ with tab2:
             df_grouped = df_grouped.with_columns(pl.col(col_value).cast(pl.Float64))
 
             # <CHANGE> Calcular total y verificar en una sola operación
-            total_result = df_grouped.select(pl.sum(col_value)).collect()
+            total_result = df_grouped.select(pl.sum(col_value)).pipe(metricas.recolectar, f"tab2_total_{col_name_short}")
             total = total_result[0, 0]
             del total_result  # Liberar inmediatamente
             
@@ -666,89 +540,81 @@ with tab2:
                 gc.collect()
                 return
 
-            # Calcular porcentaje y truncar nombres (lazy)
-            MAX_LEN = 28
+            # Calcular porcentaje (lazy); el nombre corto sale de la dimensión,
+            # unida solo a las 5 filas del gráfico
             df_grouped = (
                 df_grouped
                 .with_columns((pl.col(col_value) / total).alias("porcentaje"))
-                .with_columns(
-                    pl.when(pl.col(col_name_full).cast(pl.Utf8).str.len_chars() <= MAX_LEN)
-                    .then(pl.col(col_name_full).cast(pl.Utf8))
-                    .otherwise(pl.col(col_name_full).cast(pl.Utf8).str.slice(0, MAX_LEN - 2) + "…")
-                    .alias(col_name_short)
-                )
                 .sort("porcentaje", descending=True)
                 .head(5)
+                .pipe(consultas.etiquetas, col_name_full)
             )
 
             # <CHANGE> Materializar solo el top 5 y convertir a pandas
-            top5_pd = df_grouped.collect().to_pandas()
+            top5_pd = df_grouped.pipe(metricas.recolectar, f"tab2_top5_{col_name_short}").to_pandas()
             
             # Liberar df_grouped inmediatamente
             del df_grouped
             gc.collect()
 
-            # Agregar columna de texto con porcentaje
-            top5_pd["porcentaje_text"] = (
-                top5_pd["porcentaje"].mul(100).round(1).astype(str) + "%"
-            )
-
             # Crear gráfico
-            fig = px.bar(
-                top5_pd,
-                x="porcentaje",
-                y=col_name_short,
-                orientation="h",
-                color="porcentaje",
-                color_continuous_scale=["#c5b6dc", "#7b59b3"],
-                text="porcentaje_text",
-                custom_data=[col_name_full, col_value, "porcentaje"]
-            )
+            with metricas.medir("figura", f"tab2_{col_name_short}"):
+                fig = px.bar(
+                    top5_pd,
+                    x="porcentaje",
+                    y=col_name_short,
+                    orientation="h",
+                    color="porcentaje",
+                    color_continuous_scale=["#c5b6dc", "#7b59b3"],
+                    hover_name=col_name_full,
+                    custom_data=[col_value]
+                )
 
-            fig.update_traces(
-                textposition="inside",
-                insidetextanchor="start",
-                textfont=dict(color="white"),
-                texttemplate="  %{text}",
-                hovertemplate="<b>%{customdata[0]}</b><br>" +
-                            "Porcentaje: %{customdata[2]:.2%}<br>" +
-                            "Cantidad de delitos: %{customdata[1]:,}<extra></extra>"
-            )
+                fig.update_traces(
+                    textposition="inside",
+                    insidetextanchor="start",
+                    textfont=dict(color="white"),
+                    texttemplate="  %{x:.1%}",
+                    hovertemplate="<b>%{hovertext}</b><br>" +
+                                "Porcentaje: %{x:.2%}<br>" +
+                                "Cantidad de delitos: %{customdata[0]:,}<extra></extra>"
+                )
 
-            fig.update_layout(
-                xaxis_title="",
-                yaxis_title="",
-                showlegend=False,
-                plot_bgcolor="white",
-                paper_bgcolor="white",
-                font=dict(size=10),
-                height=len(top5_pd) * 30,
-                yaxis={"categoryorder": "total ascending"},
-                margin=dict(l=0, r=0, t=0, b=0),
-                xaxis=dict(visible=False),
-                bargap=0.2,
-                barcornerradius=5
-            )
+                fig.update_layout(
+                    xaxis_title="",
+                    yaxis_title="",
+                    showlegend=False,
+                    plot_bgcolor="white",
+                    paper_bgcolor="white",
+                    font=dict(size=10),
+                    height=len(top5_pd) * 30,
+                    yaxis={"categoryorder": "total ascending"},
+                    margin=dict(l=0, r=0, t=0, b=0),
+                    xaxis=dict(visible=False),
+                    bargap=0.2,
+                    barcornerradius=5
+                )
 
-            fig.update_coloraxes(showscale=False)
-            fig.update_xaxes(
-                tickformat=".0%",
-                showgrid=True,
-                gridcolor="lightgrey",
-                gridwidth=0.5
-            )
+                fig.update_coloraxes(showscale=False)
+                fig.update_xaxes(
+                    tickformat=".0%",
+                    showgrid=True,
+                    gridcolor="lightgrey",
+                    gridwidth=0.5
+                )
 
-            fig.add_shape(
-                type="line",
-                x0=0, x1=0,
-                y0=-0.5, y1=len(top5_pd) - 0.5,
-                line=dict(color="lightgrey", width=1)
-            )
+                fig.add_shape(
+                    type="line",
+                    x0=0, x1=0,
+                    y0=-0.5, y1=len(top5_pd) - 0.5,
+                    line=dict(color="lightgrey", width=1)
+                )
 
             # Render del gráfico
             st.markdown(f"###### {title}")
-            st.plotly_chart(
-                fig, 
+            graficos.mostrar_grafico(
+                fig,
+                f"tab2_{col_name_short}",
                 use_container_width=True, 
                 config={"displayModeBar": False}, 
                 key=f"{title}_{col_value}"
@@ -761,24 +627,9 @@ with tab2:
         # =======================
         # GRÁFICOS
         # =======================
-        # <CHANGE> Preparar queries lazy sin materializar
-        df_categoria = (
-            df_filtrado
-            .group_by("categoria_delito")
-            .agg(pl.sum("cantidad_hechos").alias("cantidad_hechos"))
-            .with_columns(pl.col("categoria_delito").cast(pl.Utf8))
-        )
-
-        df_tipo = (
-            df_filtrado
-            .group_by("codigo_delito_snic_nombre")
-            .agg(pl.sum("cantidad_hechos").alias("cantidad_hechos"))
-            .with_columns(pl.col("codigo_delito_snic_nombre").cast(pl.Utf8))
-        )
-
         # Generar gráficos (la función plot_top5 maneja la materialización y limpieza)
         plot_top5(
-            df_categoria, 
+            df_categoria.lazy(), 
             "cantidad_hechos", 
             "categoria_delito_short", 
             "categoria_delito", 
@@ -786,7 +637,7 @@ with tab2:
         )
         
         plot_top5(
-            df_tipo, 
+            df_tipo.lazy(), 
             "cantidad_hechos", 
             "tipo_delito_short", 
             "codigo_delito_snic_nombre", 
@@ -794,24 +645,34 @@ with tab2:
         )
 
         # =======================
-        # INFO ADICIONAL
+        # COMPOSICIÓN JERÁRQUICA
         # =======================
-        st.info("Si filtramos por **Salta**, podemos notar que, **en 2024, el 24% de los delitos registrados en la provincia correspondieron a contravenciones**, en contraste con el 4% a nivel nacional. Es importante señalar que las contravenciones son faltas menores que no se reportan de manera uniforme entre las provincias, es decir, se trata de una categoría **heterogénea** entre jurisdicciones.")
-        
-        st.info("Si filtramos por **Salta** y por la categoría **Delitos contra la propiedad**, vemos que, en 2024, en esta provincia, el 36.1% de los delitos de esta categoría correspondieron a hurtos y el 32.6% a robos (excluyendo los agravados por resultado de lesiones y/o muertes).")
-
-        st.info("En la pestaña _Comparar departamentos_, se observa que **Tordillo (Buenos Aires)** registró la mayor tasa de delitos en 2024. En esta pestaña, al filtrar por este departamento, puede verse que el 94% corresponden a **tenencia simple atenuada para uso personal de estupefacientes.**")
+        if df_distribucion.height > 1:
+            col_titulo_jerarquia, col_tipo_jerarquia = st.columns([3, 1])
+            with col_titulo_jerarquia:
+                st.markdown("###### Composición por categoría y tipo de delito")
+            with col_tipo_jerarquia:
+                tipo_jerarquia = st.radio(
+                    "Gráfico", ["Treemap", "Sunburst"], horizontal=True,
+                    key='Jerarquía tab2', label_visibility="collapsed"
+                )
+            with metricas.medir("figura", "tab2_jerarquia"):
+                fig_jerarquia = graficos.figura_jerarquia(df_distribucion, tipo_jerarquia.lower())
+            graficos.mostrar_grafico(
+                fig_jerarquia, "tab2_jerarquia", use_container_width=True,
+                config={"displayModeBar": False}
+            )
+            del fig_jerarquia
 
     # <CHANGE> Liberar toda la memoria al final del tab
-    del df_filtrado
+    del df_distribucion, df_categoria, df_tipo
     gc.collect()
 
 # ---- Comparar provincias ----
 # ---- Comparar provincias ----
-with tab3:
-    # <CHANGE> Eliminar .clone() innecesario
-    df = df_lazy  # NO clonar, usar directamente
-    
+def vista_provincias():
+    px = graficos.plotly_express()  # diferido: solo al renderizar esta vista
+
     col1, col2 = st.columns([1, 4], gap="medium")
 
     # =======================
@@ -820,39 +681,21 @@ with tab3:
     with col1:
         st.markdown("**Filtros**")
 
-        # Optimizar queries de filtros
-        años_disponibles = (
-            df.select(pl.col('anio').unique().sort(descending=True))
-            .collect()["anio"]
-            .to_list()
-        )
+        # Opciones de todos los filtros en una sola consulta cacheada
+        opciones = consultas.opciones_filtros()
+        años_disponibles = opciones["anios"]
         año_seleccionado = st.selectbox("Año", años_disponibles, key='Año tab3')
 
-        categorias_delito = (
-            df.select(pl.col('categoria_delito').unique().sort())
-            .collect()["categoria_delito"]
-            .to_list()
-        )
+        categorias_delito = opciones["categorias"]
         categoria_delito_seleccionadas = st.multiselect(
             "Categorías", categorias_delito, key='Categorías tab3'
         )
         if 'Todas' in categoria_delito_seleccionadas or not categoria_delito_seleccionadas:
             categoria_delito_seleccionadas = ['Todas']
 
-        # <CHANGE> Eliminar .lazy() redundante - df ya es LazyFrame
-        if 'Todas' in categoria_delito_seleccionadas:
-            tipos_disponibles = (
-                df.select(pl.col('codigo_delito_snic_nombre').unique().sort())
-                .collect()["codigo_delito_snic_nombre"]
-                .to_list()
-            )
-        else:
-            tipos_disponibles = (
-                df.filter(pl.col("categoria_delito").is_in(categoria_delito_seleccionadas))
-                .select(pl.col("codigo_delito_snic_nombre").unique().sort())
-                .collect()["codigo_delito_snic_nombre"]
-                .to_list()
-            )
+        tipos_disponibles = consultas.opciones_filtros(
+            consultas.seleccion(categoria_delito_seleccionadas, 'Todas')
+        )["tipos"]
 
         tipos_delito = ['Todos'] + tipos_disponibles
         tipo_delito_seleccionados = st.multiselect(
@@ -861,10 +704,6 @@ with tab3:
         if 'Todos' in tipo_delito_seleccionados or not tipo_delito_seleccionados:
             tipo_delito_seleccionados = ['Todos']
 
-        st.divider()
-        st.info("Al seleccionar la categoría de **contrabando,** puede observarse que las provincias del **norte** presentan las mayores tasas.")
-        st.info("Filtrando por **siembra y producción de estupefacientes** como tipo de delito, vemos que, en 2024, **La Pampa** tuvo la mayor tasa para este tipo de delito, mientras que, en 2022 y 2023, fue **San Luis**.")
-        
         st.divider()
         st.markdown("**Filtros aplicados**")
         st.markdown(f"""
@@ -875,8 +714,20 @@ with tab3:
         • **Tipos de delito:** {", ".join([str(delito) for delito in tipo_delito_seleccionados])}
         """)
 
-        st.divider()
-        st.info("Si utilizamos los gráficos de evolución para **comparar la tasa de delitos general de Santa Fe y Salta**, podemos ver que Santa Fe se ha mantenido relativamente estable durante los últimos 11 años, mientras que Salta muestra un comportamiento más volátil y una tendencia creciente.")
+        exportacion.selector_descarga(
+            "provincias",
+            filas=lambda: consultas.filas(
+                consultas.seleccion(categoria_delito_seleccionadas, 'Todas'),
+                consultas.seleccion(tipo_delito_seleccionados, 'Todos'),
+            ),
+            agregado=lambda: consultas.evolucion_provincias(
+                categorias=consultas.seleccion(categoria_delito_seleccionadas, 'Todas'),
+                tipos=consultas.seleccion(tipo_delito_seleccionados, 'Todos'),
+            ).lazy().select([
+                "anio", "provincia_nombre", "cantidad_hechos", "poblacion_provincia",
+                "tasa_delitos", "variacion",
+            ]),
+        )
 
 
     # =======================
@@ -884,93 +735,26 @@ with tab3:
     # =======================
     with col2:
         st.markdown(f"#### Comparación de la tasa de delitos por provincia")
-        st.info(f"En 2024, Salta fue la provincia con mayor tasa de delitos.")
-
-        # <CHANGE> Construir query lazy sin materializar
-        df_filtrado = df.select([
-            "anio", "categoria_delito", "codigo_delito_snic_nombre",
-            "provincia_nombre", "cantidad_hechos", "poblacion_provincia"
-        ])
-
-        # Aplicar filtros en modo lazy
-        if "Todas" not in categoria_delito_seleccionadas:
-            df_filtrado = df_filtrado.filter(
-                pl.col("categoria_delito").is_in(categoria_delito_seleccionadas)
-            )
-
-        if "Todos" not in tipo_delito_seleccionados:
-            df_filtrado = df_filtrado.filter(
-                pl.col("codigo_delito_snic_nombre").is_in(tipo_delito_seleccionados)
-            )
-
-        # <CHANGE> Construir df_evolucion completamente en modo lazy
-        df_evolucion = (
-            df_filtrado
-            .group_by(["anio", "provincia_nombre"])
-            .agg([
-                pl.col("cantidad_hechos").sum().alias("cantidad_hechos"),
-                pl.col("poblacion_provincia").first().alias("poblacion_provincia")
-            ])
-            .with_columns([
-                ((pl.col("cantidad_hechos") / (pl.col("poblacion_provincia") / 100_000))
-                 .round(2)
-                 .alias("tasa_delitos"))
-            ])
-            .with_columns([
-                pl.col("provincia_nombre").cast(pl.Utf8).alias("provincia_nombre_str")
-            ])
+        mostrar_hallazgos(
+            "provincias", anio=año_seleccionado,
+            categorias=consultas.seleccion(categoria_delito_seleccionadas, 'Todas'),
+            tipos=consultas.seleccion(tipo_delito_seleccionados, 'Todos'),
         )
 
-        # Liberar df_filtrado inmediatamente
-        del df_filtrado
-        gc.collect()
-
-        # Definir reemplazos
-        replacements_espacio = {
-            "Tierra del Fuego, Antártida e Islas del Atlántico Sur": "Tierra del Fuego",
-            "Ciudad Autónoma de Buenos Aires": "CABA"
-        }
-
-        replacements_mapa = {
-            "Tierra del Fuego, Antártida e Islas del Atlántico Sur": "Tierra del Fuego",
-            "Ciudad Autónoma de Buenos Aires": "Ciudad de Buenos Aires"
-        }
-
-        # <CHANGE> Aplicar transformaciones en modo lazy
-        MAX_LEN = 28
-        df_evolucion = (
-            df_evolucion
-            .with_columns([
-                pl.col("provincia_nombre_str").replace(replacements_espacio).alias("provincia_nombre_espacio"),
-                pl.col("provincia_nombre_str").replace(replacements_espacio).alias("provincia_nombre_short"),
-                pl.col("provincia_nombre_str").replace(replacements_mapa).alias("provincia_nombre_mapa")
-            ])
-            .with_columns([
-                pl.when(pl.col("provincia_nombre_short").str.len_chars() <= MAX_LEN)
-                .then(pl.col("provincia_nombre_short"))
-                .otherwise(pl.col("provincia_nombre_short").str.slice(0, MAX_LEN - 2) + "...")
-                .alias("provincia_nombre_short")
-            ])
-            .sort(["provincia_nombre", "anio"])
-            .with_columns([
-                pl.col("tasa_delitos").shift(1).over("provincia_nombre").alias("tasa_delitos_anterior")
-            ])
-            .with_columns([
-                ((pl.col("tasa_delitos") - pl.col("tasa_delitos_anterior")) / 
-                 pl.col("tasa_delitos_anterior")).alias("variacion")
-            ])
-        )
+        # <CHANGE> Evolución completa (todos los años y provincias), cacheada
+        # por categorías y tipos; el año y las provincias se filtran acá
+        df_evolucion = consultas.evolucion_provincias(
+            categorias=consultas.seleccion(categoria_delito_seleccionadas, 'Todas'),
+            tipos=consultas.seleccion(tipo_delito_seleccionados, 'Todos'),
+        ).lazy()
 
         # <CHANGE> Filtrar año seleccionado en lazy y materializar solo ese subset
         df_año_seleccionado = (
             df_evolucion
             .filter(pl.col("anio") == año_seleccionado)
-            .with_columns([
-                pl.col("provincia_nombre_short").cast(pl.Utf8),
-                pl.col("provincia_nombre_mapa").cast(pl.Utf8),
-                pl.col("provincia_nombre").cast(pl.Utf8)
-            ])
-            .collect()  # Materializar solo el año seleccionado
+            .pipe(consultas.etiquetas, "provincia_nombre")
+            .with_columns(pl.col("provincia_nombre").cast(pl.Utf8))
+            .pipe(metricas.recolectar, "tab3_anio")  # Materializar solo el año seleccionado
             .to_pandas()  # Convertir a pandas para Plotly
         )
 
@@ -985,39 +769,39 @@ with tab3:
         # =======================
         with col_ranking:
             st.markdown("###### Tasa de delitos por provincia")
-            fig_ranking = px.bar(
-                df_año_seleccionado,
-                x='tasa_delitos',
-                y='provincia_nombre_short',
-                orientation='h',
-                color='tasa_delitos',
-                color_continuous_scale=custom_colorscale,
-                text='tasa_delitos',
-                custom_data=["provincia_nombre", "cantidad_hechos", "tasa_delitos", 
-                            "poblacion_provincia", "anio"]
-            )
-            fig_ranking.update_traces(
-                textposition="inside",
-                insidetextanchor="start",
-                textfont=dict(color="white"),
-                texttemplate="  %{text:,.2f}",
-                hovertemplate="<b>%{customdata[0]}</b><br>" +
-                              "Tasa de delitos: %{customdata[2]:,.2f}<br>" +
-                              "Cantidad de delitos: %{customdata[1]:,}<br>" +
-                              "Población %{customdata[4]}: %{customdata[3]:,}<extra></extra>"
-            )
-            fig_ranking.update_layout(
-                xaxis_title="", yaxis_title="",
-                showlegend=False, plot_bgcolor='white', paper_bgcolor='white',
-                font=dict(size=10), height=altura_grafico,
-                yaxis={'categoryorder': 'total ascending'},
-                margin=dict(l=0, r=0, t=0, b=0),
-                xaxis=dict(visible=False),
-                barcornerradius=5
-            )
-            fig_ranking.update_coloraxes(showscale=False)
-            fig_ranking.update_xaxes(showgrid=True, gridcolor="lightgrey", gridwidth=0.5)
-            st.plotly_chart(fig_ranking, use_container_width=True, 
+            with metricas.medir("figura", "tab3_ranking"):
+                fig_ranking = px.bar(
+                    df_año_seleccionado,
+                    x='tasa_delitos',
+                    y='provincia_nombre_short',
+                    orientation='h',
+                    color='tasa_delitos',
+                    color_continuous_scale=custom_colorscale,
+                    hover_name="provincia_nombre",
+                    custom_data=["cantidad_hechos", "poblacion_provincia"]
+                )
+                fig_ranking.update_traces(
+                    textposition="inside",
+                    insidetextanchor="start",
+                    textfont=dict(color="white"),
+                    texttemplate="  %{x:,.2f}",
+                    hovertemplate="<b>%{hovertext}</b><br>" +
+                                  "Tasa de delitos: %{x:,.2f}<br>" +
+                                  "Cantidad de delitos: %{customdata[0]:,}<br>" +
+                                  f"Población {año_seleccionado}: " + "%{customdata[1]:,}<extra></extra>"
+                )
+                fig_ranking.update_layout(
+                    xaxis_title="", yaxis_title="",
+                    showlegend=False, plot_bgcolor='white', paper_bgcolor='white',
+                    font=dict(size=10), height=altura_grafico,
+                    yaxis={'categoryorder': 'total ascending'},
+                    margin=dict(l=0, r=0, t=0, b=0),
+                    xaxis=dict(visible=False),
+                    barcornerradius=5
+                )
+                fig_ranking.update_coloraxes(showscale=False)
+                fig_ranking.update_xaxes(showgrid=True, gridcolor="lightgrey", gridwidth=0.5)
+            graficos.mostrar_grafico(fig_ranking, "tab3_ranking", use_container_width=True, 
                           config={"displayModeBar": False})
             
             # <CHANGE> Liberar figura inmediatamente
@@ -1029,37 +813,39 @@ with tab3:
         # =======================
         with col_mapa:
             st.markdown("###### Mapa de delitos por provincia")
-
-            fig_mapa = px.choropleth_mapbox(
-                df_año_seleccionado,
-                geojson=argentina_geo,
-                featureidkey="properties.name",
-                locations="provincia_nombre_mapa",
-                color="tasa_delitos",
-                color_continuous_scale=["#a5c6d9", "#1473a6"],
-                mapbox_style="white-bg",
-                opacity=0.7,
-                hover_data=["provincia_nombre", "cantidad_hechos", "tasa_delitos", 
-                           "poblacion_provincia", "anio"],
-                labels={"tasa_delitos": "Tasa de delitos"}
-            )
-            fig_mapa.update_traces(
-                hovertemplate="<b>%{customdata[0]}</b><br>" +
-                            "Tasa de delitos: %{customdata[2]:,.2f}<br>" +
-                            "Cantidad de delitos: %{customdata[1]:,}<br>" +
-                            "Población %{customdata[4]}: %{customdata[3]:,}<extra></extra>"
-            )
-            fig_mapa.update_layout(
-                margin={"r": 0, "t": 0, "l": 0, "b": 0},
-                height=altura_mapa,
-                coloraxis_showscale=False,
-                mapbox=dict(
-                    style="white-bg",
-                    center={"lat": -39.5, "lon": -64.0},
-                    zoom=3
-                ),
-            )
-            st.plotly_chart(fig_mapa, use_container_width=True)
+            argentina_geo = consultas.load_geojson()
+
+            with metricas.medir("figura", "tab3_mapa"):
+                fig_mapa = px.choropleth_mapbox(
+                    df_año_seleccionado,
+                    geojson=argentina_geo,
+                    featureidkey="properties.name",
+                    locations="provincia_nombre_mapa",
+                    color="tasa_delitos",
+                    color_continuous_scale=["#a5c6d9", "#1473a6"],
+                    mapbox_style="white-bg",
+                    opacity=0.7,
+                    hover_name="provincia_nombre",
+                    custom_data=["cantidad_hechos", "poblacion_provincia"],
+                    labels={"tasa_delitos": "Tasa de delitos"}
+                )
+                fig_mapa.update_traces(
+                    hovertemplate="<b>%{hovertext}</b><br>" +
+                                "Tasa de delitos: %{z:,.2f}<br>" +
+                                "Cantidad de delitos: %{customdata[0]:,}<br>" +
+                                f"Población {año_seleccionado}: " + "%{customdata[1]:,}<extra></extra>"
+                )
+                fig_mapa.update_layout(
+                    margin={"r": 0, "t": 0, "l": 0, "b": 0},
+                    height=altura_mapa,
+                    coloraxis_showscale=False,
+                    mapbox=dict(
+                        style="white-bg",
+                        center={"lat": -39.5, "lon": -64.0},
+                        zoom=3
+                    ),
+                )
+            graficos.mostrar_grafico(fig_mapa, "tab3_mapa", use_container_width=True)
             
             # <CHANGE> Liberar figura inmediatamente
             del fig_mapa
@@ -1074,11 +860,7 @@ with tab3:
         # =======================
         st.markdown(f"#### Evolución a lo largo de los años")
 
-        provincias_disponibles = ['Todas'] + (
-            df.select(pl.col('provincia_nombre').unique().sort())
-            .collect()["provincia_nombre"]
-            .to_list()
-        )
+        provincias_disponibles = ['Todas'] + consultas.opciones_filtros()["provincias"]
         provincia_seleccionada = st.multiselect(
             "Seleccionar provincias", 
             provincias_disponibles,  
@@ -1097,18 +879,11 @@ with tab3:
                 pl.col("provincia_nombre").is_in(provincia_seleccionada)
             )
 
-        # Aplicar mapeo de nombres
-        nombre_mapeo = {
-            "Ciudad Autónoma de Buenos Aires": "CABA",
-            "Tierra del Fuego, Antártida e Islas del Atlántico Sur": "Tierra del fuego"
-        }
-
-        df_evolucion_filtrado = df_evolucion_filtrado.with_columns(
-            pl.col("provincia_nombre").replace(nombre_mapeo).alias("provincia_nombre_short")
-        )
+        # Nombres cortos de la dimensión, solo para las provincias graficadas
+        df_evolucion_filtrado = df_evolucion_filtrado.pipe(consultas.etiquetas, "provincia_nombre")
 
         # <CHANGE> Materializar solo ahora que tenemos todos los filtros aplicados
-        df_evolucion_pd = df_evolucion_filtrado.collect().to_pandas()
+        df_evolucion_pl = df_evolucion_filtrado.pipe(metricas.recolectar, "tab3_evolucion")
 
         # Definir colores
         colors = [
@@ -1120,61 +895,24 @@ with tab3:
         ]
 
         # Gráfico de evolución de tasa
-        fig_evolucion = px.line(
-            df_evolucion_pd, 
-            x='anio', 
-            y='tasa_delitos',
-            line_shape='spline',
-            markers=True,
-            color='provincia_nombre_short',  
-            custom_data=["provincia_nombre", "anio", "tasa_delitos", 
-                        "cantidad_hechos", "poblacion_provincia"],
-            color_discrete_sequence=colors,
-            title=""
-        )
-
-        for trace in fig_evolucion.data:
-            color = trace.line.color
-            trace.hovertemplate = (
-                f"<b><span style='color:{color}'>%{{customdata[0]}}</span></b><br>" +
-                "Año %{customdata[1]}<br>" +
-                "Tasa de delitos: %{customdata[2]:,.2f}<br>" +
-                "Cantidad de delitos: %{customdata[3]:,.0f}<br>" +
-                "Población: %{customdata[4]:,.0f}<extra></extra>"
-            )
-            trace.line.width = 3
-
-        fig_evolucion.update_traces(marker=dict(size=8))
-
-        fig_evolucion.update_layout(
-            xaxis_title="", yaxis_title="",
-            showlegend=False, plot_bgcolor='white', paper_bgcolor='white',
-            font=dict(size=12), height=400,
-            margin=dict(l=0, r=120, t=0, b=0),
-        )
-
-        fig_evolucion.update_yaxes(showgrid=True, gridcolor='lightgray', tickformat=",")
-
-        min_year = df_evolucion_pd["anio"].min()
-        max_year = df_evolucion_pd["anio"].max()
-        fig_evolucion.update_xaxes(range=[min_year - 0.5, max_year + 0.5], dtick=1)
-
-        # Crear mapa de colores
-        color_map = {trace.name: trace.line.color for trace in fig_evolucion.data}
-
-        # Agregar anotaciones
-        for prov in df_evolucion_pd["provincia_nombre_short"].unique():
-            df_prov = df_evolucion_pd[df_evolucion_pd["provincia_nombre_short"] == prov]
-            ultimo_x = df_prov["anio"].max()
-            ultimo_y = df_prov[df_prov["anio"] == ultimo_x]["tasa_delitos"].max()
-            
-            fig_evolucion.add_annotation(
-                x=ultimo_x, y=ultimo_y, text=prov,
-                showarrow=False, xanchor="left", xshift=10,
-                font=dict(size=12, color=color_map[prov])
+        with metricas.medir("figura", "tab3_evolucion"):
+            fig_evolucion = graficos.figura_evolucion(
+                df_evolucion_pl,
+                col_valor='tasa_delitos',
+                col_serie='provincia_nombre',
+                col_etiqueta='provincia_nombre_short',
+                custom_data=["cantidad_hechos", "poblacion_provincia"],
+                hover_cuerpo=(
+                    "Año %{x}<br>" +
+                    "Tasa de delitos: %{y:,.2f}<br>" +
+                    "Cantidad de delitos: %{customdata[0]:,.0f}<br>" +
+                    "Población: %{customdata[1]:,.0f}<extra></extra>"
+                ),
+                colors=colors,
+                nombre_resto="provincias",
             )
 
-        st.plotly_chart(fig_evolucion, use_container_width=False, 
+        graficos.mostrar_grafico(fig_evolucion, "tab3_evolucion", use_container_width=False, 
                        config={"displayModeBar": True})
         
         # <CHANGE> Liberar figura
@@ -1186,74 +924,38 @@ with tab3:
         # =======================
         st.markdown("###### Variación anual de la tasa de delitos por provincia")
 
-        # <CHANGE> Filtrar en pandas (ya materializado)
-        df_evolucion_var = df_evolucion_pd[df_evolucion_pd["anio"] >= 2014]
-
-        fig_variacion = px.line(
-            df_evolucion_var, 
-            x='anio', 
-            y='variacion',
-            line_shape='spline',
-            markers=True,
-            color='provincia_nombre_short',  
-            custom_data=["provincia_nombre", "anio", "variacion", 
-                        "cantidad_hechos", "poblacion_provincia"],
-            color_discrete_sequence=colors,
-            title=""
-        )
-
-        for trace in fig_variacion.data:
-            color = trace.line.color
-            trace.hovertemplate = (
-                f"<b><span style='color:{color}'>%{{customdata[0]}}</span></b><br>" +
-                "Año %{customdata[1]}<br>" +
-                "Variación: %{y:.2%}<br>" +
-                "Cantidad de delitos: %{customdata[3]:,.0f}<br>" +
-                "Población: %{customdata[4]:,.0f}<extra></extra>"
-            )
-            trace.line.width = 3
-
-        fig_variacion.update_traces(marker=dict(size=8))
-
-        fig_variacion.update_layout(
-            xaxis_title="", yaxis_title="",
-            showlegend=False, plot_bgcolor='white', paper_bgcolor='white',
-            font=dict(size=12), height=400,
-            margin=dict(l=0, r=120, t=0, b=0),
-        )
-
-        fig_variacion.add_hline(y=0, line_dash="dash", line_color="darkgrey", line_width=2)
-        fig_variacion.update_yaxes(showgrid=True, gridcolor='lightgray', tickformat=".0%")
-
-        min_year = df_evolucion_var["anio"].min()
-        max_year = df_evolucion_var["anio"].max()
-        fig_variacion.update_xaxes(range=[min_year - 0.5, max_year + 0.5], dtick=1)
-
-        color_map = {trace.name: trace.line.color for trace in fig_variacion.data}
-
-        for prov in df_evolucion_var["provincia_nombre_short"].unique():
-            df_prov = df_evolucion_var[df_evolucion_var["provincia_nombre_short"] == prov]
-            ultimo_x = df_prov["anio"].max()
-            ultimo_y = df_prov[df_prov["anio"] == ultimo_x]["variacion"].max()
-            
-            fig_variacion.add_annotation(
-                x=ultimo_x, y=ultimo_y, text=prov,
-                showarrow=False, xanchor="left", xshift=10,
-                font=dict(size=12, color=color_map[prov])
+        df_evolucion_var = df_evolucion_pl.filter(pl.col("anio") >= 2014)
+
+        with metricas.medir("figura", "tab3_variacion"):
+            fig_variacion = graficos.figura_evolucion(
+                df_evolucion_var,
+                col_valor='variacion',
+                col_serie='provincia_nombre',
+                col_etiqueta='provincia_nombre_short',
+                custom_data=["cantidad_hechos", "poblacion_provincia"],
+                hover_cuerpo=(
+                    "Año %{x}<br>" +
+                    "Variación: %{y:.2%}<br>" +
+                    "Cantidad de delitos: %{customdata[0]:,.0f}<br>" +
+                    "Población: %{customdata[1]:,.0f}<extra></extra>"
+                ),
+                colors=colors,
+                tickformat=".0%",
+                linea_cero=True,
+                nombre_resto="provincias",
             )
 
-        st.plotly_chart(fig_variacion, use_container_width=False, 
+        graficos.mostrar_grafico(fig_variacion, "tab3_variacion", use_container_width=False, 
                        config={"displayModeBar": True})
 
         # <CHANGE> Liberar toda la memoria al final del tab
-        del fig_variacion, df_evolucion_pd, df_evolucion_var, color_map
+        del fig_variacion, df_evolucion_pl, df_evolucion_var
         gc.collect()
 
 # ---- Comparar departamentos ----
-with tab4:
-    # <CHANGE> Eliminar .clone() innecesario
-    df = df_lazy  # NO clonar, usar directamente
-    
+def vista_departamentos():
+    px = graficos.plotly_express()  # diferido: solo al renderizar esta vista
+
     col1, col2 = st.columns([1, 4], gap="medium")
 
     # =======================
@@ -1262,38 +964,21 @@ with tab4:
     with col1:
         st.markdown("**Filtros**")
         
-        # Optimizar queries de filtros
-        años_disponibles = (
-            df.select(pl.col("anio").unique().sort(descending=True))
-            .collect()["anio"]
-            .to_list()
-        )
+        # Opciones de todos los filtros en una sola consulta cacheada
+        opciones = consultas.opciones_filtros()
+        años_disponibles = opciones["anios"]
         año_seleccionado = st.selectbox("Año", años_disponibles, key='Año tab4')
 
-        categorias_delito = ['Todas'] + (
-            df.select(pl.col("categoria_delito").unique().sort())
-            .collect()["categoria_delito"]
-            .to_list()
-        )
+        categorias_delito = ['Todas'] + opciones["categorias"]
         categoria_delito_seleccionadas = st.multiselect(
             "Categorías", categorias_delito, key='Categorías tab4'
         )
         if 'Todas' in categoria_delito_seleccionadas or not categoria_delito_seleccionadas:
             categoria_delito_seleccionadas = ['Todas']
 
-        if 'Todas' in categoria_delito_seleccionadas or not categoria_delito_seleccionadas:
-            tipos_disponibles = (
-                df.select(pl.col('codigo_delito_snic_nombre').unique().sort())
-                .collect()["codigo_delito_snic_nombre"]
-                .to_list()
-            )
-        else:
-            tipos_disponibles = (
-                df.filter(pl.col("categoria_delito").is_in(categoria_delito_seleccionadas))
-                .select(pl.col("codigo_delito_snic_nombre").unique().sort())
-                .collect()["codigo_delito_snic_nombre"]
-                .to_list()
-            )
+        tipos_disponibles = consultas.opciones_filtros(
+            consultas.seleccion(categoria_delito_seleccionadas, 'Todas')
+        )["tipos"]
         
         tipos_delito = ['Todos'] + tipos_disponibles
         tipo_delito_seleccionados = st.multiselect(
@@ -1302,17 +987,24 @@ with tab4:
         if 'Todos' in tipo_delito_seleccionados or not tipo_delito_seleccionados:
             tipo_delito_seleccionados = ['Todos']
 
-        provincias_disponibles = ['Todas'] + (
-            df.select(pl.col("provincia_nombre").unique().sort())
-            .collect()["provincia_nombre"]
-            .to_list()
-        )
+        provincias_disponibles = ['Todas'] + opciones["provincias"]
         provincia_seleccionada = st.multiselect(
             "Provincias", provincias_disponibles, key='Provincia tab4', default=['Todas']
         )
         if 'Todas' in provincia_seleccionada or not provincia_seleccionada:
             provincia_seleccionada = ['Todas']
 
+        cantidad_ranking = st.slider(
+            "Departamentos en el ranking", min_value=5, max_value=30, value=5, step=5,
+            key='Cantidad ranking tab4'
+        )
+        tasa_suavizada = st.toggle(
+            "Tasa suavizada", key='Tasa suavizada tab4',
+            help="Bayes empírico: acerca la tasa de los departamentos con poca población a la de su "
+                 "provincia en el mismo año, según cuánto ruido tiene cada tasa por su tamaño."
+        )
+        nombre_tasa = "Tasa suavizada" if tasa_suavizada else "Tasa de delitos"
+
         st.divider()
         st.markdown("**Filtros aplicados**")
         st.markdown(f"""
@@ -1325,9 +1017,19 @@ with tab4:
         • **Provincias:** {", ".join([str(provincia) for provincia in provincia_seleccionada])}
         """)
 
-        st.divider()
-
-        st.info("Si comparamos **San Isidro y Tigre,** podemos ver que hasta 2020 mostraban trayectorias similares, pero desde 2021 sus dinámicas se invirtieron. San Isidro alcanzó un pico en 2022 y luego bajó, mientras que Tigre tuvo un mínimo en 2023 y se disparó en 2024.")
+        exportacion.selector_descarga(
+            "departamentos",
+            filas=lambda: consultas.filas(
+                consultas.seleccion(categoria_delito_seleccionadas, 'Todas'),
+                consultas.seleccion(tipo_delito_seleccionados, 'Todos'),
+                provincias=consultas.seleccion(provincia_seleccionada, 'Todas'),
+            ),
+            agregado=lambda: consultas.evolucion_departamentos(
+                categorias=consultas.seleccion(categoria_delito_seleccionadas, 'Todas'),
+                tipos=consultas.seleccion(tipo_delito_seleccionados, 'Todos'),
+                provincias=consultas.seleccion(provincia_seleccionada, 'Todas'),
+            ).lazy(),
+        )
 
     # =======================
     # GRÁFICOS Y ANÁLISIS
@@ -1338,122 +1040,77 @@ with tab4:
         with col_grafico_ranking:
             st.markdown(f"#### Comparación de la tasa de delitos por departamento")
 
-            # <CHANGE> NO clonar, construir query lazy directamente
-            df_filtrado = df.with_columns(
-                pl.col("depto_nombre_completo").cast(pl.Utf8)
-            )
-
-            # Aplicar todos los filtros en modo lazy
-            if 'Todas' not in categoria_delito_seleccionadas and categoria_delito_seleccionadas:
-                df_filtrado = df_filtrado.filter(
-                    pl.col('categoria_delito').is_in(categoria_delito_seleccionadas)
-                )
-            
-            if 'Todos' not in tipo_delito_seleccionados and tipo_delito_seleccionados:
-                df_filtrado = df_filtrado.filter(
-                    pl.col('codigo_delito_snic_nombre').is_in(tipo_delito_seleccionados)
-                )
-
-            if 'Todas' not in provincia_seleccionada and provincia_seleccionada:
-                df_filtrado = df_filtrado.filter(
-                    pl.col('provincia_nombre').is_in(provincia_seleccionada)
+            # Ranking de todos los departamentos (puesto y percentil en el país y
+            # en la provincia), cacheado por categorías y tipos; el año y las
+            # provincias se filtran acá
+            df_ranking = consultas.ranking_departamentos(
+                categorias=consultas.seleccion(categoria_delito_seleccionadas, 'Todas'),
+                tipos=consultas.seleccion(tipo_delito_seleccionados, 'Todos'),
+            ).filter(pl.col('anio') == año_seleccionado).pipe(consultas.tasa_elegida, tasa_suavizada)
+            provincias_ranking = consultas.seleccion(provincia_seleccionada, 'Todas')
+            if provincias_ranking:
+                df_ranking = df_ranking.filter(pl.col('provincia_nombre').is_in(provincias_ranking))
+
+            # Top N con selección parcial (top_k) en lugar de ordenar todo; los
+            # nombres cortos se unen solo a esas filas
+            df_año_seleccionado_pd = (
+                df_ranking
+                .top_k(cantidad_ranking, by='tasa_delitos')
+                .pipe(consultas.etiquetas, "depto_nombre_completo")
+                .with_columns(
+                    pl.col("provincia_nombre").cast(pl.Utf8),
+                    pl.col("depto_nombre_completo").cast(pl.Utf8),
                 )
-
-            # <CHANGE> Construir df_evolucion completamente en modo lazy
-            df_evolucion = (
-                df_filtrado
-                .group_by(['anio', 'depto_nombre_completo'])
-                .agg([
-                    pl.col('cantidad_hechos').sum().alias('cantidad_hechos'),
-                    pl.col('poblacion_departamento').first().alias('poblacion_departamento')
-                ])
-                .with_columns([
-                    ((pl.col("cantidad_hechos") / (pl.col("poblacion_departamento") / 100_000))
-                     .round(2)
-                     .alias("tasa_delitos"))
-                ])
-                .sort(by=['depto_nombre_completo', 'anio'])
+                .to_pandas()
             )
-
-            # Liberar df_filtrado inmediatamente
-            del df_filtrado
-            gc.collect()
-
-            # <CHANGE> Filtrar año seleccionado y calcular top 5 en lazy
-            MAX_LEN = 28
-            df_año_seleccionado = (
-                df_evolucion
-                .filter(pl.col('anio') == año_seleccionado)
-                .with_columns([
-                    pl.when(pl.col("depto_nombre_completo").str.len_chars() <= MAX_LEN)
-                    .then(pl.col("depto_nombre_completo"))
-                    .otherwise(pl.col("depto_nombre_completo").str.slice(0, MAX_LEN-2) + "...")
-                    .alias("departamento_nombre_short")
-                ])
-                .drop_nulls()
-                .sort("tasa_delitos", descending=True)
-                .head(5)
-            )
-
-            # Calcular altura antes de materializar
-            n_filas_result = df_año_seleccionado.select(pl.count()).collect()
-            n_filas = n_filas_result[0, 0]
-            del n_filas_result
-            gc.collect()
-            
-            altura_grafico = n_filas * 35
-
-            # <CHANGE> Materializar solo el top 5
-            df_año_seleccionado_pd = df_año_seleccionado.collect().to_pandas()
-
-            # Liberar LazyFrame
-            del df_año_seleccionado
-            gc.collect()
+            n_filas = len(df_año_seleccionado_pd)
+            altura_grafico = max(n_filas, 1) * 35
 
             # Crear gráfico
             custom_colorscale = ["#e096b2", '#df437e']
-            fig_ranking = px.bar(
-                df_año_seleccionado_pd, 
-                x='tasa_delitos', 
-                y='departamento_nombre_short',
-                orientation='h',
-                height=altura_grafico,
-                color='tasa_delitos',
-                color_continuous_scale=custom_colorscale,
-                text=df_año_seleccionado_pd['tasa_delitos'],
-                custom_data=["depto_nombre_completo", "cantidad_hechos", "tasa_delitos", 
-                            "poblacion_departamento"]
-            )
+            with metricas.medir("figura", "tab4_ranking"):
+                fig_ranking = px.bar(
+                    df_año_seleccionado_pd, 
+                    x='tasa_delitos', 
+                    y='departamento_nombre_short',
+                    orientation='h',
+                    height=altura_grafico,
+                    color='tasa_delitos',
+                    color_continuous_scale=custom_colorscale,
+                    hover_name="depto_nombre_completo",
+                    custom_data=["cantidad_hechos", "poblacion_departamento", "puesto_pais", "puesto_provincia"]
+                )
 
-            fig_ranking.update_traces(
-                textposition="inside",
-                insidetextanchor="start",
-                textfont=dict(color="white"),
-                texttemplate="  %{text:,.2f}",
-                hovertemplate="<b>%{customdata[0]}</b><br>" +
-                            "Tasa de delitos: %{customdata[2]:,.2f}<br>" +
-                            "Cantidad de delitos: %{customdata[1]:,}<br>" +
-                            "Población: %{customdata[3]:,}<extra></extra>"
-            )
+                fig_ranking.update_traces(
+                    textposition="inside",
+                    insidetextanchor="start",
+                    textfont=dict(color="white"),
+                    texttemplate="  %{x:,.2f}",
+                    hovertemplate="<b>%{hovertext}</b><br>" +
+                                f"{nombre_tasa}: %{{x:,.2f}}<br>" +
+                                "Cantidad de delitos: %{customdata[0]:,}<br>" +
+                                "Población: %{customdata[1]:,}<br>" +
+                                "Puesto en el país: %{customdata[2]} · en la provincia: %{customdata[3]}<extra></extra>"
+                )
 
-            fig_ranking.update_layout(
-                xaxis_title="", yaxis_title="",
-                showlegend=False, plot_bgcolor='white', paper_bgcolor='white',
-                font=dict(size=10), height=altura_grafico,
-                yaxis={'categoryorder':'total ascending'},
-                margin=dict(l=0, r=0, t=0, b=0),
-                xaxis=dict(visible=False),
-                barcornerradius=5
-            )
+                fig_ranking.update_layout(
+                    xaxis_title="", yaxis_title="",
+                    showlegend=False, plot_bgcolor='white', paper_bgcolor='white',
+                    font=dict(size=10), height=altura_grafico,
+                    yaxis={'categoryorder':'total ascending'},
+                    margin=dict(l=0, r=0, t=0, b=0),
+                    xaxis=dict(visible=False),
+                    barcornerradius=5
+                )
 
-            fig_ranking.update_coloraxes(showscale=False)
-            fig_ranking.update_xaxes(showgrid=True, gridcolor="lightgrey", gridwidth=0.5)
-            fig_ranking.add_shape(
-                type="line", x0=0, x1=0, y0=-0.5, y1=n_filas-0.5, 
-                line=dict(color="lightgrey", width=1)
-            )
+                fig_ranking.update_coloraxes(showscale=False)
+                fig_ranking.update_xaxes(showgrid=True, gridcolor="lightgrey", gridwidth=0.5)
+                fig_ranking.add_shape(
+                    type="line", x0=0, x1=0, y0=-0.5, y1=n_filas-0.5, 
+                    line=dict(color="lightgrey", width=1)
+                )
             
-            st.plotly_chart(fig_ranking, use_container_width=True, 
+            graficos.mostrar_grafico(fig_ranking, "tab4_ranking", use_container_width=True, 
                           config={"displayModeBar": False})
 
             # <CHANGE> Liberar memoria inmediatamente
@@ -1461,39 +1118,128 @@ with tab4:
             gc.collect()
 
         with col_info:
-            st.info("""Llama la atención el caso de **Tordillo** (Buenos Aires), que en 2024 exhibe una tasa de delitos extraordinariamente alta debido a la combinación de una pequeña población y un gran número de hechos registrados. Utilizando la pestaña _Categorías y tipos de delitos_, podemos ver que la mayoría corresponden a delitos vinculados con la **Ley 23.737 (estupefacientes).**""")
+            # Con varias provincias no hay un área única para los hallazgos
+            provincias_hallazgos = consultas.seleccion(provincia_seleccionada, 'Todas')
+            if len(provincias_hallazgos) <= 1:
+                mostrar_hallazgos(
+                    "departamentos", columnas=1, anio=año_seleccionado,
+                    categorias=consultas.seleccion(categoria_delito_seleccionadas, 'Todas'),
+                    tipos=consultas.seleccion(tipo_delito_seleccionados, 'Todos'),
+                    provincia=provincias_hallazgos[0] if provincias_hallazgos else None,
+                )
         
+        # =======================
+        # RANKING COMPLETO
+        # =======================
+        with st.expander(f"Ranking completo de departamentos ({df_ranking.height:,})"):
+            # Tabla virtualizada: Streamlit recibe el DataFrame como Arrow y
+            # dibuja solo las filas visibles; se ordena y busca en el navegador
+            st.dataframe(
+                df_ranking.select([
+                    "puesto_pais", "puesto_provincia", "depto_nombre_completo",
+                    "provincia_nombre", "tasa_delitos",
+                    *(["tasa_observada"] if tasa_suavizada else []),
+                    "percentil_pais", "percentil_provincia",
+                    "cantidad_hechos", "poblacion_departamento",
+                ]),
+                hide_index=True,
+                use_container_width=True,
+                height=400,
+                column_config={
+                    "puesto_pais": st.column_config.NumberColumn("Puesto país", format="%d"),
+                    "puesto_provincia": st.column_config.NumberColumn("Puesto provincia", format="%d"),
+                    "depto_nombre_completo": st.column_config.TextColumn("Departamento"),
+                    "provincia_nombre": st.column_config.TextColumn("Provincia"),
+                    "tasa_delitos": st.column_config.NumberColumn(
+                        "Tasa suavizada" if tasa_suavizada else "Tasa", format="%.2f"
+                    ),
+                    "tasa_observada": st.column_config.NumberColumn("Tasa observada", format="%.2f"),
+                    "percentil_pais": st.column_config.ProgressColumn(
+                        "Percentil país", format="%.1f", min_value=0, max_value=100
+                    ),
+                    "percentil_provincia": st.column_config.ProgressColumn(
+                        "Percentil provincia", format="%.1f", min_value=0, max_value=100
+                    ),
+                    "cantidad_hechos": st.column_config.NumberColumn("Hechos", format="localized"),
+                    "poblacion_departamento": st.column_config.NumberColumn("Población", format="localized"),
+                },
+            )
+
+        del df_ranking
+        gc.collect()
+
         # =======================
         # EVOLUCIÓN TEMPORAL
         # =======================
         st.markdown(f"#### Evolución a lo largo de los años")
 
-        # <CHANGE> Obtener departamentos disponibles según provincia
+        # <CHANGE> Departamentos por defecto según provincia, desde el índice
         if ('Todas' not in provincia_seleccionada and provincia_seleccionada):
-            departamentos_disponibles = (
-                df.filter(pl.col("provincia_nombre").is_in(provincia_seleccionada))
-                .select(pl.col("depto_nombre_completo").unique().sort())
-                .collect()["depto_nombre_completo"]
-                .to_list()
+            provincias_deptos = provincia_seleccionada
+            departamentos_default = busqueda.buscar_departamentos(
+                consultas.load_indice_departamentos(), provincias=provincia_seleccionada, limite=2
             )
-            departamentos_default = departamentos_disponibles[:2] if len(departamentos_disponibles) >= 2 else departamentos_disponibles
         else:
-            departamentos_disponibles = (
-                df.select(pl.col("depto_nombre_completo").unique().sort())
-                .collect()["depto_nombre_completo"]
-                .to_list()
-            )
+            provincias_deptos = None
             departamentos_default = ['San Isidro, Buenos Aires', 'Tigre, Buenos Aires']
 
-        departamentos_disponibles = ['Todos'] + departamentos_disponibles
-        departamento_seleccionado = st.multiselect(
-            "Seleccionar departamentos",
-            departamentos_disponibles,
-            key='Departamento tab4',
-            default=departamentos_default
+        departamento_seleccionado = selector_departamentos(
+            "Seleccionar departamentos", "Departamento tab4",
+            provincias=provincias_deptos, multiple=True, default=departamentos_default
         )
 
-        # <CHANGE> Aplicar filtro de departamentos en lazy antes de materializar
+        # Búsqueda de trayectorias similares: los K departamentos más parecidos
+        # al de referencia se suman a los gráficos de evolución
+        referencias = [d for d in departamento_seleccionado if d != 'Todos']
+        col_similares, col_referencia, col_k, col_metrica = st.columns([3, 4, 2, 3], gap="small")
+        with col_similares:
+            buscar_similares = st.toggle(
+                "Agregar trayectorias similares", key='Similares tab4', disabled=not referencias
+            )
+        df_similares = None
+        if buscar_similares and referencias:
+            import similitud  # diferido: NumPy solo si se usa la búsqueda
+
+            with col_referencia:
+                referencia = st.selectbox("Departamento de referencia", referencias, key='Referencia tab4')
+            with col_k:
+                k_similares = st.number_input(
+                    "Cantidad", min_value=1, max_value=10, value=3, key='Cantidad similares tab4'
+                )
+            with col_metrica:
+                metrica = st.radio(
+                    "Comparar", list(similitud.METRICAS), format_func=similitud.METRICAS.get,
+                    key='Métrica similares tab4'
+                )
+            trayectorias = consultas.trayectorias_departamentos(
+                categorias=consultas.seleccion(categoria_delito_seleccionadas, 'Todas'),
+                tipos=consultas.seleccion(tipo_delito_seleccionados, 'Todos'),
+                provincias=consultas.seleccion(provincia_seleccionada, 'Todas'),
+            )
+            with metricas.medir("similitud", "tab4_similares"):
+                df_similares = similitud.similares(trayectorias, referencia, k_similares, metrica)
+            del trayectorias
+
+            if df_similares.is_empty():
+                st.caption(f"No hay departamentos con al menos {similitud.MIN_ANIOS_COMUNES} años en común con {referencia}.")
+            else:
+                detalle = ", ".join(
+                    f"{nombre} ({valor:,.2f})" for nombre, valor in df_similares.select(
+                        "depto_nombre_completo", metrica
+                    ).iter_rows()
+                )
+                st.caption(f"Más parecidos a **{referencia}** según {similitud.METRICAS[metrica].lower()}: {detalle}")
+                departamento_seleccionado = list(dict.fromkeys(
+                    referencias + df_similares["depto_nombre_completo"].to_list()
+                ))
+
+        # <CHANGE> Evolución por departamento y año, cacheada por filtros; los
+        # departamentos se filtran en lazy antes de materializar
+        df_evolucion = consultas.evolucion_departamentos(
+            categorias=consultas.seleccion(categoria_delito_seleccionadas, 'Todas'),
+            tipos=consultas.seleccion(tipo_delito_seleccionados, 'Todos'),
+            provincias=consultas.seleccion(provincia_seleccionada, 'Todas'),
+        ).pipe(consultas.tasa_elegida, tasa_suavizada).lazy()
         df_evolucion_filtrado = df_evolucion
         
         if "Todos" not in departamento_seleccionado and departamento_seleccionado:
@@ -1501,15 +1247,10 @@ with tab4:
                 pl.col("depto_nombre_completo").is_in(departamento_seleccionado)
             )
 
-        # <CHANGE> Calcular nombres cortos y variaciones en lazy
+        # <CHANGE> Nombres cortos de la dimensión y variaciones en lazy
         df_evolucion_filtrado = (
             df_evolucion_filtrado
-            .with_columns([
-                pl.when(pl.col("depto_nombre_completo").str.len_chars() <= MAX_LEN)
-                .then(pl.col("depto_nombre_completo"))
-                .otherwise(pl.col("depto_nombre_completo").str.slice(0, MAX_LEN-2) + "...")
-                .alias("departamento_nombre_short")
-            ])
+            .pipe(consultas.etiquetas, "depto_nombre_completo")
             .with_columns([
                 pl.col("tasa_delitos").shift(1).over("depto_nombre_completo").alias("tasa_delitos_anterior")
             ])
@@ -1524,7 +1265,7 @@ with tab4:
         )
 
         # <CHANGE> Materializar solo ahora con todos los filtros aplicados
-        df_evolucion_pd = df_evolucion_filtrado.collect().to_pandas()
+        df_evolucion_pl = df_evolucion_filtrado.pipe(metricas.recolectar, "tab4_evolucion")
 
         # Liberar LazyFrames
         del df_evolucion, df_evolucion_filtrado
@@ -1540,58 +1281,38 @@ with tab4:
             '#1F2DB4', '#1FB4A7', "#bd5b34", '#77B41F', '#EF5475', '#5475EF',
         ]
 
-        # Gráfico de evolución de tasa
-        fig_evolucion = px.line(
-            df_evolucion_pd,
-            x='anio',
-            y='tasa_delitos',
-            line_shape='spline',
-            markers=True,
-            color='departamento_nombre_short',
-            custom_data=["depto_nombre_completo", "anio", "tasa_delitos", 
-                        "cantidad_hechos", "poblacion_departamento"],
-            color_discrete_sequence=colors,
-            title=""
-        )
-
-        for trace in fig_evolucion.data:
-            color = trace.line.color
-            trace.hovertemplate = (
-                f"<b><span style='color:{color}'>%{{customdata[0]}}</span></b><br>"
-                "Año %{customdata[1]}<br>"
-                "Tasa de delitos: %{customdata[2]:,.2f}<br>"
-                "Cantidad de delitos: %{customdata[3]:,.0f}<br>"
-                "Población: %{customdata[4]:,.0f}<extra></extra>"
+        # Con muchos departamentos (p. ej. "Todos") se pasa a WebGL y se fijan
+        # las mismas series destacadas en ambos gráficos
+        destacados = None
+        if df_evolucion_pl["depto_nombre_completo"].n_unique() > graficos.UMBRAL_WEBGL:
+            destacados = graficos.series_destacadas(
+                df_evolucion_pl, "depto_nombre_completo", "tasa_delitos"
             )
-            trace.line.width = 3
-
-        fig_evolucion.update_traces(marker=dict(size=8))
-        fig_evolucion.update_layout(
-            xaxis_title="", yaxis_title="",
-            showlegend=False, plot_bgcolor='white', paper_bgcolor='white',
-            font=dict(size=12), height=400,
-            margin=dict(l=0, r=120, t=0, b=0),
-        )
-        fig_evolucion.update_yaxes(showgrid=True, gridcolor='lightgray', tickformat=",")
-        
-        min_year = df_evolucion_pd["anio"].min()
-        max_year = df_evolucion_pd["anio"].max()
-        fig_evolucion.update_xaxes(range=[min_year - 0.5, max_year + 0.5], dtick=1)
-
-        # Etiquetas finales con mismo color que línea
-        color_map = {trace.name: trace.line.color for trace in fig_evolucion.data}
-        for depto in df_evolucion_pd["departamento_nombre_short"].unique():
-            df_depto = df_evolucion_pd[df_evolucion_pd["departamento_nombre_short"] == depto]
-            ultimo_x = df_depto["anio"].max()
-            ultimo_y = df_depto[df_depto["anio"] == ultimo_x]["tasa_delitos"].max()
-            
-            fig_evolucion.add_annotation(
-                x=ultimo_x, y=ultimo_y, text=depto,
-                showarrow=False, xanchor="left", xshift=10,
-                font=dict(size=12, color=color_map[depto])
+            st.caption(
+                f"Se muestran los {len(destacados)} departamentos con mayor tasa en el "
+                "último año; el resto se resume en una banda (percentiles 10 a 90) y su mediana."
             )
 
-        st.plotly_chart(fig_evolucion, use_container_width=False, 
+        # Gráfico de evolución de tasa
+        with metricas.medir("figura", "tab4_evolucion"):
+            fig_evolucion = graficos.figura_evolucion(
+                df_evolucion_pl,
+                col_valor='tasa_delitos',
+                col_serie='depto_nombre_completo',
+                col_etiqueta='departamento_nombre_short',
+                custom_data=["cantidad_hechos", "poblacion_departamento"],
+                hover_cuerpo=(
+                    "Año %{x}<br>"
+                    f"{nombre_tasa}: %{{y:,.2f}}<br>"
+                    "Cantidad de delitos: %{customdata[0]:,.0f}<br>"
+                    "Población: %{customdata[1]:,.0f}<extra></extra>"
+                ),
+                colors=colors,
+                destacadas=destacados,
+                nombre_resto="departamentos",
+            )
+
+        graficos.mostrar_grafico(fig_evolucion, "tab4_evolucion", use_container_width=False, 
                        config={"displayModeBar": True})
         
         # <CHANGE> Liberar figura inmediatamente
@@ -1603,68 +1324,138 @@ with tab4:
         # =======================
         st.markdown("###### Variación anual de la tasa de delitos por departamento")
         
-        # <CHANGE> Filtrar en pandas (ya materializado)
-        df_var_pd = df_evolucion_pd[df_evolucion_pd["anio"] >= 2010].copy()
-
-        fig_var = px.line(
-            df_var_pd,
-            x='anio',
-            y='variacion',
-            line_shape='spline',
-            markers=True,
-            color='departamento_nombre_short',
-            custom_data=["depto_nombre_completo", "anio", "variacion", 
-                        "cantidad_hechos", "poblacion_departamento"],
-            color_discrete_sequence=colors,
-            title=""
-        )
-
-        for trace in fig_var.data:
-            color = trace.line.color
-            trace.hovertemplate = (
-                f"<b><span style='color:{color}'>%{{customdata[0]}}</span></b><br>"
-                "Año %{customdata[1]}<br>"
-                "Variación: %{y:.2%}<br>"
-                "Cantidad de delitos: %{customdata[3]:,.0f}<br>"
-                "Población: %{customdata[4]:,.0f}<extra></extra>"
-            )
-            trace.line.width = 3
-
-        fig_var.update_traces(marker=dict(size=8))
-        fig_var.update_layout(
-            xaxis_title="", yaxis_title="",
-            showlegend=False, plot_bgcolor='white', paper_bgcolor='white',
-            font=dict(size=12), height=400,
-            margin=dict(l=0, r=120, t=0, b=0),
-        )
-        fig_var.add_hline(y=0, line_dash="dash", line_color="darkgrey", line_width=2)
-        fig_var.update_yaxes(showgrid=True, gridcolor='lightgray', tickformat=".0%")
-        
-        min_year = df_var_pd["anio"].min()
-        max_year = df_var_pd["anio"].max()
-        fig_var.update_xaxes(range=[min_year - 0.5, max_year + 0.5], dtick=1)
-
-        # Etiquetas finales
-        color_map = {trace.name: trace.line.color for trace in fig_var.data}
-        for prov in df_var_pd["departamento_nombre_short"].unique():
-            df_prov = df_var_pd[df_var_pd["departamento_nombre_short"] == prov]
-            ultimo_x = df_prov["anio"].max()
-            ultimo_y = df_prov[df_prov["anio"] == ultimo_x]["variacion"].max()
-            
-            fig_var.add_annotation(
-                x=ultimo_x, y=ultimo_y, text=prov,
-                showarrow=False, xanchor="left", xshift=10,
-                font=dict(size=12, color=color_map[prov])
+        df_var_pl = df_evolucion_pl.filter(pl.col("anio") >= 2010)
+
+        with metricas.medir("figura", "tab4_variacion"):
+            fig_var = graficos.figura_evolucion(
+                df_var_pl,
+                col_valor='variacion',
+                col_serie='depto_nombre_completo',
+                col_etiqueta='departamento_nombre_short',
+                custom_data=["cantidad_hechos", "poblacion_departamento"],
+                hover_cuerpo=(
+                    "Año %{x}<br>"
+                    "Variación: %{y:.2%}<br>"
+                    "Cantidad de delitos: %{customdata[0]:,.0f}<br>"
+                    "Población: %{customdata[1]:,.0f}<extra></extra>"
+                ),
+                colors=colors,
+                tickformat=".0%",
+                linea_cero=True,
+                destacadas=destacados,
+                nombre_resto="departamentos",
             )
 
-        st.plotly_chart(fig_var, use_container_width=False, 
+        graficos.mostrar_grafico(fig_var, "tab4_variacion", use_container_width=False, 
                        config={"displayModeBar": True})
         
         # <CHANGE> Liberar toda la memoria al final del tab
-        del fig_var, df_var_pd, df_evolucion_pd, color_map
+        del fig_var, df_var_pl, df_evolucion_pl, df_similares
         gc.collect()
 
-with tab5:
+# ---- Anomalías ----
+def vista_anomalias():
+    col1, col2 = st.columns([1, 4], gap="medium")
+
+    # El índice se calcula una vez por versión del dataset (anomalias.py);
+    # acá solo se filtra en memoria
+    indice = consultas.load_anomalias()
+
+    # =======================
+    # FILTROS
+    # =======================
+    with col1:
+        st.markdown("**Filtros**")
+
+        opciones = consultas.opciones_filtros()
+        años_seleccionados = st.multiselect("Años", opciones["anios"], key='Años anomalías')
+        categorias_seleccionadas = st.multiselect("Categorías", opciones["categorias"], key='Categorías anomalías')
+        provincias_seleccionadas = st.multiselect("Provincias", opciones["provincias"], key='Provincias anomalías')
+        texto = st.text_input(
+            "Buscar departamento o tipo", key='Búsqueda anomalías', placeholder="Escribí parte del nombre"
+        )
+        direccion = st.radio(
+            "Dirección", ["Todas", "Alzas", "Bajas"], horizontal=True, key='Dirección anomalías'
+        )
+        comparacion = st.radio(
+            "Comparada con", ["Cualquiera", "Su historia", "Otros departamentos"],
+            key='Comparación anomalías',
+            help="Su historia: el mismo departamento y tipo en otros años. "
+                 "Otros departamentos: el mismo tipo y año en el resto del país."
+        )
+        puntaje_minimo = st.slider(
+            "Puntaje mínimo (|z| robusto)", min_value=float(anomalias.UMBRAL), max_value=20.0,
+            value=5.0, step=0.5, key='Puntaje anomalías'
+        )
+
+        st.divider()
+        st.info(
+            f"""Cada celda departamento × tipo de delito × año se compara con la historia del mismo departamento y con los demás departamentos ese año, usando un z robusto (mediana y MAD). Se listan las que superan {anomalias.UMBRAL} y tienen al menos {anomalias.MIN_HECHOS} hechos. El salto es el log₂ del cociente de hechos contra el año anterior."""
+        )
+
+    # =======================
+    # ÍNDICE FILTRADO
+    # =======================
+    with col2:
+        st.markdown("#### Anomalías por departamento, tipo de delito y año")
+
+        columna_puntaje = {
+            "Cualquiera": pl.col("puntaje"),
+            "Su historia": pl.col("z_historica").abs(),
+            "Otros departamentos": pl.col("z_pares").abs(),
+        }[comparacion]
+        filtros = [columna_puntaje >= puntaje_minimo]
+        if años_seleccionados:
+            filtros.append(pl.col("anio").is_in(años_seleccionados))
+        if categorias_seleccionadas:
+            filtros.append(pl.col("categoria_delito").is_in(categorias_seleccionadas))
+        if provincias_seleccionadas:
+            filtros.append(pl.col("provincia_nombre").is_in(provincias_seleccionadas))
+        if direccion != "Todas":
+            filtros.append(pl.col("direccion") == (1 if direccion == "Alzas" else -1))
+        consulta = busqueda.normalizar(texto)
+        if consulta:
+            filtros.append(
+                busqueda.normalizar_expr("depto_nombre_completo").str.contains(consulta, literal=True)
+                | busqueda.normalizar_expr("codigo_delito_snic_nombre").str.contains(consulta, literal=True)
+            )
+
+        with metricas.medir("filtro", "anomalias"):
+            df_anomalias = indice.filter(filtros)
+
+        col_total, col_alzas, col_bajas = st.columns(3)
+        col_total.metric("Celdas anómalas", f"{df_anomalias.height:,}")
+        col_alzas.metric("Alzas", f"{(df_anomalias['direccion'] == 1).sum():,}")
+        col_bajas.metric("Bajas", f"{(df_anomalias['direccion'] == -1).sum():,}")
+
+        st.dataframe(
+            df_anomalias.select([
+                "puesto", "anio", "depto_nombre_completo", "codigo_delito_snic_nombre",
+                "categoria_delito", "cantidad_hechos", "tasa_delitos",
+                "z_historica", "z_pares", "salto", "puntaje",
+            ]),
+            hide_index=True,
+            use_container_width=True,
+            height=600,
+            column_config={
+                "puesto": st.column_config.NumberColumn("Puesto", format="%d"),
+                "anio": st.column_config.NumberColumn("Año", format="%d"),
+                "depto_nombre_completo": st.column_config.TextColumn("Departamento"),
+                "codigo_delito_snic_nombre": st.column_config.TextColumn("Tipo de delito"),
+                "categoria_delito": st.column_config.TextColumn("Categoría"),
+                "cantidad_hechos": st.column_config.NumberColumn("Hechos", format="localized"),
+                "tasa_delitos": st.column_config.NumberColumn("Tasa", format="%.2f"),
+                "z_historica": st.column_config.NumberColumn("z historia", format="%.2f"),
+                "z_pares": st.column_config.NumberColumn("z otros deptos.", format="%.2f"),
+                "salto": st.column_config.NumberColumn("Salto (log₂)", format="%.2f"),
+                "puntaje": st.column_config.NumberColumn("Puntaje", format="%.2f"),
+            },
+        )
+
+        del df_anomalias, indice
+        gc.collect()
+
+def vista_fuentes():
     col1, col2 = st.columns([1, 3], gap = "medium")
 
     with col1:
@@ -1700,4 +1491,91 @@ with tab5:
             - **Solo incluye los delitos reportados**: no todos los delitos son detectados y/o registrados, y las tasas de detección y registro pueden variar entre regiones y a lo largo del tiempo. Esto genera un sesgo que puede subestimar la cantidad real de delitos.
             - **Registro heterogéneo de delitos**: la forma en que se registran los delitos puede variar entre provincias y departamentos, lo que afecta la comparabilidad entre jurisdicciones. Además, a lo largo de los años, algunos tipos de delitos utilizados para clasificar los hechos han cambiado, lo cual dificulta, en ciertos casos, analizar su evolución temporal. 
             """ 
-        )
\ No newline at end of file
+        )
+        st.markdown("**Validación de los datos**")
+        st.caption(
+            f"Controles sobre {VALIDACION['filas']:,} filas de la versión `{VALIDACION['huella']}`, "
+            f"calculados una vez al cargarla ({VALIDACION['segundos']:.2f} s)."
+        )
+        iconos = {"ok": "✅", "aviso": "⚠️", "error": "❌"}
+        st.dataframe(
+            [
+                {"Estado": iconos[c["estado"]], "Control": c["descripcion"], "Casos": c["casos"]}
+                for c in VALIDACION["controles"]
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+        for control in VALIDACION["controles"]:
+            if control["estado"] != "ok":
+                with st.expander(f"{iconos[control['estado']]} {control['descripcion']}: ejemplos"):
+                    st.dataframe(control["ejemplos"], hide_index=True, use_container_width=True)
+
+
+# ---------------- TABS ---------------- #
+VISTAS = {
+    "Vista general": vista_general,
+    "Categorías y tipos de delitos": vista_categorias,
+    "Comparar provincias": vista_provincias,
+    "Comparar departamentos": vista_departamentos,
+    "Anomalías": vista_anomalias,
+    "Fuentes y metodología": vista_fuentes,
+}
+
+# Con DELITOS_PERFIL=1 o ?perfil=1 el rerun completo corre bajo cProfile. El
+# perfil se detiene siempre, aunque el rerun termine antes por una excepción,
+# st.stop() o un cambio de widget (RerunException), pero solo se guarda si el
+# rerun llegó al final.
+PERFIL = perfilado.iniciar()
+metricas.iniciar_rerun(detallado=PERFIL is not None)
+try:
+    # Fija la versión del dataset para todo este rerun: si vigilancia publica una
+    # nueva mientras tanto, la toman recién los reruns siguientes
+    consultas.fijar_version()
+    vigilancia.iniciar()
+    # Si la versión es nueva para este proceso, precalienta las vistas en segundo plano
+    precalentamiento.asegurar()
+
+    # ---------------- TÍTULO ---------------- #
+    st.title("Delitos en Argentina")
+
+    # Reporte de validación de la versión (calculado al prepararla, acá solo se lee)
+    VALIDACION = consultas.validacion_datos()
+    if VALIDACION["estado"] != "ok":
+        fallidos = [c["descripcion"].lower() for c in VALIDACION["controles"] if c["estado"] != "ok"]
+        st.warning(
+            f"El dataset no pasa {len(fallidos)} controles de validación ({'; '.join(fallidos)}). "
+            "El detalle está en _Fuentes y metodología_.",
+            icon="⚠️",
+        )
+
+    if NAVEGACION_DIFERIDA:
+        vista_seleccionada = st.radio(
+            "Vista", list(VISTAS), key="vista",
+            horizontal=True, label_visibility="collapsed"
+        )
+        VISTAS[vista_seleccionada]()
+    else:
+        for tab, vista in zip(st.tabs(list(VISTAS)), VISTAS.values()):
+            with tab:
+                vista()
+finally:
+    perfilado.detener(PERFIL)
+
+# ---------------- DIAGNÓSTICO ---------------- #
+if PERFIL is not None:
+    ruta_perfil = perfilado.guardar(PERFIL, metricas.registro_actual())
+    st.caption(f"Perfil del rerun guardado en `{ruta_perfil}.*`")
+
+if metricas.diagnostico_activo():
+    with st.expander("Precalentamiento de cachés", expanded=False):
+        st.json(precalentamiento.reporte(), expanded=1)
+    with st.expander("Versión del dataset", expanded=False):
+        st.json({
+            "huella": consultas.huella_vigente(),
+            "cambios": vigilancia.cambios(),
+        }, expanded=1)
+
+# Cierra las mediciones del rerun; el panel solo aparece con ?diagnostico=1
+# o DELITOS_DIAGNOSTICO=1
+metricas.mostrar_panel(metricas.finalizar_rerun())
@@ -0,0 +1,139 @@
+"""
+Benchmark de las consultas con más filtros: Categorical por scan contra Enum
+persistido.
+
+- antes: scan del parquet original con los cuatro nombres casteados a
+  pl.Categorical en cada scan (el load_data anterior) y filtros is_in con
+  listas de strings;
+- después: consultas.load_data(), que lee la copia tipada de la versión
+  (consultas._rollup_tipado) con los nombres como pl.Enum de dominio fijo,
+  y filtros con consultas._filtrar.
+
+Las consultas replican las de las vistas (resumen del año, evolución por
+provincia y por departamento, tipos de una categoría, departamentos de
+varias provincias) con filtros tomados del dataset. Cada una se repite
+--repeticiones veces por camino y se reporta la mediana y el p95.
+Requiere DATOS_SNIC_POB.parquet en la raíz.
+
+Uso:
+    python benchmarks/bench_enum.py --repeticiones 30
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import polars as pl
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+import consultas  # noqa: E402
+
+
+def scan_categorical(version):
+    """Réplica del load_data anterior: casts a Categorical en cada scan."""
+    return pl.scan_parquet(version["ruta"]).select(
+        ["anio"] + consultas.COLUMNAS_ENUM + [c for c in consultas.TIPOS_DATOS if c != "anio"]
+    ).with_columns(
+        [pl.col(c).cast(pl.Categorical) for c in consultas.COLUMNAS_ENUM]
+        + [pl.col(c).cast(tipo) for c, tipo in consultas.TIPOS_DATOS.items()]
+    )
+
+
+def filtrar_strings(df, categorias=(), tipos=(), provincias=(), departamentos=()):
+    """Réplica del _filtrar anterior: is_in con listas de strings."""
+    for columna, valores in (
+        ("categoria_delito", categorias), ("codigo_delito_snic_nombre", tipos),
+        ("depto_nombre_completo", departamentos), ("provincia_nombre", provincias),
+    ):
+        if valores:
+            df = df.filter(pl.col(columna).is_in(list(valores)))
+    return df
+
+
+def consultas_vistas(df, filtrar, f):
+    """(nombre, LazyFrame) de las consultas a medir sobre `df`."""
+    anio = f["anio"]
+    return [
+        ("resumen provincia y categoría", filtrar(
+            df, categorias=f["categorias"][:1], provincias=f["provincias"][:1]
+        ).filter(pl.col("anio") == anio).select(
+            pl.col("cantidad_hechos").sum(), pl.col("poblacion_provincia").max()
+        )),
+        ("evolución por provincia, dos categorías", filtrar(df, categorias=f["categorias"][:2])
+         .group_by(["anio", "provincia_nombre"])
+         .agg(pl.col("cantidad_hechos").sum(), pl.col("poblacion_provincia").first())),
+        ("evolución por departamento, tres tipos", filtrar(df, tipos=f["tipos"][:3])
+         .group_by(["anio", "depto_nombre_completo"])
+         .agg(pl.col("cantidad_hechos").sum(), pl.col("poblacion_departamento").first())),
+        ("tipos de una categoría", filtrar(df, categorias=f["categorias"][-1:])
+         .select(pl.col("codigo_delito_snic_nombre").unique())),
+        ("departamentos de cinco provincias", filtrar(df, provincias=f["provincias"][:5])
+         .filter(pl.col("anio") == anio)
+         .group_by("depto_nombre_completo").agg(pl.col("cantidad_hechos").sum())),
+        ("un departamento, todos los años", filtrar(df, departamentos=f["departamentos"][:1])
+         .group_by("anio").agg(pl.col("cantidad_hechos").sum())),
+    ]
+
+
+def medir(lf, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        lf.collect()
+        tiempos.append(time.perf_counter() - inicio)
+    p95 = statistics.quantiles(tiempos, n=20)[18] if len(tiempos) > 1 else tiempos[0]
+    return statistics.median(tiempos) * 1000, p95 * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--salida", help="archivo JSON con los resultados")
+    args = parser.parse_args()
+
+    version = consultas.preparar_version()
+    consultas.fijar_version(version)
+    enum = consultas.load_data()
+    categorical = scan_categorical(version)
+
+    muestra = pl.read_parquet(version["ruta"], columns=["anio"] + consultas.COLUMNAS_ENUM)
+    filtros = {
+        "anio": muestra["anio"].max(),
+        "categorias": muestra["categoria_delito"].unique().sort().to_list(),
+        "tipos": muestra["codigo_delito_snic_nombre"].unique().sort().to_list(),
+        "provincias": muestra["provincia_nombre"].unique().sort().to_list(),
+        "departamentos": muestra["depto_nombre_completo"].unique().sort().to_list(),
+    }
+
+    filas = []
+    antes = consultas_vistas(categorical, filtrar_strings, filtros)
+    despues = consultas_vistas(enum, consultas._filtrar, filtros)
+    for (nombre, lf_antes), (_, lf_despues) in zip(antes, despues):
+        assert lf_antes.collect().height == lf_despues.collect().height, nombre
+        p50_antes, p95_antes = medir(lf_antes, args.repeticiones)
+        p50_despues, p95_despues = medir(lf_despues, args.repeticiones)
+        filas.append({
+            "consulta": nombre,
+            "categorical_p50_ms": p50_antes, "categorical_p95_ms": p95_antes,
+            "enum_p50_ms": p50_despues, "enum_p95_ms": p95_despues,
+            "aceleracion": p50_antes / p50_despues,
+        })
+
+    print(f"{'consulta':<42}{'Categorical p50':>17}{'p95':>9}{'Enum p50':>11}{'p95':>9}{'×':>7}")
+    for f in filas:
+        print(
+            f"{f['consulta']:<42}{f['categorical_p50_ms']:>15.2f}ms{f['categorical_p95_ms']:>7.2f}ms"
+            f"{f['enum_p50_ms']:>9.2f}ms{f['enum_p95_ms']:>7.2f}ms{f['aceleracion']:>7.2f}"
+        )
+    if args.salida:
+        Path(args.salida).write_text(json.dumps({
+            "repeticiones": args.repeticiones, "consultas": filas,
+        }, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark de construcción de los cuatro gráficos de "Vista general".
+
+Compara el camino original (px.line + update_layout/update_traces/update_xaxes/
+update_yaxes por figura) con la fábrica de graficos.py. Se mide construcción
+y construcción + serialización a JSON (lo que hace st.plotly_chart).
+
+Uso:
+    python benchmarks/bench_figuras.py --repeticiones 50
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import plotly.express as px
+import plotly.io as pio
+import polars as pl
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import graficos  # noqa: E402
+
+SERIES = [
+    ("tasa_delitos", "#3fbbe2", "Año  %{x}<br>Tasa de delitos  %{y:,.2f}<extra></extra>", ",", False),
+    ("variacion", "#7b59b3", "Año  %{x}<br>Variación  %{y:.2%}<extra></extra>", ".0%", True),
+    ("cantidad_hechos", "#df437e", "Año  %{x}<br>Delitos  %{y:,.0f}<extra></extra>", ",", False),
+    ("cantidad_victimas", "#ef8154", "Año  %{x}<br>Víctimas  %{y:,.0f}<extra></extra>", ",", False),
+]
+
+
+def datos_ejemplo():
+    rng = np.random.default_rng(0)
+    anios = np.arange(2000, 2025, dtype=np.int16)
+    hechos = rng.integers(1_000_000, 2_000_000, len(anios)).astype(np.int32)
+    tasa = hechos / 45_000_000 * 100_000
+    return pl.DataFrame({
+        "anio": anios,
+        "tasa_delitos": tasa,
+        "variacion": pl.Series(tasa).pct_change(),
+        "cantidad_hechos": hechos,
+        "cantidad_victimas": (hechos * 0.4).astype(np.int32),
+    })
+
+
+def figuras_px(df):
+    """Réplica del camino anterior basado en Plotly Express."""
+    df_pd = df.to_pandas()
+    min_anio, max_anio = df["anio"].min(), df["anio"].max()
+    figuras = []
+    for col, color, hover, tickformat, linea_cero in SERIES:
+        fig = px.line(
+            df_pd, x='anio', y=col,
+            line_shape='spline', markers=True, color_discrete_sequence=[color]
+        )
+        fig.update_layout(
+            xaxis_title="", yaxis_title="", showlegend=False,
+            plot_bgcolor='white', paper_bgcolor='white', font=dict(size=12),
+            height=200, margin=dict(l=0, r=30, t=0, b=0)
+        )
+        if linea_cero:
+            fig.add_hline(y=0, line_dash="dash", line_color="darkgrey", line_width=2)
+        fig.update_traces(line=dict(width=3), marker=dict(size=8), hovertemplate=hover)
+        fig.update_xaxes(
+            range=[min_anio - 0.5, max_anio + 0.5], tick0=min_anio, dtick=3,
+            showgrid=True, gridcolor='lightgray'
+        )
+        fig.update_yaxes(showgrid=True, gridcolor='lightgray', tickformat=tickformat)
+        figuras.append(fig)
+    return figuras
+
+
+def _constructores(df):
+    return {
+        col: (lambda col=col, color=color, hover=hover, tf=tf, cero=cero:
+              graficos.figura_linea_anual(df, col, color, hover, tf, linea_cero=cero))
+        for col, color, hover, tf, cero in SERIES
+    }
+
+
+def figuras_fabrica(df):
+    return [constructor() for constructor in _constructores(df).values()]
+
+
+def medir(funcion, df, repeticiones, serializar):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        figuras = funcion(df)
+        if serializar:
+            for fig in figuras:
+                pio.to_json(fig, validate=False)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeticiones", type=int, default=30)
+    args = parser.parse_args()
+
+    df = datos_ejemplo()
+    caminos = {
+        "px (original)": figuras_px,
+        "fábrica go": figuras_fabrica,
+    }
+
+    # Calentar imports y cachés de validadores de Plotly
+    for funcion in caminos.values():
+        funcion(df)
+
+    print(f"{'camino':<24} {'construcción ms (mediana / p95)':>34} {'+ to_json ms (mediana)':>24}")
+    for nombre, funcion in caminos.items():
+        construir = medir(funcion, df, args.repeticiones, serializar=False)
+        con_json = medir(funcion, df, args.repeticiones, serializar=True)
+        p95 = statistics.quantiles(construir, n=20)[-1]
+        print(
+            f"{nombre:<24} {statistics.median(construir):>20.2f} / {p95:>10.2f} "
+            f"{statistics.median(con_json):>24.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Benchmark sin navegador de cada vista del tablero con streamlit.testing.v1.AppTest.
+
+Para cada escenario de la matriz (vista + selecciones de filtros) se mide:
+- tiempo de la primera ejecución tras aplicar los filtros y mediana/p95 de
+  las re-ejecuciones siguientes,
+- cantidad y duración total de los collect() de Polars,
+- pico de RSS del proceso durante el escenario,
+- bytes de los specs de Plotly enviados.
+
+Las vistas se aíslan con DELITOS_NAVEGACION_DIFERIDA=1, así cada escenario
+ejecuta solo su pestaña. Requiere DATOS_SNIC_POB.parquet en la raíz.
+
+Uso:
+    python benchmarks/bench_vistas.py --salida resultados.json
+    python benchmarks/bench_vistas.py --guardar-base benchmarks/base_vistas.json
+    python benchmarks/bench_vistas.py --base benchmarks/base_vistas.json --tolerancia 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import polars as pl
+import psutil
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+os.environ["DELITOS_NAVEGACION_DIFERIDA"] = "1"
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+# Un valor "@n" se resuelve como la n-ésima opción del widget en el momento
+# de ejecutar, así la matriz no depende de los nombres exactos del dataset.
+ESCENARIOS = [
+    {"nombre": "general/default", "vista": "Vista general", "acciones": []},
+    {"nombre": "general/año anterior", "vista": "Vista general",
+     "acciones": [("selectbox", "Año", "@1")]},
+    {"nombre": "general/una categoría", "vista": "Vista general",
+     "acciones": [("multiselect", "Categorías", ["@1"])]},
+    {"nombre": "general/una provincia", "vista": "Vista general",
+     "acciones": [("selectbox", "Provincia", "@1")]},
+    {"nombre": "general/provincia y departamento", "vista": "Vista general",
+     "acciones": [("selectbox", "Provincia", "@1"), ("selectbox", "Departamento tab1", "@1")]},
+    {"nombre": "categorias/default", "vista": "Categorías y tipos de delitos", "acciones": []},
+    {"nombre": "categorias/una provincia", "vista": "Categorías y tipos de delitos",
+     "acciones": [("selectbox", "Provincia tab2", "@1")]},
+    {"nombre": "provincias/default", "vista": "Comparar provincias", "acciones": []},
+    {"nombre": "provincias/una categoría", "vista": "Comparar provincias",
+     "acciones": [("multiselect", "Categorías tab3", ["@1"])]},
+    {"nombre": "provincias/todas en evolución", "vista": "Comparar provincias",
+     "acciones": [("multiselect", "Provincia tab3", ["Todas"])]},
+    {"nombre": "departamentos/default", "vista": "Comparar departamentos", "acciones": []},
+    {"nombre": "departamentos/una provincia", "vista": "Comparar departamentos",
+     "acciones": [("multiselect", "Provincia tab4", ["@1"])]},
+    {"nombre": "departamentos/todos", "vista": "Comparar departamentos",
+     "acciones": [("multiselect", "Departamento tab4", ["Todos"])]},
+    {"nombre": "fuentes/default", "vista": "Fuentes y metodología", "acciones": []},
+]
+
+
+# ---------------- INSTRUMENTACIÓN ---------------- #
+def _es_eager(optimizaciones):
+    flags = getattr(optimizaciones, "_pyoptflags", None)
+    return bool(getattr(flags, "eager", False))
+
+
+class ContadorCollects:
+    """Envuelve LazyFrame.collect para contar llamadas y sumar su duración."""
+
+    def __init__(self):
+        self.cantidad = 0
+        self.segundos = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def activo(self):
+        original = pl.LazyFrame.collect
+        contador = self
+
+        def collect(self, *args, **kwargs):
+            # Las operaciones eager de DataFrame también pasan por collect con
+            # flags "eager"; esas no son consultas y no se cuentan
+            if _es_eager(kwargs.get("optimizations")):
+                return original(self, *args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return original(self, *args, **kwargs)
+            finally:
+                with contador._lock:
+                    contador.cantidad += 1
+                    contador.segundos += time.perf_counter() - inicio
+
+        pl.LazyFrame.collect = collect
+        try:
+            yield self
+        finally:
+            pl.LazyFrame.collect = original
+
+    def reiniciar(self):
+        with self._lock:
+            self.cantidad = 0
+            self.segundos = 0.0
+
+
+class MonitorRSS:
+    """Muestrea el RSS del proceso en un hilo y guarda el máximo observado."""
+
+    def __init__(self, intervalo=0.01):
+        self._proceso = psutil.Process()
+        self._intervalo = intervalo
+        self._detener = threading.Event()
+        self.pico = 0
+
+    def __enter__(self):
+        self.pico = self._proceso.memory_info().rss
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+        self._hilo.start()
+        return self
+
+    def _muestrear(self):
+        while not self._detener.wait(self._intervalo):
+            self.pico = max(self.pico, self._proceso.memory_info().rss)
+
+    def __exit__(self, *exc):
+        self._detener.set()
+        self._hilo.join()
+        self.pico = max(self.pico, self._proceso.memory_info().rss)
+
+
+# ---------------- ESCENARIOS ---------------- #
+def _widget(at, tipo, clave):
+    """Busca el widget por key y, si no tiene, por etiqueta."""
+    elementos = getattr(at, tipo)
+    try:
+        return elementos(key=clave)
+    except KeyError:
+        for elemento in elementos:
+            if elemento.label == clave:
+                return elemento
+    raise KeyError(f"No se encontró {tipo} '{clave}'")
+
+
+def _resolver(widget, valor):
+    if isinstance(valor, list):
+        return [_resolver(widget, v) for v in valor]
+    if isinstance(valor, str) and valor.startswith("@"):
+        return widget.options[int(valor[1:])]
+    return valor
+
+
+def _bytes_graficos(at):
+    return sum(len(chart.proto.spec) for chart in at.get("plotly_chart"))
+
+
+def correr_escenario(escenario, repeticiones, contador):
+    at = AppTest.from_file(str(RAIZ / "app.py"), default_timeout=600)
+    at.session_state["vista"] = escenario["vista"]
+    at.run()
+
+    for tipo, clave, valor in escenario["acciones"]:
+        widget = _widget(at, tipo, clave)
+        widget.set_value(_resolver(widget, valor))
+        at.run()
+        if at.exception:
+            break
+
+    with MonitorRSS() as rss:
+        contador.reiniciar()
+        inicio = time.perf_counter()
+        at.run()
+        primera = time.perf_counter() - inicio
+        collects, segundos_collect = contador.cantidad, contador.segundos
+
+        reruns = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            at.run()
+            reruns.append(time.perf_counter() - inicio)
+
+    if at.exception:
+        raise RuntimeError(f"{escenario['nombre']}: {at.exception[0].message}")
+
+    return {
+        "nombre": escenario["nombre"],
+        "vista": escenario["vista"],
+        "primera_s": primera,
+        "rerun_mediana_s": statistics.median(reruns),
+        "rerun_p95_s": max(reruns) if len(reruns) < 20 else statistics.quantiles(reruns, n=20)[-1],
+        "collects": collects,
+        "collects_s": segundos_collect,
+        "rss_pico_mb": rss.pico / 2**20,
+        "bytes_graficos": _bytes_graficos(at),
+    }
+
+
+# ---------------- COMPARACIÓN ---------------- #
+def comparar(resultados, base, tolerancia):
+    """Lista de regresiones respecto de la base, por escenario y métrica."""
+    por_nombre = {r["nombre"]: r for r in base["escenarios"]}
+    regresiones = []
+    for actual in resultados["escenarios"]:
+        anterior = por_nombre.get(actual["nombre"])
+        if anterior is None:
+            continue
+        for metrica in ("rerun_mediana_s", "collects_s", "rss_pico_mb", "bytes_graficos"):
+            if anterior[metrica] and actual[metrica] > anterior[metrica] * (1 + tolerancia):
+                regresiones.append(
+                    f"{actual['nombre']}: {metrica} {anterior[metrica]:.3f} -> {actual[metrica]:.3f}"
+                )
+        if actual["collects"] > anterior["collects"]:
+            regresiones.append(
+                f"{actual['nombre']}: collects {anterior['collects']} -> {actual['collects']}"
+            )
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--filtro", default="", help="solo escenarios cuyo nombre contenga este texto")
+    parser.add_argument("--salida", type=Path, help="JSON donde guardar los resultados")
+    parser.add_argument("--guardar-base", type=Path, help="guardar los resultados como nueva base")
+    parser.add_argument("--base", type=Path, help="JSON de base contra el cual comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="aumento relativo permitido antes de marcar regresión")
+    args = parser.parse_args()
+
+    contador = ContadorCollects()
+    escenarios = [e for e in ESCENARIOS if args.filtro in e["nombre"]]
+    resultados = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "polars": pl.__version__,
+        "escenarios": [],
+    }
+
+    print(f"{'escenario':<36} {'1ra s':>7} {'rerun s':>8} {'collects':>9} {'collect s':>10} {'RSS MB':>8} {'KB gráf.':>9}")
+    with contador.activo():
+        for escenario in escenarios:
+            r = correr_escenario(escenario, args.repeticiones, contador)
+            resultados["escenarios"].append(r)
+            print(
+                f"{r['nombre']:<36} {r['primera_s']:>7.3f} {r['rerun_mediana_s']:>8.3f} "
+                f"{r['collects']:>9} {r['collects_s']:>10.3f} {r['rss_pico_mb']:>8.0f} "
+                f"{r['bytes_graficos'] / 1024:>9.1f}"
+            )
+
+    for destino in filter(None, (args.salida, args.guardar_base)):
+        destino.write_text(json.dumps(resultados, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    if args.base:
+        base = json.loads(args.base.read_text(encoding="utf-8"))
+        regresiones = comparar(resultados, base, args.tolerancia)
+        if regresiones:
+            print("\nRegresiones:")
+            for linea in regresiones:
+                print(f"  - {linea}")
+            sys.exit(1)
+        print("\nSin regresiones respecto de la base.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Prueba de carga de la API de consultas (api.py) contra una instancia local.
+
+Levanta `python api.py` en un puerto libre (o usa --url para una instancia
+ya corriendo) y durante --duracion segundos --clientes hilos piden rutas
+al azar de una mezcla armada con las opciones reales del dataset (años,
+provincias, categorías). Cada cliente reutiliza su conexión HTTP/1.1.
+
+Reporta por ruta y en total: pedidos, errores, p50/p95/p99 de latencia y
+pedidos por segundo.
+
+Uso:
+    python benchmarks/carga_api.py --clientes 16 --duracion 20
+    python benchmarks/carga_api.py --url http://127.0.0.1:8600 --salida carga.json
+"""
+
+import argparse
+import http.client
+import json
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pedir(conexion, ruta):
+    conexion.request("GET", ruta)
+    respuesta = conexion.getresponse()
+    cuerpo = respuesta.read()
+    return respuesta.status, cuerpo
+
+
+def esperar(host, puerto, timeout=120):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            conexion = http.client.HTTPConnection(host, puerto, timeout=5)
+            estado, _ = _pedir(conexion, "/salud")
+            conexion.close()
+            if estado == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.25)
+    raise TimeoutError(f"la API no respondió en {timeout} s")
+
+
+def armar_mezcla(host, puerto, semilla):
+    """Lista de (nombre de ruta, path con query) con valores reales del dataset."""
+    conexion = http.client.HTTPConnection(host, puerto, timeout=60)
+    _, cuerpo = _pedir(conexion, "/opciones")
+    conexion.close()
+    opciones = json.loads(cuerpo)
+    rng = random.Random(semilla)
+    anios = opciones["anios"][:3]
+
+    def filtros():
+        f = {}
+        if rng.random() < 0.5:
+            f["provincia"] = rng.choice(opciones["provincias"])
+        if rng.random() < 0.3:
+            f["categoria"] = rng.choice(opciones["categorias"])
+        return f
+
+    mezcla = []
+    for _ in range(40):
+        mezcla += [
+            ("resumen", "/resumen?" + urlencode({"anio": rng.choice(anios), **filtros()})),
+            ("serie", "/serie?" + urlencode(filtros())),
+            ("top_tipos", "/top_tipos?" + urlencode({"anio": rng.choice(anios), "n": 5, **filtros()})),
+            ("provincias", "/provincias?" + urlencode({"anio": rng.choice(anios)})),
+            ("departamentos", "/departamentos?" + urlencode(
+                {"anio": rng.choice(anios), "provincia": rng.choice(opciones["provincias"])}
+            )),
+        ]
+    return mezcla
+
+
+def _percentiles(latencias):
+    if len(latencias) < 2:
+        valor = latencias[0] if latencias else None
+        return valor, valor, valor
+    cortes = statistics.quantiles(latencias, n=100)
+    return statistics.median(latencias), cortes[94], cortes[98]
+
+
+def cargar(host, puerto, mezcla, clientes, duracion, semilla):
+    resultados = defaultdict(lambda: {"latencias": [], "errores": 0})
+    lock = threading.Lock()
+    fin = time.monotonic() + duracion
+
+    def cliente(indice):
+        rng = random.Random(semilla + indice)
+        conexion = http.client.HTTPConnection(host, puerto, timeout=60)
+        locales = defaultdict(lambda: {"latencias": [], "errores": 0})
+        while time.monotonic() < fin:
+            nombre, ruta = rng.choice(mezcla)
+            inicio = time.perf_counter()
+            try:
+                estado, _ = _pedir(conexion, ruta)
+                ok = estado == 200
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conexion.close()
+                conexion = http.client.HTTPConnection(host, puerto, timeout=60)
+            latencia = time.perf_counter() - inicio
+            if ok:
+                locales[nombre]["latencias"].append(latencia)
+            else:
+                locales[nombre]["errores"] += 1
+        conexion.close()
+        with lock:
+            for nombre, datos in locales.items():
+                resultados[nombre]["latencias"] += datos["latencias"]
+                resultados[nombre]["errores"] += datos["errores"]
+
+    hilos = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    segundos = time.perf_counter() - inicio
+
+    filas = []
+    todas = []
+    errores = 0
+    for nombre, datos in sorted(resultados.items()):
+        todas += datos["latencias"]
+        errores += datos["errores"]
+        filas.append(_fila(nombre, datos["latencias"], datos["errores"], segundos))
+    filas.append(_fila("total", todas, errores, segundos))
+    return filas
+
+
+def _fila(nombre, latencias, errores, segundos):
+    p50, p95, p99 = _percentiles(latencias)
+    return {
+        "ruta": nombre,
+        "pedidos": len(latencias),
+        "errores": errores,
+        "p50_ms": p50 and p50 * 1000,
+        "p95_ms": p95 and p95 * 1000,
+        "p99_ms": p99 and p99 * 1000,
+        "pedidos_s": len(latencias) / segundos,
+    }
+
+
+def imprimir(filas):
+    print(f"{'ruta':<16}{'pedidos':>9}{'errores':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ped/s':>10}")
+    for f in filas:
+        print(
+            f"{f['ruta']:<16}{f['pedidos']:>9}{f['errores']:>9}"
+            f"{f['p50_ms'] or 0:>10.2f}{f['p95_ms'] or 0:>10.2f}{f['p99_ms'] or 0:>10.2f}"
+            f"{f['pedidos_s']:>10.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="instancia ya corriendo; si falta se levanta una local")
+    parser.add_argument("--clientes", type=int, default=8)
+    parser.add_argument("--duracion", type=float, default=15.0, help="segundos de carga")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="archivo JSON con los resultados")
+    args = parser.parse_args()
+
+    proceso = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, puerto = url.hostname, url.port
+    else:
+        host, puerto = "127.0.0.1", _puerto_libre()
+        proceso = subprocess.Popen(
+            [sys.executable, str(RAIZ / "api.py"), "--puerto", str(puerto)], cwd=RAIZ,
+        )
+    try:
+        esperar(host, puerto)
+        mezcla = armar_mezcla(host, puerto, args.semilla)
+        filas = cargar(host, puerto, mezcla, args.clientes, args.duracion, args.semilla)
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait()
+
+    imprimir(filas)
+    if args.salida:
+        Path(args.salida).write_text(json.dumps({
+            "clientes": args.clientes, "duracion_s": args.duracion, "rutas": filas,
+        }, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
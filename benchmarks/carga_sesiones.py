@@ -0,0 +1,375 @@
+"""
+Prueba de carga de sesiones concurrentes del tablero (app.py), sin navegador.
+
+Cada sesión es un streamlit.testing.v1.AppTest que recorre en bucle uno de
+los RECORRIDOS (cambiar de vista, de año, elegir provincias...) durante
+--duracion segundos; cada paso es un rerun y se mide su latencia. Las
+--sesiones se reparten entre --procesos procesos y, dentro de cada uno,
+corren en hilos como las sesiones de un servidor de Streamlit: comparten
+las cachés del proceso. Con DELITOS_DIR_CACHE los procesos además comparten
+la caché en disco. El proceso principal solo coordina y muestrea el RSS de
+cada proceso cada --intervalo segundos.
+
+Las vistas se ejecutan con DELITOS_NAVEGACION_DIFERIDA=1, así cambiar de
+vista es un rerun como cualquier otro widget. La primera ejecución de cada
+sesión (arranque en frío del proceso) se hace antes de empezar a medir y se
+reporta aparte.
+
+Reporta por paso y en total: reruns, errores, p50/p95/p99 de latencia y
+reruns por segundo; por proceso, el RSS al empezar la carga, el pico y al
+final, y la serie de RSS en el tiempo. Requiere DATOS_SNIC_POB.parquet en
+la raíz.
+
+Uso:
+    python benchmarks/carga_sesiones.py --sesiones 8 --duracion 60
+    python benchmarks/carga_sesiones.py --sesiones 16 --procesos 4 --salida sesiones.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import psutil
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+os.environ["DELITOS_NAVEGACION_DIFERIDA"] = "1"
+
+from bench_vistas import _resolver, _widget  # noqa: E402
+from carga_api import _percentiles  # noqa: E402
+
+# Mensajes de error distintos que se reportan
+MAX_ERRORES = 10
+
+# Cada recorrido empieza en `vista` y repite sus pasos (etiqueta, tipo de
+# widget, key, valor) en ciclo; los pasos dejan los filtros como estaban al
+# completar la vuelta. Un valor "@n" es la n-ésima opción del widget.
+RECORRIDOS = {
+    "general y provincias": {
+        "vista": "Vista general",
+        "pasos": [
+            ("cambiar año", "selectbox", "Año tab1", "@1"),
+            ("elegir provincia", "selectbox", "Provincia tab1", "@1"),
+            ("cambiar vista", "radio", "vista", "Comparar provincias"),
+            ("cambiar año", "selectbox", "Año tab3", "@1"),
+            ("elegir provincias", "multiselect", "Provincia tab3", ["@1", "@2", "@3"]),
+            ("cambiar vista", "radio", "vista", "Vista general"),
+            ("cambiar año", "selectbox", "Año tab1", "@0"),
+            ("elegir provincia", "selectbox", "Provincia tab1", "@0"),
+        ],
+    },
+    "categorías": {
+        "vista": "Categorías y tipos de delitos",
+        "pasos": [
+            ("cambiar año", "selectbox", "Año tab2", "@1"),
+            ("elegir provincia", "selectbox", "Provincia tab2", "@2"),
+            ("elegir categoría", "multiselect", "Categorías tab2", ["@1"]),
+            ("cambiar vista", "radio", "vista", "Vista general"),
+            ("cambiar vista", "radio", "vista", "Categorías y tipos de delitos"),
+            ("cambiar año", "selectbox", "Año tab2", "@0"),
+            ("elegir provincia", "selectbox", "Provincia tab2", "@0"),
+            ("elegir categoría", "multiselect", "Categorías tab2", ["Todas"]),
+        ],
+    },
+    "departamentos": {
+        "vista": "Comparar departamentos",
+        "pasos": [
+            ("cambiar año", "selectbox", "Año tab4", "@1"),
+            ("elegir provincias", "multiselect", "Provincia tab4", ["@2"]),
+            ("tasa suavizada", "toggle", "Tasa suavizada tab4", True),
+            ("cambiar vista", "radio", "vista", "Comparar provincias"),
+            ("elegir provincias", "multiselect", "Provincia tab3", ["Todas"]),
+            ("cambiar vista", "radio", "vista", "Comparar departamentos"),
+            ("tasa suavizada", "toggle", "Tasa suavizada tab4", False),
+            ("elegir provincias", "multiselect", "Provincia tab4", ["Todas"]),
+            ("cambiar año", "selectbox", "Año tab4", "@0"),
+        ],
+    },
+}
+
+
+# ---------------- SESIONES ---------------- #
+def _runtime_compartido():
+    """
+    AppTest instala un Runtime simulado global al empezar cada run y lo
+    borra al terminar, así que dos sesiones en hilos se lo sacan una a la
+    otra. Las búsquedas del Runtime caen en uno compartido (armado igual que
+    el de AppTest) cuando el de la sesión ya no está.
+    """
+    from unittest.mock import MagicMock
+
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    compartido = MagicMock(spec=Runtime)
+    compartido.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    compartido.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: cls._instance or compartido)
+    Runtime.exists = classmethod(lambda cls: True)
+    # AppTest lo activa y restaura en cada run; fijo no se pisa entre hilos
+    config.set_option("global.appTest", True)
+
+
+def _vista_en(recorrido, paso):
+    """Vista en la que está el recorrido antes de su paso número `paso`."""
+    vista = RECORRIDOS[recorrido]["vista"]
+    for _, tipo, clave, valor in RECORRIDOS[recorrido]["pasos"][:paso]:
+        if (tipo, clave) == ("radio", "vista"):
+            vista = valor
+    return vista
+
+
+def sesion(recorrido, desfase, duracion, listas, arranque, resultado):
+    """
+    Una sesión: primera ejecución en la vista del paso `desfase`, espera a
+    que arranquen todas y recorre sus pasos en ciclo desde ahí hasta agotar
+    `duracion`. Deja en `resultado` la
+    primera ejecución y, por rerun, (etiqueta, segundos desde el arranque,
+    latencia, mensaje de error o None).
+    """
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(RAIZ / "app.py"), default_timeout=600)
+    at.session_state["vista"] = _vista_en(recorrido, desfase)
+    resultado["reruns"] = reruns = []
+    inicio = time.perf_counter()
+    try:
+        at.run()
+    finally:
+        resultado["primera_s"] = time.perf_counter() - inicio
+        listas.wait()
+    arranque.wait()
+
+    cero = time.time()
+    fin = time.monotonic() + duracion
+    pasos = RECORRIDOS[recorrido]["pasos"]
+    i = desfase
+    while time.monotonic() < fin:
+        etiqueta, tipo, clave, valor = pasos[i % len(pasos)]
+        i += 1
+        inicio = time.perf_counter()
+        try:
+            widget = _widget(at, tipo, clave)
+            widget.set_value(_resolver(widget, valor))
+            at.run()
+            error = at.exception[0].message if at.exception else None
+        except Exception as e:
+            error = repr(e)
+        reruns.append((etiqueta, time.time() - cero, time.perf_counter() - inicio, error))
+
+
+def proceso(indice, sesiones, duracion, cola, arranque):
+    """
+    Corre `sesiones` [(recorrido, desfase)] en hilos. Avisa por `cola` cuando
+    todas hicieron su primera ejecución, espera `arranque` y al final manda
+    los resultados.
+    """
+    _runtime_compartido()
+    listas = threading.Barrier(len(sesiones) + 1)
+    arranque_local = threading.Event()
+    resultados = [{"proceso": indice, "recorrido": r} for r, _ in sesiones]
+    hilos = [
+        threading.Thread(target=sesion, args=(r, d, duracion, listas, arranque_local, resultado))
+        for (r, d), resultado in zip(sesiones, resultados)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    listas.wait()
+    cola.put(("lista", indice, None))
+    arranque.wait()
+    arranque_local.set()
+    for hilo in hilos:
+        hilo.join()
+    cola.put(("resultado", indice, resultados))
+
+
+# ---------------- CARGA ---------------- #
+def _rss(pids):
+    valores = {}
+    for indice, pid in pids.items():
+        try:
+            valores[indice] = psutil.Process(pid).memory_info().rss
+        except psutil.NoSuchProcess:
+            valores[indice] = None
+    return valores
+
+
+def cargar(sesiones, procesos, duracion, intervalo, semilla):
+    """Reparte las sesiones, corre la carga y devuelve (sesiones, serie de RSS)."""
+    rng = random.Random(semilla)
+    nombres = list(RECORRIDOS)
+    por_proceso = defaultdict(list)
+    for i in range(sesiones):
+        recorrido = nombres[i % len(nombres)]
+        desfase = rng.randrange(len(RECORRIDOS[recorrido]["pasos"]))
+        por_proceso[i % procesos].append((recorrido, desfase))
+
+    contexto = multiprocessing.get_context("spawn")
+    cola = contexto.Queue()
+    arranque = contexto.Event()
+    hijos = [
+        contexto.Process(target=proceso, args=(i, por_proceso[i], duracion, cola, arranque))
+        for i in range(procesos)
+    ]
+    for hijo in hijos:
+        hijo.start()
+    pids = {i: hijo.pid for i, hijo in enumerate(hijos)}
+
+    serie = []
+    listos, resultados = set(), []
+    arrancado = None
+    while len(resultados) < procesos:
+        if not serie or time.time() - serie[-1]["instante"] >= intervalo:
+            serie.append({"instante": time.time(), "rss": _rss(pids)})
+        try:
+            tipo, indice, datos = cola.get(timeout=intervalo)
+        except queue.Empty:
+            if not any(hijo.is_alive() for hijo in hijos):
+                raise RuntimeError("los procesos de carga terminaron sin resultados")
+            continue
+        if tipo == "lista":
+            listos.add(indice)
+            if len(listos) == procesos:
+                arranque.set()
+                arrancado = time.time()
+        else:
+            resultados.append(datos)
+    for hijo in hijos:
+        hijo.join()
+    # t negativo: antes de arrancar la carga (primeras ejecuciones)
+    serie = [{"t_s": m["instante"] - (arrancado or m["instante"]), "rss": m["rss"]} for m in serie]
+    return [s for r in resultados for s in r], serie
+
+
+# ---------------- REPORTE ---------------- #
+def _fila(nombre, latencias, errores, segundos):
+    p50, p95, p99 = _percentiles(latencias)
+    return {
+        "paso": nombre,
+        "reruns": len(latencias),
+        "errores": errores,
+        "p50_ms": p50 and p50 * 1000,
+        "p95_ms": p95 and p95 * 1000,
+        "p99_ms": p99 and p99 * 1000,
+        "reruns_s": len(latencias) / segundos,
+    }
+
+
+def resumir(sesiones, serie):
+    por_paso = defaultdict(lambda: {"latencias": [], "errores": 0})
+    mensajes = set()
+    fin = 0.0
+    for s in sesiones:
+        for etiqueta, instante, latencia, error in s["reruns"]:
+            fin = max(fin, instante + latencia)
+            if error is None:
+                por_paso[etiqueta]["latencias"].append(latencia)
+            else:
+                por_paso[etiqueta]["errores"] += 1
+                mensajes.add(f"{s['recorrido']} / {etiqueta}: {error}")
+    segundos = fin or 1.0
+
+    pasos, todas, errores = [], [], 0
+    for etiqueta, datos in sorted(por_paso.items()):
+        todas += datos["latencias"]
+        errores += datos["errores"]
+        pasos.append(_fila(etiqueta, datos["latencias"], datos["errores"], segundos))
+    pasos.append(_fila("total", todas, errores, segundos))
+
+    procesos = sorted({i for muestra in serie for i in muestra["rss"]})
+    memoria = []
+    for i in procesos:
+        valores = [(m["t_s"], m["rss"][i]) for m in serie if m["rss"].get(i)]
+        en_carga = [rss for t, rss in valores if t >= 0] or [rss for _, rss in valores]
+        memoria.append({
+            "proceso": i,
+            "sesiones": sum(s["proceso"] == i for s in sesiones),
+            "rss_inicio_mb": en_carga[0] / 2**20,
+            "rss_pico_mb": max(rss for _, rss in valores) / 2**20,
+            "rss_final_mb": en_carga[-1] / 2**20,
+        })
+    primeras = [s["primera_s"] for s in sesiones]
+    return {
+        "segundos": segundos,
+        "primera_mediana_s": statistics.median(primeras),
+        "primera_max_s": max(primeras),
+        "pasos": pasos,
+        "errores": sorted(mensajes)[:MAX_ERRORES],
+        "memoria": memoria,
+        "serie_rss": [
+            {"t_s": round(m["t_s"], 2), **{f"proceso_{i}_mb": rss and rss / 2**20 for i, rss in m["rss"].items()}}
+            for m in serie
+        ],
+    }
+
+
+def imprimir(resumen, filas_serie=12):
+    print(
+        f"Primera ejecución por sesión: mediana {resumen['primera_mediana_s']:.2f} s, "
+        f"máximo {resumen['primera_max_s']:.2f} s. Carga medida: {resumen['segundos']:.1f} s.\n"
+    )
+    print(f"{'paso':<20}{'reruns':>8}{'errores':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'reruns/s':>10}")
+    for f in resumen["pasos"]:
+        print(
+            f"{f['paso']:<20}{f['reruns']:>8}{f['errores']:>9}"
+            f"{f['p50_ms'] or 0:>10.1f}{f['p95_ms'] or 0:>10.1f}{f['p99_ms'] or 0:>10.1f}"
+            f"{f['reruns_s']:>10.2f}"
+        )
+
+    if resumen["errores"]:
+        print("\nErrores:")
+        for mensaje in resumen["errores"]:
+            print(f"  - {mensaje}")
+
+    print(f"\n{'proceso':<10}{'sesiones':>9}{'RSS inicio MB':>15}{'pico MB':>10}{'final MB':>10}")
+    for p in resumen["memoria"]:
+        print(
+            f"{p['proceso']:<10}{p['sesiones']:>9}{p['rss_inicio_mb']:>15.0f}"
+            f"{p['rss_pico_mb']:>10.0f}{p['rss_final_mb']:>10.0f}"
+        )
+
+    serie = [m for m in resumen["serie_rss"] if m["t_s"] >= 0]
+    if serie:
+        paso = max(1, len(serie) // filas_serie)
+        columnas = [c for c in serie[0] if c != "t_s"]
+        print("\nRSS MB en el tiempo")
+        print(f"{'t s':>7}" + "".join(f"{c.removesuffix('_mb'):>12}" for c in columnas))
+        for m in serie[::paso]:
+            print(f"{m['t_s']:>7.1f}" + "".join(f"{m[c] or 0:>12.0f}" for c in columnas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sesiones", type=int, default=4)
+    parser.add_argument("--procesos", type=int, default=1)
+    parser.add_argument("--duracion", type=float, default=30.0, help="segundos de carga")
+    parser.add_argument("--intervalo", type=float, default=1.0, help="segundos entre muestras de RSS")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="archivo JSON con los resultados")
+    args = parser.parse_args()
+
+    procesos = max(1, min(args.procesos, args.sesiones))
+    sesiones, serie = cargar(args.sesiones, procesos, args.duracion, args.intervalo, args.semilla)
+    resumen = resumir(sesiones, serie)
+    imprimir(resumen)
+    if args.salida:
+        Path(args.salida).write_text(json.dumps({
+            "sesiones": args.sesiones, "procesos": procesos, "duracion_s": args.duracion,
+            **resumen,
+        }, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
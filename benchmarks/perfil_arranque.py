@@ -0,0 +1,118 @@
+"""
+Perfil de arranque en frío del tablero.
+
+Cada medición corre en un proceso nuevo, así que las cachés de Streamlit y los
+módulos importados empiezan vacíos. La app se ejecuta sin navegador con
+streamlit.testing.v1.AppTest (requiere DATOS_SNIC_POB.parquet en la raíz).
+
+- importtime: corre una primera ejecución de app.py con `python -X importtime`
+  y agrupa el tiempo de import por paquete de primer nivel, sin contar la
+  maquinaria de AppTest.
+- arranque: tiempo de import de Streamlit y de la primera ejecución del script
+  con pestañas (default) y con DELITOS_NAVEGACION_DIFERIDA=1 para distintas
+  vistas iniciales.
+
+Uso:
+    python benchmarks/perfil_arranque.py --repeticiones 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+_SCRIPT_PRIMERA_EJECUCION = """
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=600)
+vista = {vista!r}
+if vista:
+    at.session_state["vista"] = vista
+at.run()
+t2 = time.perf_counter()
+if at.exception:
+    raise SystemExit(at.exception[0].message)
+print(json.dumps({{
+    "import_streamlit_s": t1 - t0,
+    "primera_ejecucion_s": t2 - t1,
+    "modulos": {{m: m in sys.modules for m in ("plotly.express", "pandas", "numpy", "pyarrow")}},
+}}))
+"""
+
+# Modos de arranque a comparar: (nombre, navegación diferida, vista inicial)
+MODOS = [
+    ("pestañas (todas las vistas)", False, None),
+    ("diferida: Vista general", True, "Vista general"),
+    ("diferida: Fuentes y metodología", True, "Fuentes y metodología"),
+]
+
+
+def _entorno(diferida):
+    entorno = dict(os.environ)
+    entorno["PYTHONPATH"] = os.pathsep.join(filter(None, [str(RAIZ), entorno.get("PYTHONPATH")]))
+    entorno["DELITOS_NAVEGACION_DIFERIDA"] = "1" if diferida else "0"
+    return entorno
+
+
+def _correr(diferida, vista, importtime=False):
+    comando = [sys.executable]
+    if importtime:
+        comando += ["-X", "importtime"]
+    comando += ["-c", _SCRIPT_PRIMERA_EJECUCION.format(vista=vista)]
+    resultado = subprocess.run(
+        comando, cwd=RAIZ, env=_entorno(diferida), capture_output=True, text=True
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(resultado.stderr[-2000:])
+    return json.loads(resultado.stdout.strip().splitlines()[-1]), resultado.stderr
+
+
+def desglose_importtime(diferida, vista, top):
+    """Microsegundos de import propios agrupados por paquete de primer nivel."""
+    _, stderr = _correr(diferida, vista, importtime=True)
+    por_paquete = defaultdict(int)
+    for linea in stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, _, modulo = linea[len("import time:"):].split("|")
+        modulo = modulo.strip()
+        if modulo.startswith("streamlit.testing"):
+            continue
+        por_paquete[modulo.split(".")[0]] += int(propio)
+    return sorted(por_paquete.items(), key=lambda kv: kv[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--top", type=int, default=12, help="paquetes a listar en el desglose")
+    args = parser.parse_args()
+
+    for nombre, diferida, vista in MODOS:
+        print(f"\n== importtime, {nombre} ==")
+        for paquete, micros in desglose_importtime(diferida, vista, args.top):
+            print(f"  {paquete:<24} {micros / 1000:>8.1f} ms")
+
+    print(f"\n== arranque en frío (mediana de {args.repeticiones}) ==")
+    print(f"{'modo':<34} {'import streamlit s':>18} {'1ra ejecución s':>16}  módulos cargados")
+    for nombre, diferida, vista in MODOS:
+        corridas = [_correr(diferida, vista)[0] for _ in range(args.repeticiones)]
+        cargados = [m for m, cargado in corridas[-1]["modulos"].items() if cargado]
+        print(
+            f"{nombre:<34} "
+            f"{statistics.median(c['import_streamlit_s'] for c in corridas):>18.2f} "
+            f"{statistics.median(c['primera_ejecucion_s'] for c in corridas):>16.2f}  "
+            f"{', '.join(cargados) or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Índice y búsqueda de departamentos para los selectores del tablero."""
+
+import unicodedata
+
+import polars as pl
+
+import metricas
+
+# Cantidad máxima de coincidencias que se envían al widget
+LIMITE_RESULTADOS = 20
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos, para comparar sin importar tildes ni eñes."""
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).lower().strip()
+
+
+def normalizar_expr(col):
+    """Expresión equivalente a normalizar() sobre una columna."""
+    return (
+        pl.col(col).cast(pl.Utf8)
+        .str.normalize("NFKD")
+        .str.replace_all(r"\p{M}", "")
+        .str.to_lowercase()
+    )
+
+
+def construir_indice(df_lazy):
+    """
+    Un único scan con los pares departamento-provincia y la clave de búsqueda
+    normalizada. La clave es solo el nombre del departamento (sin la provincia
+    que agrega depto_nombre_completo), así "san" no coincide con "San Juan"
+    en cada departamento de esa provincia.
+    """
+    return (
+        df_lazy
+        .select(["depto_nombre_completo", "provincia_nombre"])
+        .unique()
+        .with_columns([
+            pl.col("depto_nombre_completo").cast(pl.Utf8),
+            pl.col("provincia_nombre").cast(pl.Utf8),
+        ])
+        .with_columns(
+            normalizar_expr("depto_nombre_completo")
+            .str.split(",").list.first()
+            .alias("clave")
+        )
+        .sort("depto_nombre_completo")
+        .pipe(metricas.recolectar, "indice_departamentos", tipo="opciones")
+    )
+
+
+def buscar_departamentos(indice, texto="", provincias=None, limite=LIMITE_RESULTADOS):
+    """
+    Devuelve hasta `limite` nombres completos de departamentos que coinciden
+    con `texto`, restringidos a `provincias` si se indican.
+
+    Orden: primero los que empiezan con el texto, luego los que tienen una
+    palabra que empieza con el texto y por último los que lo contienen en
+    cualquier posición; dentro de cada grupo, alfabético. Sin texto devuelve
+    los primeros en orden alfabético.
+    """
+    candidatos = indice
+    if provincias:
+        candidatos = candidatos.filter(pl.col("provincia_nombre").is_in(provincias))
+
+    consulta = normalizar(texto)
+    if not consulta:
+        return candidatos["depto_nombre_completo"].head(limite).to_list()
+
+    return (
+        candidatos
+        .filter(pl.col("clave").str.contains(consulta, literal=True))
+        .with_columns(
+            pl.when(pl.col("clave").str.starts_with(consulta)).then(0)
+            .when(pl.col("clave").str.contains(" " + consulta, literal=True)).then(1)
+            .otherwise(2)
+            .alias("orden")
+        )
+        .sort(["orden", "depto_nombre_completo"])
+        .head(limite)["depto_nombre_completo"]
+        .to_list()
+    )
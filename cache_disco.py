@@ -0,0 +1,246 @@
+"""
+Caché de resultados en disco, compartida por todos los procesos del host.
+
+st.cache_data vive en la memoria de cada proceso: con varias réplicas de
+Streamlit detrás del balanceador, cada una recalculaba y guardaba las mismas
+agregaciones. Con DELITOS_DIR_CACHE=/ruta las consultas decoradas con
+`persistente` guardan su resultado en un archivo Arrow IPC comprimido con
+zstd, cuya clave combina:
+
+- el nombre de la consulta y la versión del código: un hash de las fuentes
+  del módulo que la define y de los módulos del repositorio que importa
+  (helpers como _filtrar o load_data incluidos) más la versión de Polars,
+  así un deploy que cambia cualquiera de ellos no reutiliza resultados
+  viejos aunque el dataset sea el mismo,
+- la versión del dataset (la función `version` que recibe el decorador),
+- los argumentos ya normalizados (posicionales y por nombre dan la misma clave).
+
+Cualquier proceso puede leer y poblar la caché. Las escrituras son atómicas
+(archivo temporal + os.replace), cada lectura actualiza el mtime del archivo y,
+cuando el directorio pasa DELITOS_CACHE_DISCO_MB, se borran los menos usados
+recientemente hasta quedar en el 90 % del límite.
+
+Queda debajo de st.cache_data: solo se consulta en un fallo de la caché en
+memoria.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import polars as pl
+
+import metricas
+
+logger = logging.getLogger(__name__)
+
+DIR_CACHE = os.environ.get("DELITOS_DIR_CACHE")
+MAX_BYTES = int(float(os.environ.get("DELITOS_CACHE_DISCO_MB", "512")) * 2**20)
+# Fracción del límite a la que se baja al desalojar, para no desalojar en cada escritura
+FRACCION_DESALOJO = 0.9
+# Temporales de escrituras interrumpidas que se limpian al desalojar
+EDAD_TEMPORALES = 3600
+COMPRESION = "zstd"
+EXTENSION = ".arrow"
+
+# Prefijos de columna del sobre con que se guardan resultados que no son un DataFrame
+_PREFIJO_TUPLA = "_tupla_"
+_PREFIJO_DICT = "_dict_"
+
+
+# ---------------- CODIFICACIÓN ---------------- #
+def _codificar(valor):
+    """DataFrame tal cual; tuplas de DataFrames y dicts, en una fila con una columna por elemento."""
+    if isinstance(valor, pl.DataFrame):
+        return valor
+    if isinstance(valor, tuple) and all(isinstance(v, pl.DataFrame) for v in valor):
+        return pl.DataFrame({
+            f"{_PREFIJO_TUPLA}{i}": [df.to_struct("fila")] for i, df in enumerate(valor)
+        })
+    if isinstance(valor, dict):
+        return pl.DataFrame({f"{_PREFIJO_DICT}{clave}": [v] for clave, v in valor.items()})
+    raise TypeError(f"No se puede guardar en disco un {type(valor).__name__}")
+
+
+def _decodificar(df):
+    columnas = df.columns
+    if columnas and all(c.startswith(_PREFIJO_TUPLA) for c in columnas):
+        return tuple(df[c][0].struct.unnest() for c in columnas)
+    if columnas and all(c.startswith(_PREFIJO_DICT) for c in columnas):
+        fila = df.row(0, named=True)
+        return {c[len(_PREFIJO_DICT):]: v for c, v in fila.items()}
+    return df
+
+
+# ---------------- ALMACÉN ---------------- #
+class Almacen:
+    """Directorio de resultados con escritura atómica y desalojo LRU por mtime."""
+
+    def __init__(self, directorio, max_bytes=MAX_BYTES):
+        self.directorio = Path(directorio)
+        self.max_bytes = max_bytes
+        self.directorio.mkdir(parents=True, exist_ok=True)
+
+    def _ruta(self, clave):
+        return self.directorio / f"{clave}{EXTENSION}"
+
+    def leer(self, clave):
+        """Resultado guardado, o None si no está (o el archivo está dañado)."""
+        ruta = self._ruta(clave)
+        try:
+            df = pl.read_ipc(ruta, memory_map=False)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("caché en disco: %s ilegible, se descarta (%r)", ruta.name, e)
+            ruta.unlink(missing_ok=True)
+            return None
+        try:
+            # El mtime hace de "último uso" para el LRU
+            os.utime(ruta)
+        except OSError:
+            pass
+        return _decodificar(df)
+
+    def escribir(self, clave, valor):
+        ruta = self._ruta(clave)
+        temporal = self.directorio / f".{clave}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            _codificar(valor).write_ipc(temporal, compression=COMPRESION)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            # Disco lleno, permisos, etc.: la consulta ya está calculada, solo se pierde la caché
+            logger.warning("caché en disco: no se pudo escribir %s (%r)", ruta.name, e)
+            temporal.unlink(missing_ok=True)
+            return
+        self.desalojar()
+
+    def tamano(self):
+        return sum(e.stat().st_size for e in os.scandir(self.directorio) if e.is_file())
+
+    def desalojar(self):
+        """Borra los resultados usados hace más tiempo hasta volver bajo el límite."""
+        entradas = []
+        total = 0
+        ahora = time.time()
+        for entrada in os.scandir(self.directorio):
+            try:
+                info = entrada.stat()
+            except FileNotFoundError:  # otro proceso la borró
+                continue
+            if entrada.name.endswith(".tmp"):
+                if ahora - info.st_mtime > EDAD_TEMPORALES:
+                    Path(entrada.path).unlink(missing_ok=True)
+                continue
+            entradas.append((info.st_mtime, info.st_size, entrada.path))
+            total += info.st_size
+
+        if total <= self.max_bytes:
+            return 0
+        objetivo = self.max_bytes * FRACCION_DESALOJO
+        borradas = 0
+        for _, tamano, ruta in sorted(entradas):
+            if total <= objetivo:
+                break
+            Path(ruta).unlink(missing_ok=True)
+            total -= tamano
+            borradas += 1
+        logger.info("caché en disco: %d resultados desalojados", borradas)
+        return borradas
+
+    def limpiar(self):
+        for entrada in os.scandir(self.directorio):
+            if entrada.name.endswith((EXTENSION, ".tmp")):
+                Path(entrada.path).unlink(missing_ok=True)
+
+
+_almacen = Almacen(DIR_CACHE) if DIR_CACHE else None
+
+
+def almacen():
+    """Almacén configurado por DELITOS_DIR_CACHE, o None si la caché en disco está apagada."""
+    return _almacen
+
+
+# ---------------- DECORADOR ---------------- #
+RAIZ = Path(__file__).resolve().parent
+
+
+def _archivos_locales(modulo, vistos):
+    """Fuente de `modulo` y de los módulos del repositorio que importa, recursivamente."""
+    archivo = getattr(modulo, "__file__", None)
+    if archivo is None or Path(archivo).resolve().parent != RAIZ or modulo in vistos:
+        return vistos
+    vistos.add(modulo)
+    for valor in list(vars(modulo).values()):
+        # Módulos importados y también `from x import y`
+        if inspect.ismodule(valor):
+            dependencia = valor
+        else:
+            dependencia = sys.modules.get(getattr(valor, "__module__", None) or "")
+        if dependencia is not None:
+            _archivos_locales(dependencia, vistos)
+    return vistos
+
+
+@functools.cache
+def version_codigo(nombre_modulo):
+    """
+    Hash de las fuentes del módulo `nombre_modulo` y de los módulos del
+    repositorio que importa, más la versión de Polars. Se calcula en la
+    primera consulta, cuando el módulo ya terminó de importarse.
+    """
+    hash_ = hashlib.sha256(pl.__version__.encode())
+    modulos = _archivos_locales(sys.modules[nombre_modulo], set())
+    for archivo in sorted(Path(m.__file__).resolve() for m in modulos):
+        hash_.update(archivo.name.encode())
+        hash_.update(archivo.read_bytes())
+    return hash_.hexdigest()[:16]
+
+
+def _clave(nombre, codigo, version, argumentos):
+    especificacion = json.dumps(
+        [nombre, codigo, version, argumentos],
+        ensure_ascii=False, sort_keys=True, default=str,
+    )
+    return f"{nombre}-{hashlib.sha256(especificacion.encode()).hexdigest()[:32]}"
+
+
+def persistente(nombre, version):
+    """
+    Guarda en disco el resultado de la consulta `nombre`. `version` es una
+    función sin argumentos que identifica el dataset vigente. Sin
+    DELITOS_DIR_CACHE la función se devuelve intacta.
+    """
+    def decorador(funcion):
+        if _almacen is None:
+            return funcion
+
+        firma = inspect.signature(funcion)
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            argumentos = firma.bind(*args, **kwargs)
+            argumentos.apply_defaults()
+            clave = _clave(nombre, version_codigo(funcion.__module__), version(), argumentos.arguments)
+
+            with metricas.medir("disco", nombre) as medicion:
+                resultado = _almacen.leer(clave)
+            medicion["acierto"] = resultado is not None
+            metricas.contar_cache(f"disco:{nombre}", medicion["acierto"])
+            if resultado is not None:
+                return resultado
+
+            resultado = funcion(*args, **kwargs)
+            _almacen.escribir(clave, resultado)
+            return resultado
+
+        return envoltura
+    return decorador
@@ -0,0 +1,1065 @@
+"""
+Carga de datos y consultas agregadas del tablero.
+
+Cada consulta recibe los filtros ya normalizados (tuplas vacías o None
+significan "todas/todos") y devuelve un resultado chico y materializado,
+cacheado con st.cache_data por combinación de filtros. Así las vistas, el
+precalentamiento y cualquier otro consumidor comparten las mismas entradas.
+Con DELITOS_DIR_CACHE los resultados también se guardan en disco para el
+resto de los procesos del host (ver cache_disco).
+
+Cada versión del archivo se identifica por su huella (tamaño y hash del footer
+del parquet) y se lee desde una copia inmutable en DELITOS_DIR_VERSIONES
+(por defecto versiones/<huella>/). La huella forma parte de la clave de todas
+las cachés, así que no hay TTL: un archivo nuevo usa entradas nuevas y uno
+sin cambios nunca se vuelve a escanear. vigilancia.py detecta los cambios,
+prepara la versión nueva en segundo plano y la publica con publicar(); cada
+rerun fija al empezar la versión que va a usar (fijar_version), de modo que
+los que están en curso terminan con la anterior.
+
+Las vistas no leen el archivo original sino una copia tipada de la versión
+(_rollup_tipado): categoría, tipo, provincia y departamento como pl.Enum con
+el dominio fijado al prepararla, así los filtros comparan códigos.
+
+Si el parquet trae la columna `mes` (grano mensual del SNIC), al preparar la
+versión se escriben dos agregados junto a la copia: uno anual con el mismo
+esquema que el dataset anual, que es lo que leen las vistas existentes (así
+no escanean 12 veces más filas), y uno mensual por provincia para las vistas
+de estacionalidad.
+"""
+
+import atexit
+import functools
+import hashlib
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+from pathlib import Path
+
+import polars as pl
+import streamlit as st
+
+import anomalias
+import busqueda
+import cache_disco
+import hallazgos
+import metricas
+import validacion
+
+logger = logging.getLogger(__name__)
+
+ARCHIVO_DATOS = "DATOS_SNIC_POB.parquet"
+# Copias inmutables de cada versión del dataset y sus rollups
+DIR_VERSIONES = Path(os.environ.get("DELITOS_DIR_VERSIONES", "versiones"))
+# Versiones que se conservan en disco: la vigente y la anterior, que pueden
+# seguir leyendo los reruns que empezaron antes del cambio
+VERSIONES_CONSERVADAS = 2
+# Una versión más vieja solo se borra si ningún proceso (otras réplicas de
+# Streamlit, api.py) la usó en estos minutos
+GRACIA_VERSIONES = float(os.environ.get("DELITOS_GRACIA_VERSIONES_MIN", "30")) * 60
+# Cada proceso renueva su marca de uso de una versión a lo sumo cada tantos segundos
+INTERVALO_MARCA = 60
+# Combinaciones de filtros que se conservan por consulta
+MAX_ENTRADAS_CACHE = int(os.environ.get("DELITOS_MAX_ENTRADAS_CACHE", "256"))
+
+_opciones_cache = dict(show_spinner=False, max_entries=MAX_ENTRADAS_CACHE)
+
+
+# ---------------- VERSIONES DEL DATASET ---------------- #
+_lock_versiones = threading.Lock()
+_lock_primera = threading.Lock()
+_vigente = None
+_local = threading.local()
+_huellas_por_stat = {}
+# huella -> (último touch, ruta de la marca de uso de este proceso)
+_marcas = {}
+
+# Marcas dentro del directorio de cada versión: cuándo se publicó por primera
+# vez y cuándo la usó por última vez cada proceso
+MARCA_PUBLICADA = ".publicada"
+_PREFIJO_USO = ".uso."
+_MARCA_USO = f"{_PREFIJO_USO}{socket.gethostname()}.{os.getpid()}"
+
+
+def huella_archivo(ruta=None):
+    """
+    Huella del contenido del parquet: hash del tamaño y del footer (esquema,
+    offsets y estadísticas de cada row group), que cambia con los datos sin
+    tener que leer el archivo entero. Se recalcula solo si cambian tamaño o mtime.
+    """
+    ruta = ruta or ARCHIVO_DATOS
+    info = os.stat(ruta)
+    clave = (str(ruta), info.st_size, info.st_mtime_ns)
+    if clave not in _huellas_por_stat:
+        with open(ruta, "rb") as f:
+            f.seek(-8, os.SEEK_END)
+            largo = int.from_bytes(f.read(4), "little")
+            if f.read(4) != b"PAR1":
+                raise ValueError(f"{ruta} no es un parquet completo")
+            f.seek(-(8 + largo), os.SEEK_END)
+            footer = f.read(largo)
+        _huellas_por_stat[clave] = hashlib.sha256(
+            info.st_size.to_bytes(8, "little") + footer
+        ).hexdigest()[:16]
+    return _huellas_por_stat[clave]
+
+
+def preparar_version(ruta=None):
+    """
+    Copia inmutable de la versión actual del archivo en DIR_VERSIONES/<huella>/
+    (un hardlink: el publicador reemplaza el archivo con os.replace, así que
+    la copia no cambia), su copia tipada con las tablas de dimensiones, su
+    índice de anomalías, sus hallazgos, su reporte de validación y, si tiene
+    grano mensual, sus rollups. No la publica.
+    """
+    ruta = ruta or ARCHIVO_DATOS
+    huella = huella_archivo(ruta)
+    directorio = DIR_VERSIONES / huella
+    datos = directorio / "datos.parquet"
+    if not datos.exists():
+        directorio.mkdir(parents=True, exist_ok=True)
+        temporal = directorio / f".datos.{os.getpid()}.tmp"
+        try:
+            os.link(ruta, temporal)
+        except OSError:  # otro sistema de archivos
+            shutil.copyfile(ruta, temporal)
+        os.replace(temporal, datos)
+        if huella_archivo(datos) != huella:
+            # El archivo cambió entre la huella y la copia: el vigilante reintenta
+            shutil.rmtree(directorio, ignore_errors=True)
+            raise RuntimeError("el dataset cambió mientras se preparaba la versión")
+
+    version = {
+        "huella": huella,
+        "ruta": datos,
+        "columnas": tuple(pl.read_parquet_schema(datos)),
+    }
+    if "mes" in version["columnas"]:
+        _rollup(version, "anual", _rollup_anual)
+        _rollup(version, "mensual_provincias", _rollup_mensual_provincias)
+    _tipado(version)
+    _dimensiones(version)
+    ruta_anomalias(version)
+    ruta_hallazgos(version)
+    _validar(version)
+    return version
+
+
+def publicar(version):
+    """
+    Cambio atómico de versión: los reruns que empiecen desde ahora la usan;
+    los que están en curso terminan con la que fijaron al empezar.
+    """
+    global _vigente
+    publicada = version["ruta"].with_name(MARCA_PUBLICADA)
+    if not publicada.exists():
+        publicada.touch()
+    marcar_uso(version, forzar=True)
+    with _lock_versiones:
+        anterior = _vigente
+        _vigente = version
+    _limpiar_versiones({version["huella"]} | ({anterior["huella"]} if anterior else set()))
+
+
+def marcar_uso(version=None, forzar=False):
+    """
+    Renueva la marca de uso de este proceso en el directorio de la versión
+    (por defecto la que ve este hilo), a lo sumo cada INTERVALO_MARCA
+    segundos. Ningún proceso borra una versión con marcas recientes.
+    """
+    version = version or version_actual()
+    ahora = time.monotonic()
+    anterior, _ = _marcas.get(version["huella"], (-INTERVALO_MARCA, None))
+    if not forzar and ahora - anterior < INTERVALO_MARCA:
+        return
+    marca = version["ruta"].with_name(_MARCA_USO)
+    _marcas[version["huella"]] = (ahora, marca)
+    try:
+        marca.touch()
+    except OSError:  # la versión ya no está en disco
+        pass
+
+
+@atexit.register
+def _borrar_marcas():
+    """Al terminar el proceso borra sus marcas de uso."""
+    for _, marca in list(_marcas.values()):
+        marca.unlink(missing_ok=True)
+
+
+def _ultimo_uso(directorio, limite):
+    """
+    Última actividad en la versión: marcas de uso, publicación o archivos
+    escritos. De paso borra las marcas de uso anteriores a `limite`, que ya no
+    protegen la versión (las dejan los procesos que terminaron sin atexit).
+    """
+    tiempos = [directorio.stat().st_mtime]
+    for entrada in os.scandir(directorio):
+        if entrada.name.startswith(_PREFIJO_USO):
+            try:
+                mtime = entrada.stat().st_mtime
+                if mtime < limite:
+                    os.unlink(entrada.path)
+                    continue
+            except FileNotFoundError:  # otro proceso la podó
+                continue
+            tiempos.append(mtime)
+        elif entrada.name == MARCA_PUBLICADA:
+            tiempos.append(entrada.stat().st_mtime)
+    return max(tiempos)
+
+
+def _limpiar_versiones(conservar):
+    """
+    Borra las versiones que ya nadie usa. Se conservan `conservar` (la
+    vigente y la anterior de este proceso), las VERSIONES_CONSERVADAS
+    publicadas más recientemente (por la marca de publicación, no por el
+    mtime del directorio, que cambia con cada rollup escrito tarde) y toda
+    versión con actividad de cualquier proceso en GRACIA_VERSIONES: así no
+    se borra la vigente de otra réplica ni la fijada por un rerun en curso.
+    Las que todavía se están preparando tienen archivos recientes y quedan.
+    """
+    publicadas = []
+    directorios = [d for d in DIR_VERSIONES.iterdir() if d.is_dir()]
+    for directorio in directorios:
+        try:
+            publicadas.append((directorio.joinpath(MARCA_PUBLICADA).stat().st_mtime, directorio.name))
+        except FileNotFoundError:  # todavía en preparación
+            pass
+    publicadas.sort(reverse=True)
+    conservar = conservar | {nombre for _, nombre in publicadas[:VERSIONES_CONSERVADAS]}
+    limite = time.time() - GRACIA_VERSIONES
+    for directorio in directorios:
+        try:
+            # También en las que se conservan, para podar sus marcas vencidas
+            if _ultimo_uso(directorio, limite) > limite or directorio.name in conservar:
+                continue
+        except FileNotFoundError:  # otro proceso la borró
+            continue
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def vigente():
+    """Versión publicada; la primera llamada del proceso la prepara y publica."""
+    if _vigente is None:
+        with _lock_primera:
+            if _vigente is None:
+                publicar(preparar_version())
+    return _vigente
+
+
+def fijar_version(version=None):
+    """
+    Fija para el hilo actual (un rerun, el precalentamiento) la versión que
+    usan todas las consultas, por defecto la vigente, y renueva la marca de
+    uso de este proceso en ella.
+    """
+    _local.version = version or vigente()
+    marcar_uso(_local.version)
+    return _local.version
+
+
+def version_actual():
+    return getattr(_local, "version", None) or vigente()
+
+
+def huella_vigente():
+    """Huella de la versión que ve este hilo: forma parte de la clave de todas las cachés."""
+    return version_actual()["huella"]
+
+
+def tiene_mes():
+    """True si el dataset vigente tiene grano mensual (columna `mes`)."""
+    return "mes" in version_actual()["columnas"]
+
+
+# ---------------- ROLLUPS MENSUALES ---------------- #
+CLAVES_ANUALES = [
+    "anio", "categoria_delito", "codigo_delito_snic_nombre",
+    "provincia_nombre", "depto_nombre_completo",
+]
+POBLACIONES = ["poblacion_departamento", "poblacion_provincia", "poblacion_pais"]
+
+
+def _rollup(version, nombre, construir):
+    """
+    Ruta del agregado `nombre` de la versión. Si no existe lo escribe en
+    streaming (archivo temporal + os.replace, seguro con varios procesos).
+    `construir(df)` devuelve el LazyFrame a escribir o, si además hay pares
+    clave-valor para el footer del parquet, la tupla (LazyFrame, metadatos).
+    """
+    ruta = version["ruta"].with_name(f"{nombre}.parquet")
+    if ruta.exists():
+        return ruta
+
+    temporal = ruta.with_name(f".{ruta.name}.{os.getpid()}.tmp")
+    with metricas.medir("rollup", nombre) as medicion:
+        resultado = construir(pl.scan_parquet(version["ruta"]))
+        lf, metadatos = resultado if isinstance(resultado, tuple) else (resultado, None)
+        lf.sink_parquet(temporal, metadata=metadatos)
+        os.replace(temporal, ruta)
+        medicion["bytes"] = ruta.stat().st_size
+    return ruta
+
+
+def _rollup_anual(df):
+    return df.group_by(CLAVES_ANUALES).agg(
+        [pl.col("cantidad_hechos").sum(), pl.col("cantidad_victimas").sum()]
+        + [pl.col(c).max() for c in POBLACIONES]
+    )
+
+
+def _rollup_mensual_provincias(df):
+    return df.group_by(
+        ["anio", "mes", "categoria_delito", "codigo_delito_snic_nombre", "provincia_nombre"]
+    ).agg([
+        pl.col("cantidad_hechos").sum(),
+        pl.col("cantidad_victimas").sum(),
+        pl.col("poblacion_provincia").max(),
+        pl.col("poblacion_pais").max(),
+    ])
+
+
+# ---------------- COPIA TIPADA ---------------- #
+# Columnas de texto con dominio cerrado: la copia tipada las guarda como
+# pl.Enum con las categorías fijadas al preparar la versión
+COLUMNAS_ENUM = [
+    "categoria_delito", "codigo_delito_snic_nombre",
+    "provincia_nombre", "depto_nombre_completo",
+]
+TIPOS_DATOS = {
+    "anio": pl.Int16,
+    "cantidad_hechos": pl.Int32,
+    "cantidad_victimas": pl.Int32,
+    "poblacion_departamento": pl.Int32,
+    "poblacion_provincia": pl.Int32,
+    "poblacion_pais": pl.Int32,
+}
+
+
+def _anual(df):
+    return _rollup_anual(df) if "mes" in df.collect_schema().names() else df
+
+
+def _dominios(df):
+    """Valores de cada columna de COLUMNAS_ENUM, ordenados alfabéticamente."""
+    df = _anual(df)
+    dominios = metricas.recolectar_todos(
+        [df.select(pl.col(c).cast(pl.Utf8).unique().sort()) for c in COLUMNAS_ENUM],
+        "dominios", tipo="rollup", etiquetas=COLUMNAS_ENUM,
+    )
+    return {c: dominio.to_series().to_list() for c, dominio in zip(COLUMNAS_ENUM, dominios)}
+
+
+def _rollup_tipado(df):
+    """
+    Filas anuales con las columnas que leen las vistas, ya tipadas: los
+    nombres como códigos del pl.Enum de su dominio y los conteos en enteros
+    chicos. Devuelve también los metadatos del footer: los dominios en JSON,
+    calculados una sola vez para el cast y para el footer.
+
+    Se guardan los códigos y no la columna Enum porque Polars decodifica un
+    Enum de parquet buscando cada string en el dominio (~10 ms por columna
+    en este dataset); los códigos se leen como enteros y el cast a Enum de
+    load_data solo reinterpreta el tipo.
+    """
+    dominios = _dominios(df)
+    lf = _anual(df).select(
+        [pl.col("anio").cast(TIPOS_DATOS["anio"])]
+        + [
+            pl.col(c).cast(pl.Utf8).cast(pl.Enum(dominios[c])).to_physical()
+            for c in COLUMNAS_ENUM
+        ]
+        + [pl.col(c).cast(tipo) for c, tipo in TIPOS_DATOS.items() if c != "anio"]
+    )
+    return lf, {"dominios": json.dumps(dominios, ensure_ascii=False)}
+
+
+def _tipado(version):
+    return _rollup(version, "tipado", _rollup_tipado)
+
+
+# ---------------- DIMENSIONES ---------------- #
+# Largo máximo de las etiquetas de los ejes; las más largas se cortan con "…"
+MAX_ETIQUETA = 28
+NOMBRES_CORTOS_PROVINCIAS = {
+    "Tierra del Fuego, Antártida e Islas del Atlántico Sur": "Tierra del Fuego",
+    "Ciudad Autónoma de Buenos Aires": "CABA",
+}
+# Nombres de las provincias en ar.json (featureidkey del mapa)
+NOMBRES_MAPA_PROVINCIAS = {
+    "Tierra del Fuego, Antártida e Islas del Atlántico Sur": "Tierra del Fuego",
+    "Ciudad Autónoma de Buenos Aires": "Ciudad de Buenos Aires",
+}
+
+
+def _corta(nombre):
+    return (
+        pl.when(nombre.str.len_chars() <= MAX_ETIQUETA).then(nombre)
+        .otherwise(nombre.str.slice(0, MAX_ETIQUETA - 2) + "…")
+    )
+
+
+# Etiquetas de cada dimensión (columna de COLUMNAS_ENUM), como expresiones
+# sobre el nombre en texto
+DIMENSIONES = {
+    "categoria_delito": lambda nombre: [_corta(nombre).alias("categoria_delito_short")],
+    "codigo_delito_snic_nombre": lambda nombre: [_corta(nombre).alias("tipo_delito_short")],
+    "provincia_nombre": lambda nombre: [
+        _corta(nombre.replace(NOMBRES_CORTOS_PROVINCIAS)).alias("provincia_nombre_short"),
+        nombre.replace(NOMBRES_MAPA_PROVINCIAS).alias("provincia_nombre_mapa"),
+    ],
+    "depto_nombre_completo": lambda nombre: [_corta(nombre).alias("departamento_nombre_short")],
+}
+
+
+def _dimension(columna, dominio):
+    """Una fila por valor del dominio de `columna` (como Enum) con sus etiquetas."""
+    return pl.LazyFrame({columna: pl.Series(dominio, dtype=pl.Enum(dominio))}).with_columns(
+        DIMENSIONES[columna](pl.col(columna).cast(pl.Utf8))
+    )
+
+
+def _dimensiones(version):
+    """
+    Rutas de las tablas de dimensiones de la versión. Se arman con los
+    dominios del footer de la copia tipada, así que no vuelven a leer el
+    dataset, y se escriben una sola vez por huella.
+    """
+    dominios = json.loads(pl.read_parquet_metadata(_tipado(version))["dominios"])
+    return {
+        columna: _rollup(
+            version, f"dimension_{columna}",
+            lambda df, columna=columna: _dimension(columna, dominios[columna]),
+        )
+        for columna in DIMENSIONES
+    }
+
+
+def _validar(version):
+    """
+    Reporte de validacion.py de la versión, guardado como JSON junto a la
+    copia. Con grano mensual se valida el rollup anual, que es lo que leen
+    las vistas.
+    """
+    ruta = version["ruta"].with_name("validacion.json")
+    if ruta.exists():
+        return json.loads(ruta.read_text(encoding="utf-8"))
+
+    fuente = (
+        _rollup(version, "anual", _rollup_anual) if "mes" in version["columnas"]
+        else version["ruta"]
+    )
+    with metricas.medir("validacion", version["huella"]):
+        reporte = validacion.validar(pl.scan_parquet(fuente))
+    reporte["huella"] = version["huella"]
+    if reporte["estado"] != "ok":
+        logger.warning(
+            "validación del dataset %s: %s", version["huella"],
+            ", ".join(f"{c['control']} ({c['casos']})" for c in reporte["controles"] if c["estado"] != "ok"),
+        )
+    temporal = ruta.with_name(f".{ruta.name}.{os.getpid()}.tmp")
+    temporal.write_text(json.dumps(reporte, ensure_ascii=False, default=str), encoding="utf-8")
+    os.replace(temporal, ruta)
+    return reporte
+
+
+def ruta_anomalias(version):
+    """Índice de anomalías de la versión (ver anomalias.py), calculado una sola vez."""
+    return _rollup(version, "anomalias", anomalias.construir)
+
+
+def ruta_hallazgos(version):
+    """
+    Hallazgos de las pestañas para la versión (ver hallazgos.py), calculados
+    una sola vez. El nombre lleva la versión del código de hallazgos.py: si
+    cambia la redacción o el cálculo se regeneran sin esperar datos nuevos.
+    """
+    nombre = f"hallazgos_{cache_disco.version_codigo(hallazgos.__name__)}"
+    return _rollup(version, nombre, hallazgos.construir)
+
+
+def _mensual(departamento=None):
+    """
+    Filas con mes: el rollup por provincia, o el dataset completo cuando se
+    pide un departamento (el rollup no baja a ese nivel).
+    """
+    version = version_actual()
+    if departamento:
+        return pl.scan_parquet(version["ruta"]).filter(pl.col("depto_nombre_completo") == departamento)
+    return pl.scan_parquet(_rollup(version, "mensual_provincias", _rollup_mensual_provincias))
+
+
+# ---------------- CACHÉ POR VERSIÓN ---------------- #
+def _consulta(nombre, en_disco=True, **opciones):
+    """
+    Cachea la función por argumentos y huella del dataset: en memoria con
+    st.cache_data (vía metricas) y, si DELITOS_DIR_CACHE está configurado, en
+    disco. Con la huella en la clave no hace falta TTL: una versión nueva del
+    archivo simplemente usa entradas nuevas.
+    """
+    def decorador(funcion):
+        calcular_sin_cache = (
+            cache_disco.persistente(nombre, huella_vigente)(funcion) if en_disco else funcion
+        )
+
+        @functools.wraps(funcion)
+        def calcular(*args, huella, **kwargs):
+            return calcular_sin_cache(*args, **kwargs)
+
+        cacheada = metricas.cache_data(nombre, **{**_opciones_cache, **opciones})(calcular)
+
+        @functools.wraps(funcion)
+        def llamar(*args, **kwargs):
+            return cacheada(*args, huella=huella_vigente(), **kwargs)
+
+        llamar.clear = cacheada.clear
+        return llamar
+    return decorador
+
+
+# ---------------- CARGA OPTIMIZADA DE DATOS ---------------- #
+@_consulta("load_data", en_disco=False, show_spinner=True)
+def load_data():
+    """
+    Scan de la copia tipada de la versión (ver _rollup_tipado): anual, con
+    los nombres como pl.Enum de dominio fijo y los conteos en enteros chicos.
+    """
+    try:
+        ruta = _tipado(version_actual())
+        dominios = json.loads(pl.read_parquet_metadata(ruta)["dominios"])
+        return pl.scan_parquet(ruta).with_columns([
+            pl.col(c).cast(pl.Enum(dominio)) for c, dominio in dominios.items()
+        ])
+
+    except Exception as e:
+        st.error(f"Error al cargar los datos: {e}")
+        return None
+
+
+@_consulta("validacion_datos", en_disco=False)
+def validacion_datos():
+    """Reporte de validación de la versión vigente (se calcula al prepararla)."""
+    return _validar(version_actual())
+
+
+@_consulta("load_anomalias", en_disco=False)
+def load_anomalias():
+    """Índice de anomalías de la versión vigente, en memoria para filtrarlo sin scans."""
+    return pl.read_parquet(ruta_anomalias(version_actual()))
+
+
+@_consulta("load_hallazgos", en_disco=False)
+def load_hallazgos():
+    """Hallazgos de la versión vigente, en memoria para buscarlos por filtros."""
+    return pl.read_parquet(ruta_hallazgos(version_actual()))
+
+
+@_consulta("load_dimensiones", en_disco=False)
+def load_dimensiones():
+    """Tablas de dimensiones de la versión vigente, por columna, en memoria."""
+    return {columna: pl.read_parquet(ruta) for columna, ruta in _dimensiones(version_actual()).items()}
+
+
+def etiquetas(df, columna):
+    """
+    Une a `df` las etiquetas de la dimensión de `columna` (ver DIMENSIONES).
+    Va sobre las filas finales de un gráfico o un top N: las consultas
+    agregan con los nombres como Enum y el texto se resuelve solo acá. Si
+    `df` trae la columna como texto, se castea la dimensión, no `df`.
+    """
+    dimension = load_dimensiones()[columna]
+    tipo = df.collect_schema()[columna]
+    if tipo != dimension.schema[columna]:
+        dimension = dimension.with_columns(pl.col(columna).cast(tipo))
+    return df.join(
+        dimension.lazy() if isinstance(df, pl.LazyFrame) else dimension,
+        on=columna, how="left", maintain_order="left",
+    )
+
+
+# Decimales de las coordenadas del GeoJSON (~11 m), suficiente para el mapa
+# nacional y reduce a menos de la mitad el payload que viaja en cada render
+DECIMALES_GEOJSON = 4
+
+def _redondear_coordenadas(coords):
+    if isinstance(coords[0], (int, float)):
+        return [round(c, DECIMALES_GEOJSON) for c in coords]
+    return [_redondear_coordenadas(c) for c in coords]
+
+@metricas.cache_data("load_geojson")
+def load_geojson():
+    try:
+        with open("ar.json", "r", encoding="utf-8") as f:
+            geo = json.load(f)
+        # Conservar solo el nombre (usado como featureidkey) y coordenadas redondeadas
+        for feature in geo["features"]:
+            feature["properties"] = {"name": feature["properties"]["name"]}
+            geometry = feature["geometry"]
+            geometry["coordinates"] = _redondear_coordenadas(geometry["coordinates"])
+        return geo
+    except FileNotFoundError:
+        st.error("No se encontró el archivo ar.json")
+        return None
+
+@_consulta("load_indice_departamentos", en_disco=False)
+def load_indice_departamentos():
+    return busqueda.construir_indice(load_data())
+
+
+# ---------------- FILTROS ---------------- #
+def seleccion(valores, todos):
+    """
+    Normaliza la selección de un multiselect a la forma que reciben las
+    consultas: tupla vacía si no hay selección o incluye la opción `todos`.
+    """
+    if not valores or todos in valores:
+        return ()
+    return tuple(valores)
+
+
+def _en(df, columna, valores):
+    """
+    is_in sobre `columna` de `df`. Los valores se convierten una vez al tipo
+    de la columna: con Enum el filtro compara códigos físicos, y los valores
+    fuera del dominio (p. ej. un nombre inválido que llega por la API) no
+    coinciden con nada en lugar de dar error.
+    """
+    tipo = df.collect_schema()[columna]
+    codigos = pl.Series(columna, list(valores), dtype=pl.Utf8).cast(tipo, strict=False)
+    return pl.col(columna).is_in(codigos.drop_nulls().implode())
+
+
+def _filtrar(df, categorias=(), tipos=(), provincias=(), departamentos=()):
+    if categorias:
+        df = df.filter(_en(df, "categoria_delito", categorias))
+    if tipos:
+        df = df.filter(_en(df, "codigo_delito_snic_nombre", tipos))
+    if departamentos:
+        df = df.filter(_en(df, "depto_nombre_completo", departamentos))
+    elif provincias:
+        df = df.filter(_en(df, "provincia_nombre", provincias))
+    return df
+
+
+def filas(categorias=(), tipos=(), provincias=(), departamentos=(), anio=None):
+    """Filas del dataset con los filtros de una vista, sin materializar (para exportar)."""
+    df = load_data()
+    if anio is not None:
+        df = df.filter(pl.col("anio") == anio)
+    return _filtrar(df, categorias, tipos, provincias, departamentos)
+
+
+@_consulta("opciones_filtros")
+def opciones_filtros(categorias=()):
+    """Años (descendente), categorías, tipos de las categorías dadas y provincias."""
+    df = load_data()
+    anios, categorias_df, tipos, provincias = metricas.recolectar_todos([
+        df.select(pl.col("anio").unique().sort(descending=True)),
+        df.select(pl.col("categoria_delito").unique().sort()),
+        _filtrar(df, categorias).select(pl.col("codigo_delito_snic_nombre").unique().sort()),
+        df.select(pl.col("provincia_nombre").unique().sort()),
+    ], "opciones_filtros", tipo="opciones", etiquetas=["anios", "categorias", "tipos", "provincias"])
+    return {
+        "anios": anios["anio"].to_list(),
+        "categorias": categorias_df["categoria_delito"].to_list(),
+        "tipos": tipos["codigo_delito_snic_nombre"].to_list(),
+        "provincias": provincias["provincia_nombre"].to_list(),
+    }
+
+
+def _columna_poblacion(provincia, departamento):
+    if departamento:
+        return "poblacion_departamento"
+    if provincia:
+        return "poblacion_provincia"
+    return "poblacion_pais"
+
+
+# ---------------- VISTA GENERAL ---------------- #
+@_consulta("resumen_anual")
+def resumen_anual(anio, categorias=(), tipos=(), provincia=None, departamento=None):
+    """Hechos, víctimas y población del año y del anterior para el área elegida."""
+    df = _filtrar(
+        load_data(), categorias, tipos,
+        provincias=(provincia,) if provincia else (),
+        departamentos=(departamento,) if departamento else (),
+    )
+    col_poblacion = _columna_poblacion(provincia, departamento)
+
+    # OPTIMIZACIÓN: Calcular métricas en una sola query agregada
+    metricas_año = df.filter(pl.col("anio") == anio).select([
+        pl.col("cantidad_hechos").sum().alias("total_hechos"),
+        pl.col("cantidad_victimas").sum().alias("total_victimas"),
+        pl.col(col_poblacion).max().alias("poblacion")
+    ]).pipe(metricas.recolectar, "resumen_anual").fill_null(0)
+
+    metricas_prev = df.filter(pl.col("anio") == anio - 1).select([
+        pl.col("cantidad_hechos").sum().alias("total_hechos"),
+        pl.col(col_poblacion).max().alias("poblacion")
+    ]).pipe(metricas.recolectar, "resumen_anual_anterior").fill_null(0)
+
+    return {
+        "total_hechos": metricas_año["total_hechos"][0],
+        "total_victimas": metricas_año["total_victimas"][0],
+        "poblacion": metricas_año["poblacion"][0],
+        "total_hechos_prev": metricas_prev["total_hechos"][0],
+        "poblacion_prev": metricas_prev["poblacion"][0],
+    }
+
+
+def indicadores(resumen):
+    """Tasa cada 100 mil habitantes del año y del anterior, y variación porcentual."""
+    tasa = (resumen["total_hechos"] / resumen["poblacion"]) * 100000 if resumen["poblacion"] else 0
+    poblacion_prev = resumen["poblacion_prev"]
+    tasa_prev = (resumen["total_hechos_prev"] / poblacion_prev) * 100000 if poblacion_prev != 0 else 0
+    variacion = ((tasa - tasa_prev) / tasa_prev) * 100 if tasa_prev != 0 else 0
+    return {"tasa": tasa, "tasa_prev": tasa_prev, "variacion": variacion}
+
+
+@_consulta("serie_anual")
+def serie_anual(categorias=(), tipos=(), provincia=None, departamento=None):
+    """Tasa, variación, hechos y víctimas por año para el área elegida."""
+    df = _filtrar(
+        load_data(), categorias, tipos,
+        provincias=(provincia,) if provincia else (),
+        departamentos=(departamento,) if departamento else (),
+    )
+    poblacion_col = _columna_poblacion(provincia, departamento)
+
+    return (
+        df
+        .group_by("anio")
+        .agg([
+            pl.col("cantidad_hechos").sum().alias("cantidad_hechos"),
+            pl.col(poblacion_col).first().alias("poblacion"),
+            pl.col("cantidad_victimas").sum().alias("cantidad_victimas"),
+        ])
+        .sort("anio")
+        .with_columns([
+            (pl.col("cantidad_hechos") / (pl.col("poblacion") / 100000)).alias("tasa_delitos"),
+        ])
+        .with_columns([
+            pl.col("tasa_delitos").shift(1).alias("tasa_delitos_anterior"),
+        ])
+        .with_columns([
+            ((pl.col("tasa_delitos") - pl.col("tasa_delitos_anterior")) /
+             pl.col("tasa_delitos_anterior")).alias("variacion"),
+        ])
+        .select([
+            "anio", "tasa_delitos", "variacion", "cantidad_hechos", "cantidad_victimas"
+        ])
+        .pipe(metricas.recolectar, "serie_anual")
+    )
+
+
+@_consulta("serie_mensual")
+def serie_mensual(categorias=(), tipos=(), provincia=None, departamento=None):
+    """Hechos y tasa por año y mes para el área elegida. Requiere grano mensual."""
+    df = _filtrar(
+        _mensual(departamento), categorias, tipos,
+        provincias=(provincia,) if provincia else (),
+    )
+    poblacion_col = _columna_poblacion(provincia, departamento)
+
+    return (
+        df
+        .group_by(["anio", "mes"])
+        .agg([
+            pl.col("cantidad_hechos").sum().alias("cantidad_hechos"),
+            pl.col(poblacion_col).first().alias("poblacion"),
+        ])
+        .sort(["anio", "mes"])
+        .with_columns([
+            (pl.col("cantidad_hechos") / (pl.col("poblacion") / 100000)).alias("tasa_delitos"),
+            pl.date(pl.col("anio"), pl.col("mes"), 1).alias("fecha"),
+        ])
+        .select(["anio", "mes", "fecha", "tasa_delitos", "cantidad_hechos"])
+        .pipe(metricas.recolectar, "serie_mensual")
+    )
+
+
+@_consulta("perfil_estacional")
+def perfil_estacional(categorias=(), tipos=(), provincia=None, departamento=None):
+    """
+    Índice estacional por mes: hechos del mes sobre el promedio mensual de su
+    año (1 = mes promedio), con media, mínimo y máximo entre los años completos.
+    """
+    return (
+        serie_mensual(categorias, tipos, provincia, departamento).lazy()
+        .with_columns([
+            pl.len().over("anio").alias("meses"),
+            (pl.col("cantidad_hechos") / pl.col("cantidad_hechos").mean().over("anio")).alias("indice"),
+        ])
+        .filter((pl.col("meses") == 12) & pl.col("indice").is_finite())
+        .group_by("mes")
+        .agg([
+            pl.col("indice").mean().alias("indice"),
+            pl.col("indice").min().alias("indice_min"),
+            pl.col("indice").max().alias("indice_max"),
+            pl.col("anio").n_unique().alias("anios"),
+        ])
+        .sort("mes")
+        .pipe(metricas.recolectar, "perfil_estacional")
+    )
+
+
+# ---------------- CATEGORÍAS Y TIPOS ---------------- #
+# Nodo raíz de la jerarquía categoría → tipo
+RAIZ_DISTRIBUCION = "Total"
+
+
+@_consulta("distribucion_delitos")
+def distribucion_delitos(anio, categorias=(), tipos=(), provincia=None, departamento=None):
+    """
+    Hechos del año por categoría y tipo de delito con los subtotales de cada
+    categoría y el total, como jerarquía (id, padre) lista para un treemap o
+    sunburst. Una sola agregación por (categoría, tipo): los subtotales y el
+    total salen de ese resultado (pocas decenas de filas) y concat los arma
+    en el mismo plan, que lee el dataset una sola vez.
+
+    Columnas: nivel ("total", "categoria" o "tipo"), id, padre, etiqueta,
+    categoria_delito, codigo_delito_snic_nombre, cantidad_hechos y porcentaje
+    sobre el total.
+    """
+    df = _filtrar(
+        load_data().filter(pl.col("anio") == anio), categorias, tipos,
+        provincias=(provincia,) if provincia else (),
+        departamentos=(departamento,) if departamento else (),
+    )
+    hojas = (
+        df.group_by(["categoria_delito", "codigo_delito_snic_nombre"])
+        .agg(pl.sum("cantidad_hechos").cast(pl.Int64).alias("cantidad_hechos"))
+        .with_columns(
+            pl.col("categoria_delito").cast(pl.Utf8),
+            pl.col("codigo_delito_snic_nombre").cast(pl.Utf8),
+        )
+        .filter(pl.col("cantidad_hechos") > 0)
+    )
+    columnas = ["nivel", "id", "padre", "etiqueta", "categoria_delito",
+                "codigo_delito_snic_nombre", "cantidad_hechos"]
+    niveles = [
+        hojas.select(
+            pl.lit("total").alias("nivel"), pl.lit(RAIZ_DISTRIBUCION).alias("id"),
+            pl.lit("").alias("padre"), pl.lit(RAIZ_DISTRIBUCION).alias("etiqueta"),
+            pl.lit(None, pl.Utf8).alias("categoria_delito"),
+            pl.lit(None, pl.Utf8).alias("codigo_delito_snic_nombre"),
+            pl.col("cantidad_hechos").sum(),
+        ),
+        hojas.group_by("categoria_delito")
+        .agg(pl.col("cantidad_hechos").sum())
+        .select(
+            pl.lit("categoria").alias("nivel"), pl.col("categoria_delito").alias("id"),
+            pl.lit(RAIZ_DISTRIBUCION).alias("padre"), pl.col("categoria_delito").alias("etiqueta"),
+            "categoria_delito", pl.lit(None, pl.Utf8).alias("codigo_delito_snic_nombre"),
+            "cantidad_hechos",
+        ),
+        hojas.select(
+            pl.lit("tipo").alias("nivel"),
+            (pl.col("categoria_delito") + "/" + pl.col("codigo_delito_snic_nombre")).alias("id"),
+            pl.col("categoria_delito").alias("padre"),
+            pl.col("codigo_delito_snic_nombre").alias("etiqueta"),
+            "categoria_delito", "codigo_delito_snic_nombre", "cantidad_hechos",
+        ),
+    ]
+    return (
+        pl.concat([n.select(columnas) for n in niveles])
+        .with_columns(
+            (pl.col("cantidad_hechos") / pl.col("cantidad_hechos").filter(pl.col("nivel") == "total").first())
+            .alias("porcentaje")
+        )
+        .sort(["nivel", "cantidad_hechos"], descending=[False, True])
+        .pipe(metricas.recolectar, "distribucion_delitos")
+    )
+
+
+def por_nivel(distribucion, nivel):
+    """
+    Filas de un nivel de distribucion_delitos con la columna del nombre que le
+    corresponde ("categoria" -> categoria_delito, "tipo" -> codigo_delito_snic_nombre).
+    """
+    columna = "categoria_delito" if nivel == "categoria" else "codigo_delito_snic_nombre"
+    return (
+        distribucion.filter(pl.col("nivel") == nivel)
+        .group_by(columna)
+        .agg(pl.col("cantidad_hechos").sum(), pl.col("porcentaje").sum())
+        .sort("cantidad_hechos", descending=True)
+    )
+
+
+# ---------------- PROVINCIAS ---------------- #
+@_consulta("evolucion_provincias")
+def evolucion_provincias(categorias=(), tipos=()):
+    """
+    Tasa por provincia y año (todos los años) con su variación anual. Las
+    etiquetas (nombre corto y del mapa) se unen en la vista sobre las filas
+    que se grafican (ver etiquetas). El año y las provincias se filtran en
+    la vista.
+    """
+    df_filtrado = _filtrar(
+        load_data().select([
+            "anio", "categoria_delito", "codigo_delito_snic_nombre",
+            "provincia_nombre", "cantidad_hechos", "poblacion_provincia"
+        ]),
+        categorias, tipos,
+    )
+
+    return (
+        df_filtrado
+        .group_by(["anio", "provincia_nombre"])
+        .agg([
+            pl.col("cantidad_hechos").sum().alias("cantidad_hechos"),
+            pl.col("poblacion_provincia").first().alias("poblacion_provincia")
+        ])
+        .with_columns([
+            ((pl.col("cantidad_hechos") / (pl.col("poblacion_provincia") / 100_000))
+             .round(2)
+             .alias("tasa_delitos")),
+        ])
+        .sort(["provincia_nombre", "anio"])
+        .with_columns([
+            pl.col("tasa_delitos").shift(1).over("provincia_nombre").alias("tasa_delitos_anterior")
+        ])
+        .with_columns([
+            ((pl.col("tasa_delitos") - pl.col("tasa_delitos_anterior")) /
+             pl.col("tasa_delitos_anterior")).alias("variacion")
+        ])
+        .pipe(metricas.recolectar, "evolucion_provincias")
+    )
+
+
+# ---------------- DEPARTAMENTOS ---------------- #
+def _tasa_suavizada(df):
+    """
+    Agrega `tasa_suavizada`: la tasa cada 100.000 habitantes con bayes
+    empírico (estimador de Marshall), que acerca los departamentos chicos a
+    la tasa de su provincia en el mismo año. Con población p_i y tasa r_i,
+    la provincia aporta la media m = Σh / Σp y la varianza entre
+    departamentos s² = Σ p_i (r_i - m)² / Σp - m / p̄, y cada tasa queda en
+    m + w_i (r_i - m) con w_i = s² / (s² + m / p_i): cuanto menor la
+    población, más ruido tiene r_i y más pesa m. Vectorizado con ventanas
+    por provincia y año sobre todos los departamentos a la vez.
+    """
+    grupo = ["anio", "provincia_nombre"]
+    poblacion = pl.col("poblacion_departamento")
+    valida = poblacion > 0
+    return (
+        df
+        .with_columns([
+            pl.when(valida).then(pl.col("cantidad_hechos") / poblacion).alias("_r"),
+            (pl.when(valida).then(pl.col("cantidad_hechos")).sum().over(grupo)
+             / pl.when(valida).then(poblacion).sum().over(grupo)).alias("_m"),
+            pl.when(valida).then(poblacion).sum().over(grupo).alias("_p_total"),
+            pl.when(valida).then(poblacion).mean().over(grupo).alias("_p_media"),
+        ])
+        .with_columns(
+            ((poblacion * (pl.col("_r") - pl.col("_m")) ** 2).sum().over(grupo) / pl.col("_p_total")
+             - pl.col("_m") / pl.col("_p_media")).clip(lower_bound=0).alias("_s2")
+        )
+        .with_columns(
+            (pl.col("_s2") / (pl.col("_s2") + pl.col("_m") / poblacion)).alias("_w")
+        )
+        .with_columns(
+            # Sin varianza ni media (provincia sin hechos) queda la tasa observada
+            ((pl.col("_m") + pl.col("_w").fill_nan(1) * (pl.col("_r") - pl.col("_m"))) * 100_000)
+            .round(2).alias("tasa_suavizada")
+        )
+        .drop(["_r", "_m", "_p_total", "_p_media", "_s2", "_w"])
+    )
+
+
+@_consulta("evolucion_departamentos")
+def evolucion_departamentos(categorias=(), tipos=(), provincias=()):
+    """Hechos, población, tasa y tasa suavizada por departamento y año (todos los años)."""
+    df_filtrado = _filtrar(load_data(), categorias, tipos, provincias=provincias)
+    return (
+        df_filtrado
+        .group_by(['anio', 'provincia_nombre', 'depto_nombre_completo'])
+        .agg([
+            pl.col('cantidad_hechos').sum().alias('cantidad_hechos'),
+            pl.col('poblacion_departamento').first().alias('poblacion_departamento')
+        ])
+        .with_columns([
+            ((pl.col("cantidad_hechos") / (pl.col("poblacion_departamento") / 100_000))
+             .round(2)
+             .alias("tasa_delitos"))
+        ])
+        .pipe(_tasa_suavizada)
+        .sort(by=['depto_nombre_completo', 'anio'])
+        .pipe(metricas.recolectar, "evolucion_departamentos")
+    )
+
+
+# Sufijo de las columnas de ranking calculadas sobre cada tasa
+TASAS_RANKING = {"tasa_delitos": "", "tasa_suavizada": "_suavizada"}
+
+
+@_consulta("ranking_departamentos")
+def ranking_departamentos(categorias=(), tipos=()):
+    """
+    Tasa observada y suavizada de cada departamento por año, con su posición
+    y percentil en el país y dentro de su provincia según cada una, en una
+    sola pasada de ventanas. Se calcula sin filtro de provincia para que el
+    puesto nacional no dependa de la selección.
+    """
+    df_filtrado = _filtrar(load_data(), categorias, tipos)
+    posiciones = []
+    for columna, sufijo in TASAS_RANKING.items():
+        tasa = pl.col(columna)
+        posiciones += [
+            tasa.rank("min", descending=True).over("anio").cast(pl.UInt32).alias(f"puesto_pais{sufijo}"),
+            tasa.rank("min", descending=True).over(["anio", "provincia_nombre"])
+            .cast(pl.UInt32).alias(f"puesto_provincia{sufijo}"),
+            # Porcentaje de departamentos con una tasa menor o igual
+            (tasa.rank("max").over("anio") / pl.len().over("anio") * 100)
+            .round(1).alias(f"percentil_pais{sufijo}"),
+            (tasa.rank("max").over(["anio", "provincia_nombre"])
+             / pl.len().over(["anio", "provincia_nombre"]) * 100)
+            .round(1).alias(f"percentil_provincia{sufijo}"),
+        ]
+    return (
+        df_filtrado
+        .group_by(['anio', 'provincia_nombre', 'depto_nombre_completo'])
+        .agg([
+            pl.col('cantidad_hechos').sum().alias('cantidad_hechos'),
+            pl.col('poblacion_departamento').first().alias('poblacion_departamento')
+        ])
+        .with_columns([
+            ((pl.col("cantidad_hechos") / (pl.col("poblacion_departamento") / 100_000))
+             .round(2)
+             .alias("tasa_delitos"))
+        ])
+        .filter(pl.col("tasa_delitos").is_finite())
+        .pipe(_tasa_suavizada)
+        .with_columns(posiciones)
+        .sort(by=['anio', 'puesto_pais', 'depto_nombre_completo'])
+        .pipe(metricas.recolectar, "ranking_departamentos")
+    )
+
+
+def tasa_elegida(df, suavizada):
+    """
+    Con `suavizada`, reemplaza la tasa observada y sus puestos por los de la
+    tasa suavizada, y deja la observada en `tasa_observada`. Así las vistas
+    usan siempre los mismos nombres de columna.
+    """
+    if not suavizada:
+        return df
+    reemplazos = [pl.col("tasa_delitos").alias("tasa_observada")] + [
+        pl.col(f"{c}_suavizada").alias(c)
+        for c in ("puesto_pais", "puesto_provincia", "percentil_pais", "percentil_provincia")
+        if f"{c}_suavizada" in df.columns
+    ] + [pl.col("tasa_suavizada").alias("tasa_delitos")]
+    return df.with_columns(reemplazos)
+
+
+@_consulta("trayectorias_departamentos", en_disco=False)
+def trayectorias_departamentos(categorias=(), tipos=(), provincias=()):
+    """Matriz departamento × año de tasas para buscar trayectorias similares."""
+    import similitud  # diferido: NumPy solo cuando se usa la búsqueda
+
+    return similitud.construir_matriz(evolucion_departamentos(categorias, tipos, provincias))
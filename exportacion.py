@@ -0,0 +1,136 @@
+"""
+Descarga de los datos de cada vista en CSV o Parquet.
+
+st.download_button guarda el archivo entero en la memoria del proceso, así
+que exportar las filas filtradas de una selección amplia (departamento × tipo
+× año) disparaba el RSS. En su lugar, el LazyFrame de la vista se escribe con
+sink_csv / sink_parquet, que usan el motor de streaming y procesan los datos
+por lotes con memoria acotada, a `static/exportaciones/`. Streamlit sirve ese
+directorio en `app/static/` (server.enableStaticServing en
+.streamlit/config.toml) y Tornado lo envía en bloques.
+
+El nombre del archivo es un hash del plan del LazyFrame, el formato, la
+huella del dataset y una sal aleatoria del proceso: pedir dos veces la misma
+descarga reutiliza el archivo, pero la URL no se puede deducir conociendo solo
+los filtros. Los archivos con más de EDAD_MAXIMA segundos se borran en cada
+exportación.
+
+Streamlit no sirve archivos estáticos de más de 200 MB (responde 404) y envía
+los .csv y .parquet como text/plain; el enlace lleva el atributo `download`,
+así que el navegador los guarda igual. Una exportación que supera el límite
+se borra y en lugar del enlace se muestra un aviso.
+"""
+
+import hashlib
+import os
+import secrets
+import threading
+import time
+from pathlib import Path
+
+import streamlit as st
+
+import consultas
+import metricas
+
+DIR_EXPORTACIONES = Path(__file__).resolve().parent / "static" / "exportaciones"
+URL_EXPORTACIONES = "app/static/exportaciones"
+EDAD_MAXIMA = 3600
+# Límite de Streamlit para archivos estáticos (MAX_APP_STATIC_FILE_SIZE)
+MAX_BYTES_ESTATICO = 200 * 1024 * 1024
+_SAL = secrets.token_bytes(16)
+
+FORMATOS = {"CSV": ".csv", "Parquet": ".parquet"}
+NIVELES = ("Tabla agregada", "Filas filtradas")
+
+
+def limpiar(edad_maxima=EDAD_MAXIMA):
+    if not DIR_EXPORTACIONES.exists():
+        return
+    limite = time.time() - edad_maxima
+    for entrada in os.scandir(DIR_EXPORTACIONES):
+        try:
+            if entrada.stat().st_mtime < limite:
+                Path(entrada.path).unlink(missing_ok=True)
+        except FileNotFoundError:
+            pass
+
+
+def exportar(lf, nombre, formato):
+    """
+    Escribe `lf` en streaming y devuelve (ruta, bytes). Si la misma
+    exportación ya existe, solo actualiza su fecha. Si el archivo supera lo
+    que Streamlit puede servir, lo borra y devuelve (None, bytes).
+
+    El tamaño se toma acá: otra sesión puede borrar el archivo con limpiar()
+    antes de que se arme el enlace.
+    """
+    extension = FORMATOS[formato]
+    huella = hashlib.sha256(
+        _SAL + lf.serialize() + f"{formato}|{consultas.huella_vigente()}".encode()
+    ).hexdigest()[:24]
+    ruta = DIR_EXPORTACIONES / f"{nombre}-{huella}{extension}"
+    try:
+        os.utime(ruta)
+        return ruta, ruta.stat().st_size
+    except FileNotFoundError:
+        pass
+
+    DIR_EXPORTACIONES.mkdir(parents=True, exist_ok=True)
+    limpiar()
+    # Las sesiones son hilos del mismo proceso: el temporal lleva también el
+    # id del hilo para que dos sesiones que exportan lo mismo no se pisen
+    temporal = ruta.with_name(f".{ruta.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with metricas.medir("exportacion", nombre) as medicion:
+        try:
+            if extension == ".csv":
+                lf.sink_csv(temporal)
+            else:
+                lf.sink_parquet(temporal)
+            medicion["bytes"] = temporal.stat().st_size
+            if medicion["bytes"] > MAX_BYTES_ESTATICO:
+                temporal.unlink()
+                return None, medicion["bytes"]
+            os.replace(temporal, ruta)
+        except BaseException:
+            temporal.unlink(missing_ok=True)
+            raise
+    return ruta, medicion["bytes"]
+
+
+def _tamano(bytes_archivo):
+    for unidad in ("B", "KB", "MB", "GB"):
+        if bytes_archivo < 1024 or unidad == "GB":
+            return f"{bytes_archivo:,.0f} {unidad}" if unidad == "B" else f"{bytes_archivo:,.1f} {unidad}"
+        bytes_archivo /= 1024
+
+
+def selector_descarga(vista, filas, agregado):
+    """
+    Popover de descarga de una vista. `filas` y `agregado` son funciones sin
+    argumentos que devuelven el LazyFrame filtrado de la vista y su tabla
+    agregada; solo se llaman al preparar el archivo.
+    """
+    with st.popover("Descargar datos", use_container_width=True):
+        nivel = st.radio("Contenido", NIVELES, key=f"Contenido descarga {vista}")
+        formato = st.radio("Formato", list(FORMATOS), horizontal=True, key=f"Formato descarga {vista}")
+
+        if st.button("Preparar archivo", key=f"Preparar descarga {vista}", use_container_width=True):
+            lf = agregado() if nivel == NIVELES[0] else filas()
+            sufijo = "agregado" if nivel == NIVELES[0] else "filas"
+            with st.spinner("Generando archivo..."):
+                ruta, tamano = exportar(lf, f"{vista}_{sufijo}", formato)
+            if ruta is None:
+                st.warning(
+                    f"El archivo ocupa {_tamano(tamano)} y supera el máximo de "
+                    f"{_tamano(MAX_BYTES_ESTATICO)} que se puede descargar. Probá con la "
+                    "tabla agregada, el formato Parquet o filtros más acotados.",
+                    icon="⚠️",
+                )
+                return
+            descarga = f"delitos_{vista}_{sufijo}{FORMATOS[formato]}"
+            st.markdown(
+                f'<a href="{URL_EXPORTACIONES}/{ruta.name}" download="{descarga}">'
+                f'Descargar {descarga}</a> ({_tamano(tamano)})',
+                unsafe_allow_html=True,
+            )
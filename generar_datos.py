@@ -0,0 +1,320 @@
+"""
+Generador de un dataset sintético con la forma de DATOS_SNIC_POB.parquet.
+
+El archivo real no se distribuye con el repositorio. Este script escribe uno con
+el mismo esquema que lee load_data() y cardinalidades parecidas a las del SNIC:
+24 provincias, ~530 departamentos, las categorías y tipos de delito del SNIC y
+cantidades con cola pesada (tasas por departamento log-normales, ruido
+gamma-Poisson y algunos departamentos atípicos).
+
+- `--escala` multiplica la cantidad de departamentos: cada departamento se
+  subdivide en `escala` partes que se reparten su población, así las tasas y
+  los totales de población siguen siendo verosímiles a 10× o 100×. Con una
+  escala menor a 1 se toma una muestra de departamentos.
+- `--mensual` agrega la columna `mes` y reparte los hechos de cada año en
+  doce meses con una estacionalidad por categoría.
+
+Los hechos se generan por bloques de departamentos y se escriben a archivos
+temporales que luego se unen con sink_parquet, así la memoria no crece con la
+escala.
+
+Uso:
+    python generar_datos.py
+    python generar_datos.py --escala 10 --mensual --salida /tmp/snic_10x.parquet
+"""
+
+import argparse
+import math
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+# Población aproximada del censo 2022, en miles, y cantidad de departamentos
+# (partidos, comunas) de cada provincia según INDEC
+PROVINCIAS = {
+    "Buenos Aires": (17_523, 135),
+    "Catamarca": (429, 16),
+    "Chaco": (1_129, 25),
+    "Chubut": (603, 15),
+    "Ciudad Autónoma de Buenos Aires": (3_121, 15),
+    "Córdoba": (3_840, 26),
+    "Corrientes": (1_212, 25),
+    "Entre Ríos": (1_426, 17),
+    "Formosa": (607, 9),
+    "Jujuy": (811, 16),
+    "La Pampa": (361, 22),
+    "La Rioja": (384, 18),
+    "Mendoza": (2_043, 18),
+    "Misiones": (1_280, 17),
+    "Neuquén": (710, 16),
+    "Río Negro": (762, 13),
+    "Salta": (1_440, 23),
+    "San Juan": (822, 19),
+    "San Luis": (542, 9),
+    "Santa Cruz": (337, 7),
+    "Santa Fe": (3_556, 19),
+    "Santiago del Estero": (1_060, 27),
+    "Tierra del Fuego, Antártida e Islas del Atlántico Sur": (190, 5),
+    "Tucumán": (1_731, 17),
+}
+
+# Departamentos que el tablero menciona por nombre; el resto se numera
+DEPARTAMENTOS_CONOCIDOS = {
+    "Buenos Aires": ["San Isidro", "Tigre", "Tordillo", "La Matanza", "La Plata", "General Pueyrredón"],
+    "Córdoba": ["Capital", "Río Cuarto"],
+    "Santa Fe": ["Rosario", "La Capital"],
+    "Mendoza": ["Capital", "Godoy Cruz"],
+    "Salta": ["Capital", "Orán"],
+    "Tucumán": ["Capital", "Cruz Alta"],
+}
+
+# categoría -> [(tipo, tasa base cada 100.000 hab., víctimas por hecho)]
+TIPOS_DELITO = {
+    "Delitos contra las personas": [
+        ("Homicidios dolosos", 5.0, 1.05),
+        ("Homicidios dolosos en grado de tentativa", 9.0, 1.1),
+        ("Homicidios culposos en accidentes viales", 9.5, 1.2),
+        ("Homicidios culposos por otros hechos", 1.5, 1.0),
+        ("Lesiones dolosas", 320.0, 1.15),
+        ("Lesiones culposas en accidentes viales", 190.0, 1.4),
+        ("Lesiones culposas por otros hechos", 25.0, 1.0),
+        ("Otros delitos contra las personas", 30.0, 1.0),
+    ],
+    "Delitos contra la integridad sexual": [
+        ("Abusos sexuales con acceso carnal (violaciones)", 12.0, 1.0),
+        ("Otros delitos contra la integridad sexual", 45.0, 1.0),
+    ],
+    "Delitos contra la libertad": [
+        ("Amenazas", 600.0, 1.1),
+        ("Otros delitos contra la libertad", 120.0, 1.0),
+    ],
+    "Delitos contra la propiedad": [
+        ("Robos (excluye los agravados por el resultado de lesiones y/o muertes)", 880.0, 1.1),
+        ("Tentativas de robo (excluye las agravadas por el resultado de lesiones y/o muertes)", 110.0, 1.0),
+        ("Robos agravados por el resultado de lesiones y/o muertes", 6.0, 1.1),
+        ("Hurtos", 820.0, 1.0),
+        ("Tentativas de hurto", 70.0, 1.0),
+        ("Otros delitos contra la propiedad", 260.0, 0.9),
+    ],
+    "Delitos contra el Estado y la comunidad": [
+        ("Delitos contra la seguridad pública", 60.0, 0.3),
+        ("Delitos contra el orden público", 12.0, 0.2),
+        ("Delitos contra la administración pública", 95.0, 0.2),
+        ("Delitos contra la fe pública", 30.0, 0.5),
+    ],
+    "Delitos previstos en leyes especiales": [
+        ("Tenencia simple atenuada para uso personal de estupefacientes", 70.0, 0.0),
+        ("Tenencia simple de estupefacientes", 25.0, 0.0),
+        ("Comercialización de estupefacientes", 20.0, 0.0),
+        ("Siembra y producción de estupefacientes", 2.0, 0.0),
+        ("Otros delitos previstos en la Ley 23.737 (estupefacientes)", 8.0, 0.0),
+        ("Contrabando", 1.5, 0.0),
+        ("Otros delitos previstos en leyes especiales", 40.0, 0.1),
+    ],
+    "Contravenciones": [
+        ("Contravenciones", 150.0, 0.1),
+    ],
+}
+
+# Pico de estacionalidad (mes) por categoría, para el grano mensual
+MES_PICO = {
+    "Delitos contra las personas": 12,
+    "Delitos contra la integridad sexual": 3,
+    "Delitos contra la libertad": 10,
+    "Delitos contra la propiedad": 7,
+    "Delitos contra el Estado y la comunidad": 9,
+    "Delitos previstos en leyes especiales": 5,
+    "Contravenciones": 1,
+}
+
+ANIO_CENSO = 2022
+CRECIMIENTO_POBLACION = 0.011
+DEPARTAMENTOS_POR_BLOQUE = 60
+
+ESQUEMA = {
+    "anio": pl.Int16,
+    "categoria_delito": pl.Utf8,
+    "codigo_delito_snic_nombre": pl.Utf8,
+    "provincia_nombre": pl.Utf8,
+    "depto_nombre_completo": pl.Utf8,
+    "cantidad_hechos": pl.Int32,
+    "cantidad_victimas": pl.Int32,
+    "poblacion_departamento": pl.Int32,
+    "poblacion_provincia": pl.Int32,
+    "poblacion_pais": pl.Int32,
+}
+
+
+# ---------------- DIMENSIONES ---------------- #
+def generar_departamentos(escala, rng):
+    """
+    Una fila por departamento con su población en el año del censo y un factor
+    de riesgo relativo log-normal (con algunos casos extremos tipo Tordillo).
+    """
+    filas = []
+    for provincia, (miles, cantidad) in PROVINCIAS.items():
+        conocidos = DEPARTAMENTOS_CONOCIDOS.get(provincia, [])
+        nombres = conocidos + [f"Departamento {i:03d}" for i in range(len(conocidos) + 1, cantidad + 1)]
+        # Reparto de población muy desigual: pocos departamentos concentran la mayoría
+        pesos = rng.lognormal(0.0, 1.3, cantidad)
+        poblaciones = np.maximum(pesos / pesos.sum() * miles * 1000, 500)
+        riesgos = rng.lognormal(0.0, 0.45, cantidad)
+        atipicos = rng.random(cantidad) < 0.01
+        riesgos[atipicos] *= rng.pareto(1.5, atipicos.sum()) + 3
+        if provincia == "Buenos Aires":
+            poblaciones[2], riesgos[2] = 1_900, 12.0  # Tordillo: poca población, muchos hechos
+
+        for nombre, poblacion, riesgo in zip(nombres, poblaciones, riesgos):
+            partes = max(1, round(escala))
+            for parte in range(1, partes + 1):
+                sufijo = f" {parte}" if partes > 1 else ""
+                filas.append({
+                    "provincia_nombre": provincia,
+                    "depto_nombre_completo": f"{nombre}{sufijo}, {provincia}",
+                    "poblacion_censo": poblacion / partes,
+                    "riesgo": riesgo * rng.lognormal(0.0, 0.15) if partes > 1 else riesgo,
+                })
+
+    departamentos = pl.DataFrame(filas)
+    if escala < 1:
+        departamentos = departamentos.sample(fraction=escala, seed=int(rng.integers(2**31)))
+    return departamentos.with_row_index("id_depto")
+
+
+def generar_poblaciones(departamentos, anios, rng):
+    """Población por departamento y año, con los totales provinciales y nacionales."""
+    desvio_crecimiento = rng.normal(0.0, 0.004, departamentos.height)
+    return (
+        departamentos
+        .with_columns(pl.Series("crecimiento", CRECIMIENTO_POBLACION + desvio_crecimiento))
+        .join(pl.DataFrame({"anio": pl.Series(anios, dtype=pl.Int16)}), how="cross")
+        .with_columns(
+            (pl.col("poblacion_censo") * (1 + pl.col("crecimiento")).pow(pl.col("anio") - ANIO_CENSO))
+            .round().cast(pl.Int32).alias("poblacion_departamento")
+        )
+        .with_columns([
+            pl.col("poblacion_departamento").sum().over(["anio", "provincia_nombre"])
+            .cast(pl.Int32).alias("poblacion_provincia"),
+            pl.col("poblacion_departamento").sum().over("anio")
+            .cast(pl.Int32).alias("poblacion_pais"),
+        ])
+        .drop(["poblacion_censo", "crecimiento"])
+    )
+
+
+def _tipos():
+    filas = [
+        {"categoria_delito": categoria, "codigo_delito_snic_nombre": tipo,
+         "tasa_base": tasa, "victimas_por_hecho": victimas}
+        for categoria, tipos in TIPOS_DELITO.items()
+        for tipo, tasa, victimas in tipos
+    ]
+    return pl.DataFrame(filas)
+
+
+def _tendencia(anios, rng):
+    """Factor por año: caída en 2020 (pandemia) y suba en los últimos años."""
+    anios_np = np.asarray(anios)
+    factor = 1 + 0.012 * (anios_np - anios_np[0]) + rng.normal(0.0, 0.03, len(anios))
+    factor[anios_np == 2020] *= 0.75
+    factor[anios_np >= 2021] *= 1.08
+    return pl.DataFrame({"anio": pl.Series(anios, dtype=pl.Int16), "tendencia": factor})
+
+
+def _estacionalidad():
+    """Peso de cada mes por categoría; suma 1 en el año."""
+    meses = np.arange(1, 13, dtype=np.int8)
+    partes = []
+    for categoria, pico in MES_PICO.items():
+        curva = 1 + 0.18 * np.cos(2 * np.pi * (meses - pico) / 12)
+        partes.append(pl.DataFrame({
+            "categoria_delito": [categoria] * 12, "mes": meses, "peso_mes": curva / curva.sum()
+        }))
+    return pl.concat(partes)
+
+
+# ---------------- HECHOS ---------------- #
+def generar_bloque(poblaciones, tipos, tendencia, estacionalidad, mensual, rng):
+    """Hechos y víctimas de un bloque de departamentos, para todos los años y tipos."""
+    df = poblaciones.join(tipos, how="cross").join(tendencia, on="anio")
+    if mensual:
+        df = df.join(estacionalidad, on="categoria_delito")
+    else:
+        df = df.with_columns(pl.lit(1.0).alias("peso_mes"))
+
+    # Sensibilidad del departamento a cada tipo: algunos tipos son mucho más
+    # frecuentes en ciertos lugares (estupefacientes, contrabando en el norte)
+    lam = df.select(
+        pl.col("poblacion_departamento") / 100_000 * pl.col("tasa_base") * pl.col("riesgo")
+        * pl.col("tendencia") * pl.col("peso_mes")
+    ).to_series().to_numpy() * rng.lognormal(0.0, 0.5, df.height)
+
+    # Gamma-Poisson (binomial negativa): sobredispersión y muchos ceros en tipos raros
+    hechos = rng.poisson(lam * rng.gamma(2.0, 0.5, df.height))
+    victimas = rng.poisson(hechos * df["victimas_por_hecho"].to_numpy())
+
+    columnas = list(ESQUEMA) + (["mes"] if mensual else [])
+    return (
+        df
+        .with_columns([
+            pl.Series("cantidad_hechos", hechos, dtype=pl.Int32),
+            pl.Series("cantidad_victimas", victimas, dtype=pl.Int32),
+        ])
+        .select(columnas)
+    )
+
+
+def generar(salida, escala=1.0, mensual=False, anio_desde=2000, anio_hasta=2024, semilla=0):
+    """Escribe el dataset sintético en `salida` y devuelve la cantidad de filas."""
+    rng = np.random.default_rng(semilla)
+    anios = list(range(anio_desde, anio_hasta + 1))
+
+    departamentos = generar_departamentos(escala, rng)
+    poblaciones = generar_poblaciones(departamentos, anios, rng)
+    tipos = _tipos()
+    tendencia = _tendencia(anios, rng)
+    estacionalidad = _estacionalidad()
+
+    with tempfile.TemporaryDirectory() as temporal:
+        partes = []
+        bloques = math.ceil(departamentos.height / DEPARTAMENTOS_POR_BLOQUE)
+        for i in range(bloques):
+            ids = departamentos["id_depto"].slice(i * DEPARTAMENTOS_POR_BLOQUE, DEPARTAMENTOS_POR_BLOQUE)
+            bloque = generar_bloque(
+                poblaciones.filter(pl.col("id_depto").is_in(ids.implode())),
+                tipos, tendencia, estacionalidad, mensual, rng
+            )
+            parte = Path(temporal) / f"parte_{i:05d}.parquet"
+            bloque.write_parquet(parte)
+            partes.append(parte)
+            del bloque
+
+        pl.scan_parquet(partes).sink_parquet(salida, compression="zstd")
+
+    return pl.scan_parquet(salida).select(pl.len()).collect().item()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--salida", type=Path, default=Path("DATOS_SNIC_POB.parquet"))
+    parser.add_argument("--escala", type=float, default=1.0,
+                        help="multiplicador de la cantidad de departamentos (p. ej. 10, 100 o 0.1)")
+    parser.add_argument("--mensual", action="store_true", help="agregar la columna mes (grano mensual)")
+    parser.add_argument("--desde", type=int, default=2000, help="primer año")
+    parser.add_argument("--hasta", type=int, default=2024, help="último año")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    filas = generar(args.salida, args.escala, args.mensual, args.desde, args.hasta, args.semilla)
+    print(
+        f"{args.salida}: {filas:,} filas, {args.salida.stat().st_size / 2**20:.1f} MB "
+        f"en {time.perf_counter() - inicio:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+"""Construcción y envío de los gráficos compartidos por las pestañas."""
+
+import logging
+
+import polars as pl
+import streamlit as st
+
+import metricas
+
+# NumPy y Plotly se importan de forma diferida (ver _plotly): importar este
+# módulo no debe costar el árbol de graph_objects en vistas sin gráficos.
+
+logger = logging.getLogger(__name__)
+
+# Por encima de esta cantidad de series se pasa a trazas WebGL (Scattergl)
+UMBRAL_WEBGL = 24
+# Series que se dibujan individualmente en modo WebGL; el resto va a una banda
+TOP_K_SERIES = 10
+# Percentiles que delimitan la banda de "otros"
+CUANTIL_INFERIOR = 0.1
+CUANTIL_SUPERIOR = 0.9
+
+COLOR_BANDA = "rgba(160, 160, 160, 0.25)"
+COLOR_MEDIANA = "#8c8c8c"
+
+
+# ---------------- PAYLOAD COMPACTO ---------------- #
+# Plotly 6 serializa los arrays de NumPy como buffers base64 tipados
+# ({"dtype": "f4", "bdata": ...}) en lugar de listas JSON de floats.
+_ATRIBUTOS_NUMERICOS = ("x", "y", "z", "customdata")
+_MIN_INT32 = -2**31
+_MAX_INT32 = 2**31 - 1
+
+
+def array_compacto(valores):
+    """
+    Convierte una serie o array numérico a float32/int32 para que viaje como
+    buffer binario. Los arrays no numéricos se devuelven sin cambios.
+    """
+    import numpy as np
+
+    if isinstance(valores, pl.Series):
+        valores = valores.to_numpy()
+    arr = np.asarray(valores)
+    if arr.dtype.kind == "f":
+        return arr.astype(np.float32, copy=False)
+    if arr.dtype.kind in "iu":
+        if arr.dtype.itemsize <= 4 and arr.dtype != np.uint32:
+            return arr
+        if arr.size == 0 or (arr.min() >= _MIN_INT32 and arr.max() <= _MAX_INT32):
+            return arr.astype(np.int32)
+    return valores
+
+
+def matriz_compacta(df, columnas):
+    """
+    Matriz customdata con las columnas numéricas indicadas: int32 si todas son
+    enteras, float32 en otro caso.
+    """
+    df = df.select(columnas)
+    if all(dtype.is_integer() for dtype in df.dtypes):
+        return df.cast(pl.Int32).to_numpy()
+    return df.cast(pl.Float32).to_numpy()
+
+
+def compactar_figura(fig):
+    """Aplica array_compacto a los arrays numéricos de todas las trazas."""
+    for trace in fig.data:
+        for atributo in _ATRIBUTOS_NUMERICOS:
+            if atributo in trace and trace[atributo] is not None:
+                _reasignar(trace, atributo, array_compacto(trace[atributo]))
+        marker = trace["marker"] if "marker" in trace else None
+        if marker is not None and "color" in marker and marker.color is not None \
+                and not isinstance(marker.color, str):
+            _reasignar(marker, "color", array_compacto(marker.color))
+    return fig
+
+
+def _reasignar(objeto, atributo, valor):
+    # Plotly ignora la asignación si los valores son iguales aunque cambie el
+    # dtype, así que primero se limpia la propiedad
+    objeto[atributo] = None
+    objeto[atributo] = valor
+
+
+def tamano_payload(fig):
+    """Bytes del spec JSON que st.plotly_chart envía al navegador."""
+    _, pio = _plotly()
+    return len(pio.to_json(fig, validate=False).encode("utf-8"))
+
+
+def mostrar_grafico(fig, nombre, **kwargs):
+    """
+    Compacta la figura, la renderiza con st.plotly_chart y registra en las
+    métricas del rerun el tiempo de envío y, con el panel de diagnóstico o la
+    exportación a Prometheus activos, el tamaño de su payload.
+    """
+    with metricas.medir("grafico", nombre) as medicion:
+        compactar_figura(fig)
+        if metricas.medir_payloads():
+            medicion["bytes"] = tamano_payload(fig)
+        st.plotly_chart(fig, **kwargs)
+    if "bytes" in medicion:
+        metricas.registrar_payload(nombre, medicion["bytes"])
+        logger.info("payload %s: %d bytes", nombre, medicion["bytes"])
+
+
+# ---------------- PLANTILLA Y FÁBRICA DE FIGURAS ---------------- #
+PLANTILLA = "delitos"
+_plotly_cargado = None
+
+
+def _plotly():
+    """
+    Importa plotly.graph_objects y plotly.io la primera vez que se construye
+    un gráfico y registra la plantilla del tablero como default.
+    """
+    global _plotly_cargado
+    if _plotly_cargado is None:
+        _plotly_cargado = _registrar_plantilla()
+    return _plotly_cargado
+
+
+def _registrar_plantilla():
+    import plotly.graph_objects as go
+    import plotly.io as pio
+
+    # Streamlit mezcla su tema sobre layout.template.layout, por eso la
+    # plantilla solo fija defaults de trazas; fondo y grilla van en el layout.
+    # Parte de "plotly" pero solo con defaults para los tipos de traza que usa
+    # el tablero, así no viaja en cada figura la configuración de ~25 tipos.
+    # Se registra como default: Plotly resuelve y cachea la plantilla por
+    # defecto una sola vez, mientras que pasar template= por figura cuesta
+    # ~6 ms de validación en cada construcción.
+    base = pio.templates["plotly"]
+    pio.templates[PLANTILLA] = go.layout.Template(
+        layout=base.layout,
+        data={
+            "scatter": [go.Scatter(
+                mode="lines+markers", line=dict(width=3), marker=dict(size=8)
+            )],
+            "scattergl": base.data.scattergl,
+            "bar": base.data.bar,
+            "choroplethmapbox": base.data.choroplethmapbox,
+        },
+    )
+    pio.templates.default = PLANTILLA
+    return go, pio
+
+
+def plotly_express():
+    """plotly.express con la plantilla del tablero ya registrada."""
+    _plotly()
+    import plotly.express as px
+    return px
+
+
+# Estilo común de los cuatro gráficos de líneas de "Vista general"
+LAYOUT_LINEA_ANUAL = dict(
+    xaxis_title="", yaxis_title="", showlegend=False,
+    plot_bgcolor='white', paper_bgcolor='white', font=dict(size=12),
+    height=200, margin=dict(l=0, r=30, t=0, b=0),
+)
+
+
+def figura_linea_anual(df, col_valor, color, hovertemplate, tickformat, linea_cero=False):
+    """
+    Línea spline por año con el estilo de "Vista general", construida con
+    graph_objects en una sola pasada de validación en lugar de px.line más
+    cuatro llamadas de update.
+    """
+    go, _ = _plotly()
+    min_anio = df["anio"].min()
+    max_anio = df["anio"].max()
+    shapes = []
+    if linea_cero:
+        shapes.append(dict(
+            type="line", xref="x domain", x0=0, x1=1, yref="y", y0=0, y1=0,
+            line=dict(dash="dash", color="darkgrey", width=2),
+        ))
+    return go.Figure(
+        data=[go.Scatter(
+            x=array_compacto(df["anio"]),
+            y=array_compacto(df[col_valor]),
+            line=dict(shape="spline", color=color),
+            marker=dict(color=color),
+            hovertemplate=hovertemplate,
+        )],
+        layout=dict(
+            **LAYOUT_LINEA_ANUAL,
+            xaxis=dict(
+                range=[min_anio - 0.5, max_anio + 0.5], tick0=min_anio, dtick=3,
+                showgrid=True, gridcolor='lightgray'
+            ),
+            yaxis=dict(showgrid=True, gridcolor='lightgray', tickformat=tickformat),
+            shapes=shapes,
+        ),
+    )
+
+
+MESES = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
+
+
+def figura_linea_mensual(df, col_valor, color, hovertemplate, tickformat):
+    """Serie mensual con el estilo de las líneas de "Vista general"."""
+    go, _ = _plotly()
+    return go.Figure(
+        data=[go.Scatter(
+            x=df["fecha"].dt.strftime("%Y-%m-%d").to_list(),
+            y=array_compacto(df[col_valor]),
+            mode="lines",
+            line=dict(color=color, width=1.5),
+            hovertemplate=hovertemplate,
+        )],
+        layout=dict(
+            **LAYOUT_LINEA_ANUAL,
+            xaxis=dict(type="date", showgrid=True, gridcolor='lightgray'),
+            yaxis=dict(showgrid=True, gridcolor='lightgray', tickformat=tickformat),
+        ),
+    )
+
+
+def figura_perfil_estacional(df, color):
+    """
+    Índice estacional por mes (1 = mes promedio) con el rango entre años
+    como barra de error y una línea de referencia en 1.
+    """
+    go, _ = _plotly()
+    indice = df["indice"]
+    return go.Figure(
+        data=[go.Bar(
+            x=[MESES[m - 1] for m in df["mes"].to_list()],
+            y=array_compacto(indice),
+            marker=dict(color=color),
+            error_y=dict(
+                type="data", symmetric=False, color=COLOR_MEDIANA,
+                array=array_compacto(df["indice_max"] - indice),
+                arrayminus=array_compacto(indice - df["indice_min"]),
+            ),
+            customdata=matriz_compacta(df, ["indice_min", "indice_max"]),
+            hovertemplate=(
+                "%{x}<br>Índice  %{y:.2f}<br>"
+                "Rango entre años  %{customdata[0]:.2f} – %{customdata[1]:.2f}<extra></extra>"
+            ),
+        )],
+        layout=dict(
+            **LAYOUT_LINEA_ANUAL,
+            yaxis=dict(showgrid=True, gridcolor='lightgray', tickformat=".2f"),
+            shapes=[dict(
+                type="line", xref="x domain", x0=0, x1=1, yref="y", y0=1, y1=1,
+                line=dict(dash="dash", color="darkgrey", width=2),
+            )],
+        ),
+    )
+
+
+# Colores de las categorías en la jerarquía categoría → tipo
+COLORES_JERARQUIA = [
+    '#7b59b3', '#3fbbe2', '#df437e', '#ef8154', '#eeaf2a', '#59B3A8',
+    '#437EDF', '#C56074', '#2ca02c', '#CF54EF', '#1f77b4', '#bd5b34',
+]
+
+
+def figura_jerarquia(df, tipo="treemap"):
+    """
+    Treemap o sunburst de la jerarquía de consultas.distribucion_delitos (id,
+    padre, etiqueta, cantidad_hechos, porcentaje). Con branchvalues="total"
+    el valor de cada categoría es su subtotal, no la suma que calcularía
+    Plotly, así que el gráfico no recorre los datos de nuevo.
+    """
+    go, _ = _plotly()
+    traza = go.Treemap if tipo == "treemap" else go.Sunburst
+    extra = dict(tiling=dict(pad=2), pathbar=dict(visible=True)) if tipo == "treemap" else dict(
+        insidetextorientation="radial"
+    )
+    return go.Figure(
+        data=[traza(
+            ids=df["id"].to_list(),
+            parents=df["padre"].to_list(),
+            labels=df["etiqueta"].to_list(),
+            values=array_compacto(df["cantidad_hechos"]),
+            customdata=array_compacto(df["porcentaje"]),
+            branchvalues="total",
+            maxdepth=3 if tipo == "treemap" else 2,
+            texttemplate="<b>%{label}</b><br>%{customdata:.1%}",
+            hovertemplate=(
+                "<b>%{label}</b><br>Cantidad de delitos: %{value:,}<br>"
+                "Del total: %{customdata:.2%}<br>De %{parent}: %{percentParent:.1%}<extra></extra>"
+            ),
+            **extra,
+        )],
+        layout=dict(
+            height=520, margin=dict(l=0, r=0, t=0, b=0),
+            paper_bgcolor='white', font=dict(size=11),
+            **{f"{tipo}colorway": COLORES_JERARQUIA},
+        ),
+    )
+
+
+def construir_figuras(constructores):
+    """
+    Ejecuta en orden las funciones de {nombre: función sin argumentos} y
+    devuelve {nombre: figura}, midiendo cada construcción en el rerun.
+    """
+    figuras = {}
+    for nombre, constructor in constructores.items():
+        with metricas.medir("figura", nombre):
+            figuras[nombre] = constructor()
+    return figuras
+
+
+# ---------------- EVOLUCIÓN ---------------- #
+def series_destacadas(df, col_serie, col_valor, top_k=TOP_K_SERIES):
+    """
+    Devuelve las top_k series con mayor valor en el último año disponible
+    de cada una. Sirve para fijar las mismas series en varios gráficos.
+    """
+    return (
+        df.lazy()
+        .drop_nulls(col_valor)
+        .sort("anio")
+        .group_by(col_serie)
+        .agg(pl.col(col_valor).last())
+        .top_k(top_k, by=col_valor)
+        .pipe(metricas.recolectar, "series_destacadas")[col_serie]
+        .to_list()
+    )
+
+
+def _layout_evolucion(fig, df, tickformat, linea_cero):
+    fig.update_layout(
+        xaxis_title="", yaxis_title="",
+        showlegend=False, plot_bgcolor='white', paper_bgcolor='white',
+        font=dict(size=12), height=400,
+        margin=dict(l=0, r=120, t=0, b=0),
+    )
+    if linea_cero:
+        fig.add_hline(y=0, line_dash="dash", line_color="darkgrey", line_width=2)
+    fig.update_yaxes(showgrid=True, gridcolor='lightgray', tickformat=tickformat)
+
+    min_year = df["anio"].min()
+    max_year = df["anio"].max()
+    fig.update_xaxes(range=[min_year - 0.5, max_year + 0.5], dtick=1)
+
+
+def _anotar_ultimo_valor(fig, df, col_etiqueta, col_valor, color_map):
+    # Etiqueta al final de cada línea, con el mismo color que la línea
+    ultimos = (
+        df.drop_nulls(col_valor)
+        .sort("anio")
+        .group_by(col_etiqueta, maintain_order=True)
+        .agg(pl.col("anio").last(), pl.col(col_valor).last())
+    )
+    for etiqueta, ultimo_x, ultimo_y in ultimos.iter_rows():
+        fig.add_annotation(
+            x=ultimo_x, y=ultimo_y, text=etiqueta,
+            showarrow=False, xanchor="left", xshift=10,
+            font=dict(size=12, color=color_map[etiqueta])
+        )
+
+
+def _traza_serie(
+    tipo_traza, df_serie, col_valor, col_serie, etiqueta, color,
+    custom_data, hover_cuerpo, line_shape="linear"
+):
+    # El nombre completo es constante en la traza: va en el hovertemplate
+    # en lugar de repetirse en cada punto de customdata
+    nombre = df_serie[col_serie].cast(pl.Utf8)[0]
+    return tipo_traza(
+        x=array_compacto(df_serie["anio"]),
+        y=array_compacto(df_serie[col_valor]),
+        mode="lines+markers",
+        name=etiqueta,
+        line=dict(width=3, color=color, shape=line_shape),
+        marker=dict(size=8, color=color),
+        customdata=matriz_compacta(df_serie, custom_data) if custom_data else None,
+        hovertemplate=(
+            f"<b><span style='color:{color}'>{nombre}</span></b><br>" + hover_cuerpo
+        ),
+    )
+
+
+def figura_evolucion(
+    df, col_valor, col_serie, col_etiqueta, custom_data, hover_cuerpo, colors,
+    tickformat=",", linea_cero=False, destacadas=None, nombre_resto="series",
+):
+    """
+    Gráfico de líneas de evolución anual con una serie por valor de col_serie.
+
+    Con pocas series usa líneas spline con marcadores. Si la cantidad de
+    series supera UMBRAL_WEBGL, dibuja con Scattergl solo las destacadas
+    (por defecto, las TOP_K_SERIES con mayor valor final) y resume el resto
+    en una banda de percentiles con su mediana, de modo que la cantidad de
+    trazas y anotaciones queda acotada sin importar cuántas series haya.
+    """
+    go, _ = _plotly()
+    n_series = df[col_serie].n_unique()
+
+    if n_series <= UMBRAL_WEBGL:
+        fig = go.Figure()
+        color_map = {}
+        for i, (_, df_serie) in enumerate(df.group_by(col_serie, maintain_order=True)):
+            color = colors[i % len(colors)]
+            etiqueta = df_serie[col_etiqueta][0]
+            color_map[etiqueta] = color
+            fig.add_trace(_traza_serie(
+                go.Scatter, df_serie, col_valor, col_serie, etiqueta, color,
+                custom_data, hover_cuerpo, line_shape='spline'
+            ))
+
+        _layout_evolucion(fig, df, tickformat, linea_cero)
+        _anotar_ultimo_valor(fig, df, col_etiqueta, col_valor, color_map)
+        return fig
+
+    if destacadas is None:
+        destacadas = series_destacadas(df, col_serie, col_valor)
+
+    df_top = df.filter(pl.col(col_serie).is_in(destacadas)).sort([col_serie, "anio"])
+    df_resto = df.filter(~pl.col(col_serie).is_in(destacadas))
+
+    fig = go.Figure()
+
+    # Banda de percentiles y mediana para las series no destacadas
+    if df_resto.height > 0:
+        n_resto = df_resto[col_serie].n_unique()
+        banda = (
+            df_resto
+            .drop_nulls(col_valor)
+            .group_by("anio")
+            .agg([
+                pl.col(col_valor).quantile(CUANTIL_INFERIOR).alias("inferior"),
+                pl.col(col_valor).median().alias("mediana"),
+                pl.col(col_valor).quantile(CUANTIL_SUPERIOR).alias("superior"),
+            ])
+            .sort("anio")
+        )
+        etiqueta_resto = f"Otros {n_resto} {nombre_resto}"
+        fig.add_trace(go.Scattergl(
+            x=array_compacto(banda["anio"]), y=array_compacto(banda["inferior"]), mode="lines",
+            line=dict(width=0), hoverinfo="skip", showlegend=False,
+        ))
+        fig.add_trace(go.Scattergl(
+            x=array_compacto(banda["anio"]), y=array_compacto(banda["superior"]), mode="lines",
+            line=dict(width=0), fill="tonexty", fillcolor=COLOR_BANDA,
+            hoverinfo="skip", showlegend=False,
+        ))
+        fig.add_trace(go.Scattergl(
+            x=array_compacto(banda["anio"]), y=array_compacto(banda["mediana"]), mode="lines",
+            name=etiqueta_resto,
+            line=dict(width=2, dash="dash", color=COLOR_MEDIANA),
+            hovertemplate=(
+                f"<b>{etiqueta_resto}</b><br>"
+                "Año %{x}<br>"
+                "Mediana: %{y:" + tickformat + "}<extra></extra>"
+            ),
+        ))
+        ultimo = banda.drop_nulls("mediana").tail(1)
+        if ultimo.height > 0:
+            fig.add_annotation(
+                x=ultimo["anio"][0], y=ultimo["mediana"][0], text=etiqueta_resto,
+                showarrow=False, xanchor="left", xshift=10,
+                font=dict(size=12, color=COLOR_MEDIANA)
+            )
+
+    # Una traza WebGL por serie destacada
+    color_map = {}
+    for i, (_, df_serie) in enumerate(df_top.group_by(col_serie, maintain_order=True)):
+        color = colors[i % len(colors)]
+        etiqueta = df_serie[col_etiqueta][0]
+        color_map[etiqueta] = color
+        fig.add_trace(_traza_serie(
+            go.Scattergl, df_serie, col_valor, col_serie, etiqueta, color,
+            custom_data, hover_cuerpo
+        ))
+
+    _layout_evolucion(fig, df, tickformat, linea_cero)
+    _anotar_ultimo_valor(fig, df_top, col_etiqueta, col_valor, color_map)
+    return fig
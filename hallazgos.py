@@ -0,0 +1,473 @@
+"""
+Hallazgos automáticos para los recuadros de cada pestaña.
+
+Los recuadros con hallazgos ("En 2024, Salta fue la provincia con mayor tasa",
+"pasó de 7,50 a 3,68") estaban escritos a mano y quedaban viejos con cada
+actualización del dataset. Este módulo los calcula en lote para cada versión
+(consultas.preparar_version los escribe en hallazgos_<código>.parquet junto a
+la copia) y la app solo los busca por los filtros de la pestaña.
+
+El espacio de filtros que se cubre es el de selecciones simples: sin filtro,
+una categoría o un tipo de delito, combinados con el año y el área de cada
+pestaña. Todo sale de un mismo agregado anual, apilado una vez por filtro
+(todos / categoría / tipo) para que cada hallazgo se calcule con un solo
+group_by o ventana sobre todos los filtros a la vez:
+
+- "general": tendencia de los últimos ANIOS_TENDENCIA años, máximo o récord
+  de la serie y variación del último año, para el país, cada provincia y
+  cada departamento. Son siempre del último año del dataset (la app los
+  rotula así): por año multiplicarían por 25 el tamaño del índice.
+- "categorias": categoría (o tipo, dentro de una categoría) con mayor
+  participación y, por provincia, la de mayor diferencia con el país. Las
+  comparaciones con un solo grupo (una categoría con un único tipo) no
+  dicen nada y se omiten.
+- "provincias" y "departamentos": la de mayor tasa del año (y la del año
+  anterior) y las mayores subas y bajas interanuales.
+
+Cada fila guarda el dato (sujeto, valor, valor de referencia y años), no el
+texto: texto() lo redacta al mostrarlo.
+"""
+
+import polars as pl
+
+# Años hacia atrás de la tendencia de "Vista general"
+ANIOS_TENDENCIA = 10
+# Los departamentos más chicos no cuentan para las mayores subas y bajas:
+# con pocos hechos la variación interanual es casi todo ruido
+MIN_POBLACION_MOVIMIENTOS = 20_000
+# Diferencia mínima de participación contra el país para mencionarla
+MIN_DIFERENCIA_PARTICIPACION = 0.05
+
+# Aclaraciones que acompañan a los hallazgos sobre ciertos grupos
+ACLARACIONES = {
+    "Contravenciones": (
+        "Las contravenciones son faltas menores que no se reportan de manera uniforme "
+        "entre las provincias: es una categoría **heterogénea** entre jurisdicciones."
+    ),
+}
+
+FILTRO = ["filtro_categoria", "filtro_tipo"]
+CLAVES = ["vista", "anio", "filtro_categoria", "filtro_tipo", "provincia", "departamento"]
+ESQUEMA = {
+    "vista": pl.Utf8, "anio": pl.Int16, "filtro_categoria": pl.Utf8, "filtro_tipo": pl.Utf8,
+    "provincia": pl.Utf8, "departamento": pl.Utf8, "hallazgo": pl.Utf8, "orden": pl.Int8,
+    "sujeto": pl.Utf8, "detalle": pl.Utf8, "valor": pl.Float64, "anio_dato": pl.Int16,
+    "valor_ref": pl.Float64, "anio_ref": pl.Int16,
+}
+
+
+def _filas(df, vista, hallazgo, orden, **columnas):
+    """
+    Proyecta `df` al esquema común. Las claves que `df` tiene se conservan;
+    el resto de las columnas que no se pasan quedan nulas.
+    """
+    columnas = {"vista": pl.lit(vista), "hallazgo": pl.lit(hallazgo), "orden": pl.lit(orden), **columnas}
+    presentes = set(df.collect_schema().names()) & set(CLAVES)
+    return df.select([
+        (columnas.get(nombre, pl.col(nombre) if nombre in presentes else pl.lit(None)))
+        .cast(tipo).alias(nombre)
+        for nombre, tipo in ESQUEMA.items()
+    ])
+
+
+# ---------------- BASE ---------------- #
+def _base(df):
+    """Agregado anual por departamento y tipo, con nombres como texto."""
+    return (
+        df.group_by([
+            "anio", "categoria_delito", "codigo_delito_snic_nombre",
+            "provincia_nombre", "depto_nombre_completo",
+        ])
+        .agg(
+            pl.col("cantidad_hechos").sum(),
+            pl.col("poblacion_departamento").max(),
+            pl.col("poblacion_provincia").max(),
+            pl.col("poblacion_pais").max(),
+        )
+        .with_columns(
+            pl.col("categoria_delito").cast(pl.Utf8),
+            pl.col("codigo_delito_snic_nombre").cast(pl.Utf8),
+            pl.col("provincia_nombre").cast(pl.Utf8).alias("provincia"),
+            pl.col("depto_nombre_completo").cast(pl.Utf8).alias("departamento"),
+        )
+    )
+
+
+def _por_filtro(base):
+    """La base apilada una vez por filtro: sin filtro, por categoría y por tipo."""
+    nulo = pl.lit(None, pl.Utf8)
+    return pl.concat([
+        base.with_columns(nulo.alias("filtro_categoria"), nulo.alias("filtro_tipo")),
+        base.with_columns(pl.col("categoria_delito").alias("filtro_categoria"), nulo.alias("filtro_tipo")),
+        base.with_columns(nulo.alias("filtro_categoria"), pl.col("codigo_delito_snic_nombre").alias("filtro_tipo")),
+    ])
+
+
+def _tasas(filtrado, area, poblacion):
+    """Hechos y tasa por filtro, año y `area` (lista de columnas, vacía = país)."""
+    nulo = pl.lit(None, pl.Utf8)
+    return (
+        filtrado.group_by(FILTRO + ["anio"] + area)
+        .agg(pl.col("cantidad_hechos").sum(), pl.col(poblacion).max().alias("poblacion"))
+        .filter(pl.col("poblacion") > 0)
+        .with_columns(
+            (pl.col("cantidad_hechos") / pl.col("poblacion") * 100_000).alias("tasa"),
+            *[nulo.alias(c) for c in ("provincia", "departamento") if c not in area],
+        )
+        .select(FILTRO + ["anio", "provincia", "departamento", "cantidad_hechos", "poblacion", "tasa"])
+    )
+
+
+# ---------------- VISTA GENERAL ---------------- #
+def _general(series, ultimo, desde):
+    anio, tasa = pl.col("anio"), pl.col("tasa")
+    previos = anio < ultimo
+    resumen = series.group_by(FILTRO + ["provincia", "departamento"]).agg(
+        tasa.filter(anio == ultimo).first().alias("ultima"),
+        tasa.filter(anio == ultimo - 1).first().alias("previa"),
+        tasa.filter(anio == desde).first().alias("inicial"),
+        tasa.filter(previos).max().alias("max_previo"),
+        anio.filter(previos).get(tasa.filter(previos).arg_max()).alias("anio_max_previo"),
+        tasa.max().alias("maximo"),
+        anio.get(tasa.arg_max()).alias("anio_maximo"),
+    ).filter(pl.col("ultima").is_not_null())
+    record = pl.col("ultima") >= pl.col("max_previo")
+    return [
+        _filas(
+            resumen.filter(pl.col("inicial").is_not_null()), "general", "tendencia", 1,
+            valor=pl.col("ultima"), anio_dato=pl.lit(ultimo),
+            valor_ref=pl.col("inicial"), anio_ref=pl.lit(desde),
+        ),
+        _filas(
+            resumen.filter(record), "general", "record", 2,
+            valor=pl.col("ultima"), anio_dato=pl.lit(ultimo),
+            valor_ref=pl.col("max_previo"), anio_ref=pl.col("anio_max_previo"),
+        ),
+        _filas(
+            resumen.filter(~record), "general", "maximo", 2,
+            valor=pl.col("maximo"), anio_dato=pl.col("anio_maximo"),
+            valor_ref=pl.col("ultima"), anio_ref=pl.lit(ultimo),
+        ),
+        _filas(
+            resumen.filter(pl.col("previa").is_not_null()), "general", "variacion", 3,
+            valor=pl.col("ultima"), anio_dato=pl.lit(ultimo),
+            valor_ref=pl.col("previa"), anio_ref=pl.lit(ultimo - 1),
+        ),
+    ]
+
+
+# ---------------- CATEGORÍAS ---------------- #
+def _categorias(base):
+    """
+    Sin filtro se compara entre categorías; con una categoría, entre sus
+    tipos. Por país y por provincia.
+    """
+    nulo = pl.lit(None, pl.Utf8)
+    grupos = pl.concat([
+        base.with_columns(nulo.alias("filtro_categoria"), pl.col("categoria_delito").alias("grupo")),
+        base.with_columns(
+            pl.col("categoria_delito").alias("filtro_categoria"),
+            pl.col("codigo_delito_snic_nombre").alias("grupo"),
+        ),
+    ])
+    niveles = []
+    for area in ([], ["provincia"]):
+        clave = ["filtro_categoria", "anio"] + area
+        niveles.append(
+            grupos.group_by(clave + ["grupo"]).agg(pl.col("cantidad_hechos").sum())
+            .with_columns(*[nulo.alias(c) for c in ("provincia",) if c not in area])
+            .with_columns(
+                (pl.col("cantidad_hechos") / pl.col("cantidad_hechos").sum().over(clave)).alias("participacion")
+            )
+            .filter(pl.col("participacion").is_finite())
+        )
+    pais, provincias = niveles
+    participaciones = pl.concat([pais, provincias.select(pais.collect_schema().names())])
+
+    clave = ["filtro_categoria", "anio", "provincia"]
+    lideres = participaciones.group_by(clave).agg(
+        pl.col("grupo").sort_by("participacion", descending=True).first().alias("sujeto"),
+        pl.col("participacion").max().alias("valor"),
+        pl.col("grupo").sort_by("participacion", descending=True).head(2).str.join("|").alias("principales"),
+        pl.len().alias("grupos"),
+    ).filter(pl.col("grupos") > 1)
+    # Sin filtro, los dos tipos principales de la categoría líder
+    lideres = lideres.join(
+        lideres.filter(pl.col("filtro_categoria").is_not_null()).select(
+            pl.col("filtro_categoria").alias("sujeto"), "anio", "provincia",
+            pl.col("principales").alias("detalle"),
+        ),
+        on=["sujeto", "anio", "provincia"], how="left", nulls_equal=True,
+    )
+    contrastes = (
+        provincias.join(
+            pais.select("filtro_categoria", "anio", "grupo", pl.col("participacion").alias("nacional")),
+            on=["filtro_categoria", "anio", "grupo"], how="inner", nulls_equal=True,
+        )
+        .with_columns((pl.col("participacion") - pl.col("nacional")).alias("diferencia"))
+        .filter(pl.col("diferencia") >= MIN_DIFERENCIA_PARTICIPACION)
+        .sort("diferencia", descending=True)
+        .group_by(clave, maintain_order=True).first()
+    )
+    return [
+        _filas(
+            lideres, "categorias", "composicion", 1,
+            sujeto=pl.col("sujeto"), valor=pl.col("valor"), anio_dato=pl.col("anio"),
+            detalle=pl.when(pl.col("filtro_categoria").is_null())
+            .then(pl.col("detalle")).otherwise(pl.col("principales")),
+        ),
+        _filas(
+            contrastes, "categorias", "contraste", 2,
+            sujeto=pl.col("grupo"), valor=pl.col("participacion"), anio_dato=pl.col("anio"),
+            valor_ref=pl.col("nacional"),
+        ),
+    ]
+
+
+# ---------------- PROVINCIAS Y DEPARTAMENTOS ---------------- #
+def _lideres_y_movimientos(tasas, vista, col_sujeto, area_clave, min_poblacion=0):
+    """
+    Por filtro, año y `area_clave` (vacía = país): el de mayor tasa (y el del
+    año anterior) y las mayores subas y bajas interanuales de `col_sujeto`.
+    """
+    anio, tasa = pl.col("anio"), pl.col("tasa")
+    clave = FILTRO + ["anio"] + area_clave
+    serie = FILTRO + [col_sujeto]
+    con_previa = (
+        # Ordenar solo por año alcanza para que shift(1).over(...) vea el anterior
+        tasas.sort("anio")
+        .with_columns(
+            tasa.shift(1).over(serie).alias("tasa_previa"),
+            anio.shift(1).over(serie).alias("anio_previo"),
+        )
+        .with_columns(
+            pl.when(pl.col("anio_previo") == anio - 1)
+            .then((tasa - pl.col("tasa_previa")) / pl.col("tasa_previa"))
+            .alias("cambio")
+        )
+    )
+    lideres = tasas.group_by(clave).agg(
+        pl.col(col_sujeto).get(tasa.arg_max()).alias("sujeto"),
+        tasa.max().alias("valor"),
+    )
+    lideres = lideres.join(
+        lideres.select(
+            FILTRO + area_clave + [(anio + 1).alias("anio"), pl.col("sujeto").alias("lider_previo"),
+                                   pl.col("valor").alias("valor_previo")]
+        ),
+        on=clave, how="left", nulls_equal=True,
+    )
+    movimientos = con_previa.filter(
+        pl.col("cambio").is_finite() & (pl.col("poblacion") >= min_poblacion)
+    )
+    # El mayor (o menor) cambio de cada grupo con una ventana, sin ordenar
+    cambio = pl.col("cambio")
+    alzas = movimientos.filter((cambio > 0) & (cambio == cambio.max().over(clave))).unique(clave)
+    bajas = movimientos.filter((cambio < 0) & (cambio == cambio.min().over(clave))).unique(clave)
+    # La columna del sujeto no es clave: solo se conserva la provincia del área
+    nulo = pl.lit(None, pl.Utf8)
+    area = {"provincia": pl.col("provincia") if area_clave else nulo, "departamento": nulo}
+    movimiento = dict(
+        sujeto=pl.col(col_sujeto), valor=tasa, anio_dato=anio,
+        valor_ref=pl.col("tasa_previa"), anio_ref=pl.col("anio_previo"), **area,
+    )
+    return [
+        _filas(
+            lideres, vista, "lider", 1,
+            sujeto=pl.col("sujeto"), valor=pl.col("valor"), anio_dato=anio,
+            detalle=pl.col("lider_previo"), valor_ref=pl.col("valor_previo"),
+            anio_ref=pl.when(pl.col("lider_previo").is_not_null()).then(anio - 1),
+            **area,
+        ),
+        _filas(alzas, vista, "alza", 3, **movimiento),
+        _filas(bajas, vista, "baja", 4, **movimiento),
+    ]
+
+
+def _tipo_dominante(filtrado, lideres_departamento):
+    """Tipo de delito con más hechos dentro del departamento líder."""
+    clave = FILTRO + ["anio", "departamento"]
+    tipos = (
+        filtrado.filter(pl.col("filtro_tipo").is_null())
+        .group_by(clave + ["codigo_delito_snic_nombre"])
+        .agg(pl.col("cantidad_hechos").sum())
+        .group_by(clave)
+        .agg(
+            pl.col("codigo_delito_snic_nombre").sort_by("cantidad_hechos", descending=True).first().alias("tipo"),
+            (pl.col("cantidad_hechos").max() / pl.col("cantidad_hechos").sum()).alias("participacion"),
+        )
+    )
+    return _filas(
+        lideres_departamento.join(
+            tipos, left_on=FILTRO + ["anio", "sujeto"], right_on=clave, how="inner", nulls_equal=True,
+        ).filter(pl.col("participacion").is_finite()),
+        "departamentos", "tipo_dominante", 2,
+        sujeto=pl.col("tipo"), detalle=pl.col("sujeto"), valor=pl.col("participacion"),
+        anio_dato=pl.col("anio"),
+    )
+
+
+def construir(df):
+    """
+    LazyFrame con todos los hallazgos de la versión, a partir de las filas
+    del dataset (anuales o mensuales). El agregado anual y las tasas por área
+    se materializan una vez: alimentan a todas las ramas y el optimizador no
+    las comparte entre ellas por su cuenta.
+    """
+    base = _base(df).collect()
+    filtrado = _por_filtro(base.lazy())
+    ultimo, desde = base["anio"].max(), base["anio"].min()
+    desde = max(desde, ultimo - ANIOS_TENDENCIA)
+    pais, provincias, departamentos = (
+        tasas.lazy() for tasas in pl.collect_all([
+            _tasas(filtrado, [], "poblacion_pais"),
+            _tasas(filtrado, ["provincia"], "poblacion_provincia"),
+            _tasas(filtrado, ["provincia", "departamento"], "poblacion_departamento"),
+        ])
+    )
+
+    hallazgos_departamentos = [
+        grupo
+        for area in ([], ["provincia"])
+        for grupo in _lideres_y_movimientos(
+            departamentos, "departamentos", "departamento", area, MIN_POBLACION_MOVIMIENTOS
+        )
+    ]
+    lideres_departamento = pl.concat(hallazgos_departamentos).filter(pl.col("hallazgo") == "lider")
+    return pl.concat(
+        _general(pl.concat([pais, provincias, departamentos]), ultimo, desde)
+        + _categorias(base.lazy())
+        + _lideres_y_movimientos(provincias, "provincias", "provincia", [])
+        + hallazgos_departamentos
+        + [_tipo_dominante(filtrado, lideres_departamento)]
+    ).sort(CLAVES[:1] + ["orden"])
+
+
+# ---------------- BÚSQUEDA Y TEXTO ---------------- #
+def filtro_simple(categorias=(), tipos=()):
+    """
+    (categoría, tipo) de la selección si es una de las que cubre el índice:
+    sin filtro, una categoría o un tipo. None si es una selección múltiple.
+    """
+    if len(tipos) == 1:
+        return None, tipos[0]
+    if tipos or len(categorias) > 1:
+        return None
+    return (categorias[0] if categorias else None), None
+
+
+def buscar(hallazgos, vista, anio=None, categorias=(), tipos=(), provincia=None, departamento=None):
+    """Hallazgos de la vista para los filtros dados, listos para mostrar."""
+    filtro = filtro_simple(categorias, tipos)
+    if filtro is None:
+        return []
+    clave = dict(zip(CLAVES, (vista, anio, *filtro, provincia, departamento)))
+    filas = hallazgos.filter([
+        pl.col(columna).is_null() if valor is None else pl.col(columna) == valor
+        for columna, valor in clave.items()
+    ])
+    return [texto(fila) for fila in filas.sort("orden").iter_rows(named=True)]
+
+
+def _numero(valor, decimales=2):
+    """Formato argentino: punto de miles y coma decimal."""
+    return f"{valor:,.{decimales}f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def _porcentaje(valor):
+    return f"{_numero(valor * 100, 1)}%"
+
+
+def _de_filtro(fila):
+    if fila["filtro_tipo"]:
+        return f" de **{fila['filtro_tipo'].lower()}**"
+    if fila["filtro_categoria"]:
+        return f" de **{fila['filtro_categoria'].lower()}**"
+    return " de delitos"
+
+
+def _de_categoria(fila):
+    return f" de la categoría {fila['filtro_categoria'].lower()}" if fila["filtro_categoria"] else ""
+
+
+def _area(fila):
+    if fila["departamento"]:
+        return f"en **{fila['departamento']}**"
+    if fila["provincia"]:
+        return f"en **{fila['provincia']}**"
+    return "a nivel nacional"
+
+
+def texto(fila):
+    """Redacta un hallazgo (una fila de `construir`) en markdown."""
+    h = fila["hallazgo"]
+    tasa = f"la tasa{_de_filtro(fila)}"
+    valor, ref = fila["valor"], fila["valor_ref"]
+    if h == "tendencia":
+        sentido = "subió" if valor > ref else "bajó" if valor < ref else "se mantuvo"
+        return (
+            f"Entre {fila['anio_ref']} y {fila['anio_dato']}, {tasa} {_area(fila)} **{sentido}**: "
+            f"pasó de {_numero(ref)} a {_numero(valor)} cada 100.000 habitantes."
+        )
+    if h == "record":
+        return (
+            f"En {fila['anio_dato']}, {tasa} {_area(fila)} ({_numero(valor)}) fue **la más alta de la serie** "
+            f"y superó el máximo anterior, de {fila['anio_ref']} ({_numero(ref)})."
+        )
+    if h == "maximo":
+        return (
+            f"El máximo de {tasa} {_area(fila)} fue en **{fila['anio_dato']}** ({_numero(valor)}); "
+            f"en {fila['anio_ref']} fue de {_numero(ref)}."
+        )
+    if h == "variacion":
+        cambio = (valor - ref) / ref if ref else 0
+        sentido = "creció" if cambio > 0 else "cayó" if cambio < 0 else "se mantuvo"
+        return (
+            f"En {fila['anio_dato']}, {tasa} {_area(fila)} **{sentido}** un {_porcentaje(abs(cambio))} "
+            f"respecto de {fila['anio_ref']}."
+        )
+    if h == "composicion":
+        principales = (fila["detalle"] or "").split("|")
+        if fila["filtro_categoria"] is None:
+            detalle = f", principalmente {' y '.join(p.lower() for p in principales)}" if fila["detalle"] else ""
+            return (
+                f"En {fila['anio_dato']}, el {_porcentaje(valor)} de los delitos registrados {_area(fila)} "
+                f"correspondieron a **{fila['sujeto'].lower()}**{detalle}."
+            )
+        return (
+            f"En {fila['anio_dato']}, **{fila['sujeto']}** concentró el {_porcentaje(valor)} de los "
+            f"delitos{_de_categoria(fila)} registrados {_area(fila)}."
+        )
+    if h == "contraste":
+        return (
+            f"En {fila['anio_dato']}, el **{_porcentaje(valor)}** de los delitos{_de_categoria(fila)} registrados "
+            f"en **{fila['provincia']}** correspondieron a **{fila['sujeto'].lower()}**, "
+            f"en contraste con el {_porcentaje(ref)} a nivel nacional. "
+            f"{ACLARACIONES.get(fila['sujeto'], '')}"
+        ).rstrip()
+    if h == "lider":
+        sujeto = "la provincia" if fila["vista"] == "provincias" else "el departamento"
+        dentro = f" de {fila['provincia']}" if fila["vista"] == "departamentos" and fila["provincia"] else ""
+        previo = ""
+        if fila["detalle"]:
+            previo = (
+                f", como en {fila['anio_ref']}" if fila["detalle"] == fila["sujeto"]
+                else f"; en {fila['anio_ref']} había sido **{fila['detalle']}**"
+            )
+        return (
+            f"En {fila['anio_dato']}, **{fila['sujeto']}** fue {sujeto}{dentro} con mayor tasa{_de_filtro(fila)} "
+            f"({_numero(valor)} cada 100.000 habitantes){previo}."
+        )
+    if h == "tipo_dominante":
+        return (
+            f"En **{fila['detalle']}**, el {_porcentaje(valor)} de esos hechos correspondieron a "
+            f"**{fila['sujeto'].lower()}**."
+        )
+    if h in ("alza", "baja"):
+        cambio = (valor - ref) / ref
+        return (
+            f"La mayor {'suba' if h == 'alza' else 'baja'} interanual de {tasa} fue la de "
+            f"**{fila['sujeto']}**: de {_numero(ref)} en {fila['anio_ref']} a {_numero(valor)} "
+            f"en {fila['anio_dato']} ({'+' if cambio > 0 else '−'}{_porcentaje(abs(cambio))})."
+        )
+    raise ValueError(f"hallazgo desconocido: {h}")
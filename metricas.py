@@ -0,0 +1,343 @@
+"""
+Instrumentación de las re-ejecuciones del tablero.
+
+Cada rerun guarda una lista de mediciones (consultas de opciones de filtros,
+collect() de Polars, construcción de figuras, payloads de st.plotly_chart y
+llamadas a funciones cacheadas) y el RSS del proceso al terminar. Los totales
+del proceso se acumulan aparte y se exportan en formato de texto de Prometheus.
+
+- Panel de diagnóstico: con DELITOS_DIAGNOSTICO=1 o `?diagnostico=1` en la URL
+  se muestran las mediciones del último rerun, con el plan optimizado de cada
+  collect (explain() solo se calcula en ese modo).
+- Exportación: con DELITOS_METRICAS_ARCHIVO=/ruta/delitos.prom el archivo se
+  reescribe al final de cada rerun (formato del textfile collector de
+  node_exporter).
+"""
+
+import functools
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import polars as pl
+import streamlit as st
+
+ARCHIVO_PROMETHEUS = os.environ.get("DELITOS_METRICAS_ARCHIVO")
+DIAGNOSTICO_ENTORNO = os.environ.get("DELITOS_DIAGNOSTICO", "0") == "1"
+# Reruns por sesión que se conservan para el panel
+HISTORIAL_RERUNS = 20
+
+_local = threading.local()
+_lock = threading.Lock()
+
+# Totales del proceso, compartidos por todas las sesiones
+_operaciones = defaultdict(lambda: {"cantidad": 0, "segundos": 0.0, "filas": 0})
+_payloads = {}
+_cache = defaultdict(int)
+_reruns = {"cantidad": 0, "segundos": 0.0}
+
+_PATRON_SCAN = re.compile(r"Parquet SCAN \[(.+?)\]")
+
+
+# ---------------- REGISTRO POR RERUN ---------------- #
+def diagnostico_activo():
+    return DIAGNOSTICO_ENTORNO or st.query_params.get("diagnostico") == "1"
+
+
+def medir_payloads():
+    """
+    Serializar una figura solo para medirla cuesta otro to_json por gráfico:
+    se hace solo si alguien lee el tamaño (el panel o el archivo de Prometheus).
+    """
+    return diagnostico_activo() or bool(ARCHIVO_PROMETHEUS)
+
+
+def iniciar_rerun(detallado=False):
+    """
+    Abre el registro del rerun actual en el hilo del script. Con `detallado`
+    (o en modo diagnóstico) se guardan también los planes de cada collect().
+    """
+    _local.registro = {
+        "detallado": detallado or diagnostico_activo(),
+        "inicio": time.perf_counter(),
+        "segundos": 0.0,
+        "rss_mb": None,
+        "mediciones": [],
+    }
+    return _local.registro
+
+
+def registro_actual():
+    """Registro del rerun en curso, o None fuera de un rerun (p. ej. en el precalentamiento)."""
+    return getattr(_local, "registro", None)
+
+
+def _agregar(medicion, registro):
+    if registro is not None:
+        registro["mediciones"].append(medicion)
+    with _lock:
+        total = _operaciones[(medicion["tipo"], medicion["nombre"])]
+        total["cantidad"] += 1
+        total["segundos"] += medicion["segundos"]
+        total["filas"] += medicion.get("filas_salida") or 0
+
+
+@contextmanager
+def medir(tipo, nombre):
+    """Mide una operación y la agrega al registro del rerun en curso (si hay)."""
+    medicion = {"tipo": tipo, "nombre": nombre, "segundos": 0.0}
+    registro = registro_actual()
+    inicio = time.perf_counter()
+    try:
+        yield medicion
+    finally:
+        medicion["segundos"] = time.perf_counter() - inicio
+        _agregar(medicion, registro)
+
+
+@functools.lru_cache(maxsize=16)
+def _filas_parquet(ruta, mtime):
+    # Solo lee los metadatos del archivo
+    return pl.scan_parquet(ruta).select(pl.len()).collect().item()
+
+
+def _filas_fuente(plan):
+    total = 0
+    for ruta in _PATRON_SCAN.findall(plan):
+        try:
+            total += _filas_parquet(ruta, os.path.getmtime(ruta))
+        except OSError:
+            return None
+    return total or None
+
+
+def recolectar(lf, nombre, tipo="collect"):
+    """
+    lf.collect() medido. Se usa con pipe para no romper las cadenas:
+    `df.select(...).pipe(metricas.recolectar, "tab1_anios", tipo="opciones")`.
+
+    En modo diagnóstico agrega el plan optimizado y las filas de los parquet
+    escaneados (antes de filtros).
+    """
+    with medir(tipo, nombre) as medicion:
+        df = lf.collect()
+        medicion["filas_salida"] = df.height
+    registro = registro_actual()
+    if registro is not None and registro["detallado"]:
+        medicion["plan"] = lf.explain()
+        medicion["filas_fuente"] = _filas_fuente(medicion["plan"])
+    return df
+
+
+def recolectar_todos(lfs, nombre, tipo="collect", etiquetas=None):
+    """
+    pl.collect_all(lfs) medido como una sola operación: las consultas se
+    optimizan y ejecutan juntas, así que el tiempo no se puede repartir. Las
+    filas de salida son la suma de los frames y, en modo diagnóstico, el plan
+    junta el de cada frame con sus filas, bajo su etiqueta (por defecto, su
+    posición).
+    """
+    with medir(tipo, nombre) as medicion:
+        dfs = pl.collect_all(lfs)
+        medicion["filas_salida"] = sum(df.height for df in dfs)
+    registro = registro_actual()
+    if registro is not None and registro["detallado"]:
+        etiquetas = etiquetas or [str(i) for i in range(len(lfs))]
+        planes = [lf.explain() for lf in lfs]
+        medicion["plan"] = "\n\n".join(
+            f"-- {etiqueta}: {df.height:,} filas\n{plan}"
+            for etiqueta, df, plan in zip(etiquetas, dfs, planes)
+        )
+        fuentes = [_filas_fuente(plan) for plan in planes]
+        medicion["filas_fuente"] = None if None in fuentes else sum(fuentes)
+    return dfs
+
+
+def registrar_payload(nombre, bytes_payload):
+    """Último tamaño enviado por gráfico, para el gauge de Prometheus."""
+    with _lock:
+        _payloads[nombre] = bytes_payload
+
+
+def contar_cache(nombre, acierto):
+    with _lock:
+        _cache[(nombre, "acierto" if acierto else "fallo")] += 1
+
+
+def cache_data(nombre, **opciones):
+    """
+    st.cache_data que además cuenta aciertos y fallos: el cuerpo de la función
+    solo corre en un fallo, así que basta con marcarlo desde adentro.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def calcular(*args, **kwargs):
+            _local.fallo_cache = True
+            return funcion(*args, **kwargs)
+
+        cacheada = st.cache_data(**opciones)(calcular)
+
+        @functools.wraps(funcion)
+        def llamar(*args, **kwargs):
+            # Se restaura la marca anterior por si esta llamada está anidada
+            # en el cálculo de otra función cacheada
+            anterior = getattr(_local, "fallo_cache", False)
+            _local.fallo_cache = False
+            with medir("cache", nombre) as medicion:
+                resultado = cacheada(*args, **kwargs)
+            medicion["acierto"] = not _local.fallo_cache
+            _local.fallo_cache = anterior
+            contar_cache(nombre, medicion["acierto"])
+            return resultado
+
+        llamar.clear = cacheada.clear
+        return llamar
+    return decorador
+
+
+def _rss_mb():
+    import psutil
+    return psutil.Process().memory_info().rss / 2**20
+
+
+def finalizar_rerun():
+    """
+    Cierra el registro del rerun: duración total y RSS, historial de la sesión,
+    totales del proceso y, si está configurado, el archivo de Prometheus.
+    """
+    registro = registro_actual()
+    if registro is None:
+        return None
+    registro["segundos"] = time.perf_counter() - registro["inicio"]
+    registro["rss_mb"] = _rss_mb()
+    with _lock:
+        _reruns["cantidad"] += 1
+        _reruns["segundos"] += registro["segundos"]
+
+    historial = st.session_state.setdefault("diagnostico_reruns", deque(maxlen=HISTORIAL_RERUNS))
+    historial.append(registro)
+    if ARCHIVO_PROMETHEUS:
+        escribir_prometheus(ARCHIVO_PROMETHEUS)
+    _local.registro = None
+    return registro
+
+
+# ---------------- EXPORTACIÓN ---------------- #
+def _etiqueta(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def exportar_prometheus():
+    """Totales del proceso en formato de texto de Prometheus."""
+    with _lock:
+        operaciones = {clave: dict(valor) for clave, valor in _operaciones.items()}
+        payloads = dict(_payloads)
+        cache = dict(_cache)
+        reruns = dict(_reruns)
+
+    lineas = [
+        "# HELP delitos_operacion_segundos Duración de consultas, figuras y llamadas cacheadas.",
+        "# TYPE delitos_operacion_segundos summary",
+    ]
+    for (tipo, nombre), total in sorted(operaciones.items()):
+        etiquetas = f'tipo="{_etiqueta(tipo)}",nombre="{_etiqueta(nombre)}"'
+        lineas.append(f"delitos_operacion_segundos_count{{{etiquetas}}} {total['cantidad']}")
+        lineas.append(f"delitos_operacion_segundos_sum{{{etiquetas}}} {total['segundos']:.6f}")
+
+    lineas += [
+        "# HELP delitos_collect_filas_total Filas devueltas por los collect().",
+        "# TYPE delitos_collect_filas_total counter",
+    ]
+    for (tipo, nombre), total in sorted(operaciones.items()):
+        if tipo in ("collect", "opciones"):
+            lineas.append(
+                f'delitos_collect_filas_total{{tipo="{tipo}",nombre="{_etiqueta(nombre)}"}} {total["filas"]}'
+            )
+
+    lineas += [
+        "# HELP delitos_grafico_payload_bytes Bytes del último spec enviado por gráfico.",
+        "# TYPE delitos_grafico_payload_bytes gauge",
+    ]
+    for nombre, bytes_payload in sorted(payloads.items()):
+        lineas.append(f'delitos_grafico_payload_bytes{{nombre="{_etiqueta(nombre)}"}} {bytes_payload}')
+
+    lineas += [
+        "# HELP delitos_cache_llamadas_total Llamadas a funciones cacheadas por resultado.",
+        "# TYPE delitos_cache_llamadas_total counter",
+    ]
+    for (nombre, resultado), cantidad in sorted(cache.items()):
+        lineas.append(
+            f'delitos_cache_llamadas_total{{nombre="{_etiqueta(nombre)}",resultado="{resultado}"}} {cantidad}'
+        )
+
+    lineas += [
+        "# HELP delitos_rerun_segundos Duración de las re-ejecuciones del script.",
+        "# TYPE delitos_rerun_segundos summary",
+        f"delitos_rerun_segundos_count {reruns['cantidad']}",
+        f"delitos_rerun_segundos_sum {reruns['segundos']:.6f}",
+        "# HELP delitos_proceso_rss_bytes Memoria residente del proceso.",
+        "# TYPE delitos_proceso_rss_bytes gauge",
+        f"delitos_proceso_rss_bytes {int(_rss_mb() * 2**20)}",
+    ]
+    return "\n".join(lineas) + "\n"
+
+
+def escribir_prometheus(ruta):
+    """Escritura atómica, para que el colector nunca lea un archivo a medias."""
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        f.write(exportar_prometheus())
+    os.replace(temporal, ruta)
+
+
+# ---------------- PANEL ---------------- #
+def mostrar_panel(registro):
+    """Mediciones del último rerun, para activar con ?diagnostico=1."""
+    if registro is None or not diagnostico_activo():
+        return
+
+    with st.expander("Diagnóstico del último rerun", expanded=False):
+        mediciones = registro["mediciones"]
+        por_tipo = defaultdict(float)
+        for m in mediciones:
+            por_tipo[m["tipo"]] += m["segundos"]
+
+        columnas = st.columns(4)
+        columnas[0].metric("Rerun", f"{registro['segundos'] * 1000:,.0f} ms")
+        columnas[1].metric("collect()", f"{por_tipo['collect'] + por_tipo['opciones']:.3f} s")
+        columnas[2].metric("Figuras", f"{por_tipo['figura']:.3f} s")
+        columnas[3].metric("RSS", f"{registro['rss_mb']:,.0f} MB")
+
+        st.dataframe(
+            pl.DataFrame(
+                [
+                    {
+                        "tipo": m["tipo"],
+                        "nombre": m["nombre"],
+                        "ms": round(m["segundos"] * 1000, 2),
+                        "filas fuente": m.get("filas_fuente"),
+                        "filas salida": m.get("filas_salida"),
+                        "bytes": m.get("bytes"),
+                        "caché": {True: "acierto", False: "fallo"}.get(m.get("acierto")),
+                    }
+                    for m in mediciones
+                ],
+                schema_overrides={"filas fuente": pl.Int64, "filas salida": pl.Int64,
+                                  "bytes": pl.Int64, "caché": pl.Utf8},
+            ),
+            hide_index=True,
+            use_container_width=True,
+        )
+
+        for m in mediciones:
+            if m.get("plan"):
+                st.markdown(f"**Plan de `{m['nombre']}`**")
+                st.code(m["plan"], language=None)
+
+        st.download_button(
+            "Descargar métricas (Prometheus)", exportar_prometheus(),
+            file_name="delitos.prom", mime="text/plain"
+        )
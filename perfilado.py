@@ -0,0 +1,127 @@
+"""
+Perfilado opcional de una re-ejecución completa del script.
+
+Se activa con DELITOS_PERFIL=1 o con `?perfil=1` en la URL. Mientras esté
+activo, cada rerun corre bajo cProfile y al terminar se escriben en
+DELITOS_DIR_PERFILES (por defecto `perfiles/`) tres archivos con el mismo
+prefijo de fecha y hora:
+
+- `<prefijo>.prof`: estadísticas de cProfile (pstats, snakeviz, etc.),
+- `<prefijo>.txt`: estado de los filtros y las funciones más costosas,
+- `<prefijo>_planes.json`: estado de los filtros y el plan optimizado
+  (LazyFrame.explain()) de cada collect() del rerun, con su duración y filas.
+
+Como `?perfil=1` lo puede pedir cualquier visitante, el directorio tiene un
+tope (DELITOS_MAX_PERFILES perfiles y DELITOS_MAX_MB_PERFILES megabytes): al
+alcanzarlo los reruns dejan de perfilarse hasta que se vacíe. Un rerun que
+termina antes de tiempo (excepción, st.stop() o un cambio de widget) detiene
+el perfil pero no escribe nada.
+
+cProfile solo ve el hilo del script: el precalentamiento y la vigilancia del
+dataset corren en hilos propios y no aparecen en el perfil.
+"""
+
+import cProfile
+import datetime
+import io
+import json
+import os
+import pstats
+from pathlib import Path
+
+import streamlit as st
+
+DIR_PERFILES = Path(os.environ.get("DELITOS_DIR_PERFILES", "perfiles"))
+PERFIL_ENTORNO = os.environ.get("DELITOS_PERFIL", "0") == "1"
+# Funciones listadas en el resumen de texto
+TOP_FUNCIONES = 40
+# Tope del directorio de perfiles: cantidad de perfiles (de a tres archivos) y tamaño total
+MAX_PERFILES = int(os.environ.get("DELITOS_MAX_PERFILES", "50"))
+MAX_BYTES_PERFILES = int(os.environ.get("DELITOS_MAX_MB_PERFILES", "200")) * 1024 * 1024
+
+
+def activo():
+    return PERFIL_ENTORNO or st.query_params.get("perfil") == "1"
+
+
+def lleno():
+    """True si el directorio de perfiles ya alcanzó alguno de los dos topes."""
+    if not DIR_PERFILES.is_dir():
+        return False
+    archivos = [a for a in DIR_PERFILES.iterdir() if a.is_file()]
+    perfiles = sum(1 for a in archivos if a.suffix == ".prof")
+    return (
+        perfiles >= MAX_PERFILES
+        or sum(a.stat().st_size for a in archivos) >= MAX_BYTES_PERFILES
+    )
+
+
+def iniciar():
+    """
+    Empieza a perfilar el rerun si el hook está activo y queda lugar en el
+    directorio; si no, devuelve None.
+    """
+    if not activo():
+        return None
+    if lleno():
+        st.caption(f"Perfilado desactivado: `{DIR_PERFILES}` alcanzó su tope de perfiles.")
+        return None
+    perfil = cProfile.Profile()
+    perfil.enable()
+    return perfil
+
+
+def detener(perfil):
+    """Detiene el perfil (si hay uno); se llama siempre al salir del rerun."""
+    if perfil is not None:
+        perfil.disable()
+
+
+def estado_filtros():
+    """Valores de los widgets con key (y la vista elegida), serializables a JSON."""
+    estado = {}
+    for clave, valor in st.session_state.items():
+        if isinstance(valor, (str, int, float, bool, type(None))):
+            estado[clave] = valor
+        elif isinstance(valor, (list, tuple)) and all(
+            isinstance(v, (str, int, float, bool)) for v in valor
+        ):
+            estado[clave] = list(valor)
+    return dict(sorted(estado.items()))
+
+
+def guardar(perfil, registro):
+    """
+    Escribe los tres archivos de un perfil ya detenido. Devuelve la ruta común
+    (sin extensión).
+    """
+    DIR_PERFILES.mkdir(parents=True, exist_ok=True)
+    prefijo = DIR_PERFILES / datetime.datetime.now().strftime("perfil_%Y%m%d-%H%M%S-%f")
+    filtros = estado_filtros()
+
+    perfil.dump_stats(f"{prefijo}.prof")
+
+    resumen = io.StringIO()
+    resumen.write("Filtros:\n")
+    resumen.write(json.dumps(filtros, indent=2, ensure_ascii=False))
+    resumen.write("\n\n")
+    pstats.Stats(perfil, stream=resumen).sort_stats("cumulative").print_stats(TOP_FUNCIONES)
+    Path(f"{prefijo}.txt").write_text(resumen.getvalue(), encoding="utf-8")
+
+    mediciones = registro["mediciones"] if registro else []
+    planes = [
+        {
+            "nombre": m["nombre"],
+            "tipo": m["tipo"],
+            "segundos": m["segundos"],
+            "filas_fuente": m.get("filas_fuente"),
+            "filas_salida": m.get("filas_salida"),
+            "plan": m["plan"],
+        }
+        for m in mediciones if m.get("plan")
+    ]
+    Path(f"{prefijo}_planes.json").write_text(
+        json.dumps({"filtros": filtros, "planes": planes}, indent=2, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    return prefijo
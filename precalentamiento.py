@@ -0,0 +1,186 @@
+"""
+Precalentamiento de las cachés de consultas.
+
+La primera visita después de un deploy, o después de publicar una versión
+nueva del dataset, pagaba todas las consultas de las pestañas. Al arrancar el
+proceso (el primer rerun es el primer punto donde Streamlit ejecuta código de
+la app) un hilo en segundo plano calcula, para la versión vigente:
+
+- el índice de departamentos, el GeoJSON y las opciones de filtros,
+- las vistas del último año de cada pestaña con los filtros por defecto,
+- las combinaciones populares de DELITOS_PRECALENTAR (por defecto
+  precalentamiento.json), una lista de objetos con cualquiera de las claves
+  anio, categorias, tipos, provincia, departamento y provincias.
+
+Las versiones nuevas que detecta vigilancia.py se precalientan con
+calentar_version() antes de publicarlas. Los hilos no tienen contexto de
+script, así que no escriben en la página de ninguna sesión (los spinners de
+las funciones cacheadas no se muestran); el resultado queda en reporte() y en
+el log.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+import consultas
+import graficos
+
+logger = logging.getLogger(__name__)
+
+ARCHIVO_COMBINACIONES = os.environ.get("DELITOS_PRECALENTAR", "precalentamiento.json")
+ACTIVO = os.environ.get("DELITOS_PRECALENTAMIENTO", "1") == "1"
+
+NOMBRE_HILO = "precalentamiento"
+# Hilos propios que llaman funciones cacheadas sin contexto de script
+HILOS_EN_SEGUNDO_PLANO = {NOMBRE_HILO, "vigilancia"}
+
+_lock = threading.Lock()
+_hilo = None
+_huella_calentada = None
+_reporte = {"estado": "pendiente"}
+
+
+class _SinAvisoDeContexto(logging.Filter):
+    """Descarta el aviso "missing ScriptRunContext" que emite cada spinner desde los hilos."""
+
+    def filter(self, record):
+        return threading.current_thread().name not in HILOS_EN_SEGUNDO_PLANO
+
+
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+    _SinAvisoDeContexto()
+)
+
+
+def cargar_combinaciones(ruta=ARCHIVO_COMBINACIONES):
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def _tareas_combinacion(combinacion, anio_por_defecto):
+    """Consultas de todas las pestañas que aplican a una combinación de filtros."""
+    anio = combinacion.get("anio", anio_por_defecto)
+    categorias = tuple(combinacion.get("categorias", ()))
+    tipos = tuple(combinacion.get("tipos", ()))
+    area = dict(
+        provincia=combinacion.get("provincia"),
+        departamento=combinacion.get("departamento"),
+    )
+    provincias = tuple(combinacion.get("provincias", ()))
+    if area["provincia"] and not provincias:
+        provincias = (area["provincia"],)
+
+    return [
+        ("opciones_filtros", lambda: consultas.opciones_filtros(categorias)),
+        ("resumen_anual", lambda: consultas.resumen_anual(anio, categorias, tipos, **area)),
+        ("serie_anual", lambda: consultas.serie_anual(categorias, tipos, **area)),
+        ("distribucion_delitos", lambda: consultas.distribucion_delitos(anio, categorias, tipos, **area)),
+        ("evolucion_provincias", lambda: consultas.evolucion_provincias(categorias, tipos)),
+        ("evolucion_departamentos", lambda: consultas.evolucion_departamentos(categorias, tipos, provincias)),
+        ("ranking_departamentos", lambda: consultas.ranking_departamentos(categorias, tipos)),
+    ]
+
+
+def calentar(combinaciones=None):
+    """
+    Corre el precalentamiento en el hilo actual y devuelve el reporte: tiempo
+    total y, por tarea, qué cubrió, cuánto tardó y si falló.
+    """
+    if combinaciones is None:
+        combinaciones = cargar_combinaciones()
+
+    inicio = time.perf_counter()
+    tareas = [
+        ("plotly", graficos.plotly_express),
+        ("load_indice_departamentos", consultas.load_indice_departamentos),
+        ("load_geojson", consultas.load_geojson),
+        ("load_anomalias", consultas.load_anomalias),
+        ("load_hallazgos", consultas.load_hallazgos),
+        ("load_dimensiones", consultas.load_dimensiones),
+    ]
+    opciones = consultas.opciones_filtros()
+    anio_ultimo = opciones["anios"][0]
+
+    # Tipos por categoría: cada categoría elegida sola en cualquier pestaña
+    tareas += [
+        (f"opciones_filtros[{categoria}]", lambda c=categoria: consultas.opciones_filtros((c,)))
+        for categoria in opciones["categorias"]
+    ]
+    for combinacion in [{}] + list(combinaciones):
+        etiqueta = json.dumps(combinacion, ensure_ascii=False) if combinacion else "por defecto"
+        tareas += [
+            (f"{nombre} {etiqueta}", funcion)
+            for nombre, funcion in _tareas_combinacion(combinacion, anio_ultimo)
+        ]
+
+    resultados = []
+    for nombre, funcion in tareas:
+        inicio_tarea = time.perf_counter()
+        error = None
+        try:
+            funcion()
+        except Exception as e:  # una combinación inválida no debe frenar al resto
+            error = repr(e)
+            logger.warning("precalentamiento %s falló: %s", nombre, error)
+        resultados.append({
+            "tarea": nombre,
+            "segundos": round(time.perf_counter() - inicio_tarea, 4),
+            "error": error,
+        })
+
+    reporte = {
+        "estado": "listo",
+        "huella": consultas.huella_vigente(),
+        "anio": anio_ultimo,
+        "combinaciones": len(combinaciones),
+        "tareas": resultados,
+        "errores": sum(r["error"] is not None for r in resultados),
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }
+    logger.info(
+        "precalentamiento: %d tareas (%d combinaciones populares) en %.2f s, %d errores",
+        len(resultados), len(combinaciones), reporte["segundos"], reporte["errores"]
+    )
+    return reporte
+
+
+def calentar_version(version):
+    """Fija `version` en el hilo actual, la precalienta y guarda el reporte."""
+    global _reporte, _huella_calentada
+    consultas.fijar_version(version)
+    try:
+        _reporte = calentar()
+    except Exception as e:
+        logger.exception("precalentamiento abortado")
+        _reporte = {"estado": "error", "error": repr(e), "huella": version["huella"]}
+    _huella_calentada = version["huella"]
+    return _reporte
+
+
+def asegurar():
+    """
+    Lanza el precalentamiento en segundo plano si la versión del dataset que
+    usa este rerun todavía no se precalentó en este proceso y no hay uno en curso.
+    """
+    global _hilo, _reporte
+    if not ACTIVO:
+        return
+    version = consultas.version_actual()
+    with _lock:
+        if version["huella"] == _huella_calentada or (_hilo is not None and _hilo.is_alive()):
+            return
+        _reporte = {"estado": "en curso", "huella": version["huella"]}
+        _hilo = threading.Thread(
+            target=calentar_version, args=(version,), name=NOMBRE_HILO, daemon=True
+        )
+        _hilo.start()
+
+
+def reporte():
+    return dict(_reporte)
@@ -0,0 +1,99 @@
+"""
+Búsqueda de departamentos con trayectorias parecidas.
+
+La evolución por departamento se pivotea una vez en una matriz departamento ×
+año de tasas (NaN donde falta el año), que se cachea por filtros. Cada
+búsqueda compara la fila del departamento de referencia contra todas las
+demás con operaciones vectorizadas de NumPy, sobre los años que cada par
+tiene en común: con ~500 departamentos y ~15 años tarda menos de un
+milisegundo.
+
+Métricas:
+
+- "correlacion": correlación de Pearson. Compara la forma de la curva
+  (cuándo sube y cuándo baja) sin importar el nivel de la tasa.
+- "distancia": raíz del error cuadrático medio entre las tasas. Compara
+  forma y nivel a la vez.
+"""
+
+import numpy as np
+import polars as pl
+
+# Años en común que necesita un par para compararse
+MIN_ANIOS_COMUNES = 5
+METRICAS = {"correlacion": "Forma (correlación)", "distancia": "Forma y nivel (distancia)"}
+
+
+def construir_matriz(evolucion):
+    """
+    Matriz de tasas a partir de la evolución por departamento y año
+    (consultas.evolucion_departamentos). Devuelve un dict con los nombres de
+    las filas, los años de las columnas, la matriz y su máscara de valores.
+    """
+    ancha = (
+        evolucion
+        .pivot(on="anio", index="depto_nombre_completo", values="tasa_delitos",
+               aggregate_function="first", sort_columns=True)
+        .sort("depto_nombre_completo")
+    )
+    anios = [c for c in ancha.columns if c != "depto_nombre_completo"]
+    matriz = ancha.select(anios).cast(pl.Float64).fill_nan(None).to_numpy()
+    matriz = np.where(np.isfinite(matriz), matriz, np.nan)
+    return {
+        "departamentos": ancha["depto_nombre_completo"].to_list(),
+        "anios": [int(a) for a in anios],
+        "matriz": matriz,
+        "mascara": ~np.isnan(matriz),
+    }
+
+
+def _sin_resultados(metrica):
+    return pl.DataFrame(schema={
+        "depto_nombre_completo": pl.Utf8, metrica: pl.Float64, "anios_comunes": pl.Int64
+    })
+
+
+def similares(trayectorias, departamento, k=3, metrica="correlacion"):
+    """
+    Los `k` departamentos cuya trayectoria se parece más a la de
+    `departamento`, de más a menos parecido. Devuelve un DataFrame con el
+    nombre, el valor de la métrica y los años comparados.
+    """
+    departamentos = trayectorias["departamentos"]
+    if departamento not in departamentos:
+        return _sin_resultados(metrica)
+    fila = departamentos.index(departamento)
+    matriz, mascara = trayectorias["matriz"], trayectorias["mascara"]
+
+    # Años que cada departamento comparte con el de referencia
+    comunes = mascara & mascara[fila]
+    n = comunes.sum(axis=1)
+    x = np.where(comunes, matriz, 0.0)
+    y = np.where(comunes, matriz[fila], 0.0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if metrica == "correlacion":
+            suma_x, suma_y = x.sum(axis=1), y.sum(axis=1)
+            covarianza = (x * y).sum(axis=1) - suma_x * suma_y / n
+            var_x = (x * x).sum(axis=1) - suma_x ** 2 / n
+            var_y = (y * y).sum(axis=1) - suma_y ** 2 / n
+            valores = covarianza / np.sqrt(var_x * var_y)
+            orden = -valores
+        else:
+            valores = np.sqrt(((x - y) ** 2).sum(axis=1) / n)
+            orden = valores
+
+    validos = (n >= MIN_ANIOS_COMUNES) & np.isfinite(valores)
+    validos[fila] = False
+    candidatos = np.flatnonzero(validos)
+    k = min(k, candidatos.size)
+    if k == 0:
+        return _sin_resultados(metrica)
+    # Selección parcial de los k mejores y orden solo entre ellos
+    mejores = candidatos[np.argpartition(orden[candidatos], k - 1)[:k]]
+    mejores = mejores[np.argsort(orden[mejores], kind="stable")]
+    return pl.DataFrame({
+        "depto_nombre_completo": [departamentos[i] for i in mejores],
+        metrica: valores[mejores].round(3),
+        "anios_comunes": n[mejores].astype(np.int64),
+    })
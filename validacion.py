@@ -0,0 +1,159 @@
+"""
+Validación del dataset al preparar cada versión.
+
+Controla los invariantes de los que dependen las vistas:
+
+- poblaciones coherentes entre niveles: una sola población por departamento,
+  provincia y país en cada año, y la suma de los departamentos igual a la de
+  la provincia (con TOLERANCIA_POBLACION);
+- cada departamento pertenece a una sola provincia;
+- sin años faltantes en la serie de cada departamento: la variación interanual
+  de las pestañas de provincias y departamentos usa shift(1).over(...), que
+  con un hueco compara contra un año que no es el anterior;
+- sin filas duplicadas por año, departamento y tipo de delito, ni conteos
+  negativos o nulos.
+
+Todos los controles se arman sobre el mismo scan y se ejecutan juntos con
+pl.collect_all, que comparte la lectura del archivo entre ellos. El reporte se
+guarda como validacion.json junto a la copia de la versión (ver
+consultas.preparar_version), así que se calcula una sola vez por huella y
+los reruns solo lo leen.
+"""
+
+import time
+
+import polars as pl
+
+TOLERANCIA_POBLACION = 0.01
+MAX_EJEMPLOS = 5
+
+DEPARTAMENTO = ["anio", "provincia_nombre", "depto_nombre_completo"]
+
+
+def _controles(df):
+    """(nombre, descripción, estado si falla, LazyFrame con un caso por fila)."""
+    por_departamento = df.group_by(DEPARTAMENTO).agg(
+        pl.col("poblacion_departamento").n_unique().alias("poblaciones"),
+        pl.col("poblacion_departamento").first(),
+    )
+    por_provincia = (
+        df.group_by(["anio", "provincia_nombre"])
+        .agg(pl.col("poblacion_provincia").n_unique().alias("poblaciones"),
+             pl.col("poblacion_provincia").first())
+    )
+    suma_departamentos = (
+        por_departamento.group_by(["anio", "provincia_nombre"])
+        .agg(pl.col("poblacion_departamento").sum().alias("suma_departamentos"))
+        .join(por_provincia, on=["anio", "provincia_nombre"])
+        .with_columns(
+            ((pl.col("suma_departamentos") - pl.col("poblacion_provincia")).abs()
+             / pl.col("poblacion_provincia")).round(4).alias("diferencia")
+        )
+    )
+    anios = df.select(pl.col("anio").unique())
+    return [
+        (
+            "poblacion_departamento_unica",
+            "Una sola población por departamento y año",
+            "error",
+            por_departamento.filter(pl.col("poblaciones") > 1).select(DEPARTAMENTO + ["poblaciones"]),
+        ),
+        (
+            "poblacion_provincia_unica",
+            "Una sola población por provincia y año",
+            "error",
+            por_provincia.filter(pl.col("poblaciones") > 1).select(["anio", "provincia_nombre", "poblaciones"]),
+        ),
+        (
+            "poblacion_pais_unica",
+            "Una sola población del país por año",
+            "error",
+            df.group_by("anio").agg(pl.col("poblacion_pais").n_unique().alias("poblaciones"))
+            .filter(pl.col("poblaciones") > 1),
+        ),
+        (
+            "suma_departamentos_provincia",
+            f"La suma de los departamentos difiere menos de {TOLERANCIA_POBLACION:.0%} de la provincia",
+            "aviso",
+            suma_departamentos.filter(pl.col("diferencia") > TOLERANCIA_POBLACION)
+            .select(["anio", "provincia_nombre", "suma_departamentos", "poblacion_provincia", "diferencia"]),
+        ),
+        (
+            "departamento_una_provincia",
+            "Cada departamento pertenece a una sola provincia",
+            "error",
+            df.group_by("depto_nombre_completo")
+            .agg(pl.col("provincia_nombre").unique().sort().alias("provincias"))
+            .filter(pl.col("provincias").list.len() > 1),
+        ),
+        (
+            "anios_continuos",
+            "Sin años faltantes entre el primero y el último del dataset",
+            "error",
+            anios.select(pl.int_range(pl.col("anio").min(), pl.col("anio").max() + 1).alias("anio"))
+            .join(anios, on="anio", how="anti"),
+        ),
+        (
+            "anios_continuos_departamento",
+            "Sin años faltantes en la serie de cada departamento",
+            "aviso",
+            por_departamento.group_by("depto_nombre_completo")
+            .agg(pl.col("anio").min().alias("desde"), pl.col("anio").max().alias("hasta"),
+                 pl.col("anio").n_unique().alias("anios"))
+            .filter(pl.col("hasta") - pl.col("desde") + 1 > pl.col("anios")),
+        ),
+        (
+            "filas_unicas",
+            "Una fila por año, departamento y tipo de delito",
+            "error",
+            df.group_by(["anio", "depto_nombre_completo", "codigo_delito_snic_nombre"])
+            .agg(pl.len().alias("filas")).filter(pl.col("filas") > 1),
+        ),
+        (
+            "conteos_validos",
+            "Hechos y víctimas no negativos ni nulos; poblaciones positivas",
+            "error",
+            df.filter(
+                pl.any_horizontal(
+                    pl.col("cantidad_hechos").is_null() | (pl.col("cantidad_hechos") < 0),
+                    pl.col("cantidad_victimas").is_null() | (pl.col("cantidad_victimas") < 0),
+                    ~(pl.col("poblacion_departamento") > 0),
+                    ~(pl.col("poblacion_provincia") > 0),
+                    ~(pl.col("poblacion_pais") > 0),
+                )
+            ).select(DEPARTAMENTO + ["codigo_delito_snic_nombre", "cantidad_hechos", "poblacion_departamento"]),
+        ),
+    ]
+
+
+def validar(df):
+    """
+    Corre todos los controles sobre el LazyFrame `df` (filas anuales del
+    dataset) y devuelve el reporte: estado general, filas, duración y, por
+    control, estado, cantidad de casos y algunos ejemplos.
+    """
+    inicio = time.perf_counter()
+    df = df.with_columns(
+        pl.col("provincia_nombre").cast(pl.Utf8),
+        pl.col("depto_nombre_completo").cast(pl.Utf8),
+        pl.col("codigo_delito_snic_nombre").cast(pl.Utf8),
+    )
+    controles = _controles(df)
+    filas, *casos = pl.collect_all([df.select(pl.len())] + [lf for *_, lf in controles])
+
+    resultados = []
+    for (nombre, descripcion, gravedad, _), encontrados in zip(controles, casos):
+        resultados.append({
+            "control": nombre,
+            "descripcion": descripcion,
+            "estado": gravedad if encontrados.height else "ok",
+            "casos": encontrados.height,
+            "ejemplos": encontrados.head(MAX_EJEMPLOS).to_dicts(),
+        })
+    estados = {r["estado"] for r in resultados}
+    return {
+        "estado": "error" if "error" in estados else "aviso" if "aviso" in estados else "ok",
+        "filas": filas.item(),
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "controles": resultados,
+    }
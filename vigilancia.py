@@ -0,0 +1,116 @@
+"""
+Vigilancia del archivo de datos y cambio de versión en caliente.
+
+Un hilo por proceso revisa cada DELITOS_VIGILANCIA_SEGUNDOS (por defecto 10)
+el tamaño y el mtime de DATOS_SNIC_POB.parquet. Cuando cambian y se mantienen
+estables durante un intervalo (el archivo ya terminó de escribirse), compara
+la huella de contenido con la vigente y, si es otra:
+
+1. prepara la versión nueva (copia inmutable y rollups, ver consultas),
+2. la precalienta con la versión fijada en este hilo,
+3. la publica: los reruns que empiecen después la usan y los que están en
+   curso terminan con la anterior, que sigue en disco.
+
+Tocar el archivo sin cambiar el contenido no recarga nada. Para publicar un
+dataset nuevo conviene escribirlo aparte y moverlo con `mv` (os.replace):
+así la copia por hardlink de la versión anterior no cambia.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import consultas
+import precalentamiento
+
+logger = logging.getLogger(__name__)
+
+INTERVALO = float(os.environ.get("DELITOS_VIGILANCIA_SEGUNDOS", "10"))
+ACTIVO = os.environ.get("DELITOS_VIGILANCIA", "1") == "1"
+NOMBRE_HILO = "vigilancia"
+
+_lock = threading.Lock()
+_hilo = None
+_cambios = []
+
+
+def _stat(ruta):
+    info = os.stat(ruta)
+    return info.st_size, info.st_mtime_ns
+
+
+def revisar(ruta=None):
+    """
+    Una pasada: si el contenido del archivo difiere de la versión vigente,
+    prepara, precalienta y publica la nueva. Devuelve la versión publicada o None.
+    """
+    ruta = ruta or consultas.ARCHIVO_DATOS
+    anterior = consultas.vigente()
+    if consultas.huella_archivo(ruta) == anterior["huella"]:
+        return None
+
+    inicio = time.perf_counter()
+    version = consultas.preparar_version(ruta)
+    preparada = time.perf_counter()
+    reporte = precalentamiento.calentar_version(version)
+    consultas.publicar(version)
+    cambio = {
+        "anterior": anterior["huella"],
+        "nueva": version["huella"],
+        "preparar_s": round(preparada - inicio, 3),
+        "precalentar_s": reporte.get("segundos"),
+        "publicada": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    _cambios.append(cambio)
+    logger.info(
+        "dataset %s -> %s publicado (preparar %.2f s, precalentar %s s)",
+        cambio["anterior"], cambio["nueva"], cambio["preparar_s"], cambio["precalentar_s"]
+    )
+    return version
+
+
+def _vigilar(ruta, intervalo):
+    revisado = _stat(ruta)
+    anterior = revisado
+    while True:
+        time.sleep(intervalo)
+        # Aunque el proceso no tenga reruns, su versión vigente sigue en uso
+        consultas.marcar_uso(consultas.vigente())
+        try:
+            actual = _stat(ruta)
+        except FileNotFoundError:  # en medio de un reemplazo no atómico
+            continue
+        if actual == revisado:
+            continue
+        if actual != anterior:
+            # Todavía cambiando: esperar una vuelta más
+            anterior = actual
+            continue
+        try:
+            revisar(ruta)
+            revisado = actual
+        except Exception:
+            # Se reintenta en la próxima vuelta
+            logger.exception("no se pudo cargar la versión nueva de %s", ruta)
+
+
+def iniciar(ruta=None, intervalo=INTERVALO):
+    """Arranca el hilo de vigilancia una sola vez por proceso."""
+    global _hilo
+    if not ACTIVO:
+        return
+    ruta = ruta or consultas.ARCHIVO_DATOS
+    consultas.vigente()
+    with _lock:
+        if _hilo is not None:
+            return
+        _hilo = threading.Thread(
+            target=_vigilar, args=(ruta, intervalo), name=NOMBRE_HILO, daemon=True
+        )
+        _hilo.start()
+
+
+def cambios():
+    """Versiones publicadas por este proceso desde que arrancó."""
+    return list(_cambios)